@@ -1,12 +1,22 @@
 import os
+import json
+import hashlib
 import logging
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Optional
 from retry import retry
 from neo4j import GraphDatabase
-
-# ✅ [NEW] Debug print to verify variables are loaded
-print("Using NEO4J_URI:", os.getenv("NEO4J_URI"))
-# print("Using NEO4J_USERNAME:", os.getenv("NEO4J_USERNAME"))
-# print("Using NEO4J_PASSWORD:", os.getenv("NEO4J_PASSWORD"))
+from batch_loader import (
+    LoadCheckpoint,
+    coerce_row,
+    fingerprint_source,
+    run_batches,
+    stream_batches,
+)
+from source_cache import SourceCache, StagedSource
+from etl_scheduler import Task, log_timing_report, run_dag, timing_report
 
 # # Paths to CSV files containing hospital data
 BRANCHES_CSV_PATH = os.getenv("BRANCHES_CSV_PATH")
@@ -18,6 +28,33 @@ FEES_CSV_PATH = os.getenv("FEES_CSV_PATH")
 FAQS_CSV_PATH = os.getenv("FAQS_CSV_PATH")
 EXAMPLE_CYPHER_CSV_PATH = os.getenv("EXAMPLE_CYPHER_CSV_PATH")
 
+# "incremental" upserts changed rows and deletes removed ones, "full" clears
+# the database and reloads everything
+ETL_LOAD_MODE = os.getenv("ETL_LOAD_MODE", "incremental")
+ETL_STATE_DIR = os.getenv("ETL_STATE_DIR", ".etl_state")
+LOAD_MANIFEST_PATH = os.path.join(ETL_STATE_DIR, "load_manifest.json")
+LOAD_CHECKPOINT_PATH = os.path.join(ETL_STATE_DIR, "load_checkpoint.json")
+# Node recording the id of the last load in the database itself, so a
+# manifest is only trusted for the database it was written against
+LOAD_MARKER_LABEL = "EtlLoadMarker"
+
+# "unwind" streams CSVs through Python in batches of ETL_BATCH_SIZE rows,
+# "load_csv" lets Neo4j fetch them with LOAD CSV ... IN TRANSACTIONS
+ETL_LOADER = os.getenv("ETL_LOADER", "unwind")
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "1000"))
+ETL_PARALLELISM = int(os.getenv("ETL_PARALLELISM", "1"))
+# Every source is staged once into a content-addressed local cache. Files
+# found in ETL_LOCAL_DATA_DIR (e.g. the repo's data/ directory) replace the
+# remote URLs, and ETL_OFFLINE=true reuses cached copies instead of fetching.
+# ETL_SOURCE_CHECKSUMS optionally points to a JSON file of pinned
+# {file name: sha256} checksums.
+ETL_CACHE_DIR = os.getenv("ETL_CACHE_DIR", os.path.join(ETL_STATE_DIR, "source_cache"))
+ETL_LOCAL_DATA_DIR = os.getenv("ETL_LOCAL_DATA_DIR")
+ETL_OFFLINE = os.getenv("ETL_OFFLINE", "false").lower() == "true"
+ETL_SOURCE_CHECKSUMS = os.getenv("ETL_SOURCE_CHECKSUMS")
+# Number of load steps (node labels, relationship types) run concurrently
+ETL_STEP_WORKERS = int(os.getenv("ETL_STEP_WORKERS", "4"))
+
 
 # Neo4j config
 NEO4J_URI = os.getenv("NEO4J_URI")
@@ -33,8 +70,46 @@ logging.basicConfig(
 
 
 LOGGER = logging.getLogger(__name__)
+LOGGER.info(f"Using NEO4J_URI: {NEO4J_URI}")
+
+# Every label the ETL merges on `id`, so MERGE and MATCH lookups hit a
+# uniqueness constraint instead of scanning the label
+NODES = [
+    "Branch",
+    "Customer",
+    "Mortgage",
+    "Payments",
+    "PaymentsDue",
+    "Fees",
+    "FAQs",
+    "Question",
+]
 
-NODES = ["Branch", "Customer", "Mortgage", "Question"]
+# Range indexes: the composite PaymentsDue index backs the MAY_INCUR join,
+# Question.question backs the example lookups, and the rest back
+# time-window and amount/status filters in generated Cypher
+INDEXES = [
+    ("PaymentsDue", ("customer_id", "mortgage_id")),
+    ("Question", ("question",)),
+    ("Mortgage", ("start",)),
+    ("Mortgage", ("amount",)),
+    ("Mortgage", ("status",)),
+    ("Payments", ("payment_date",)),
+    ("Payments", ("amount",)),
+    ("PaymentsDue", ("due_date",)),
+    ("PaymentsDue", ("amount",)),
+    ("PaymentsDue", ("status",)),
+    ("Fees", ("date_incurred",)),
+    ("Fees", ("amount",)),
+    ("Fees", ("status",)),
+    # Customer verification looks customers up by all four keys at once
+    (
+        "Customer",
+        ("lookup_last_name", "lookup_first_name", "lookup_zip", "lookup_phone"),
+    ),
+]
+
+INDEX_ONLINE_TIMEOUT_SECONDS = int(os.getenv("INDEX_ONLINE_TIMEOUT_SECONDS", "300"))
 
 
 def _set_uniqueness_constraints(tx, node):
@@ -43,208 +118,739 @@ def _set_uniqueness_constraints(tx, node):
     _ = tx.run(query, {})
 
 
-@retry(tries=100, delay=10)
-def load_bank_graph_from_csv() -> None:
-    """Load structured bank CSV data following
-    a specific ontology into Neo4j"""
+def _create_range_index(tx, node, properties):
+    index_name = f"{node.lower()}_{'_'.join(properties)}_range"
+    properties_str = ", ".join(f"n.{property_name}" for property_name in properties)
+    query = f"""CREATE RANGE INDEX {index_name} IF NOT EXISTS
+        FOR (n:{node}) ON ({properties_str});"""
+    _ = tx.run(query, {})
+
+
+def _to_date(value: str) -> str:
+    """Cypher expression converting an ISO date CSV value (or a date already
+    coerced in Python) to a native date"""
+
+    return f"CASE WHEN {value} IS NULL OR {value} = '' THEN null ELSE date({value}) END"
+
+
+def _digits(value: str) -> str:
+    """Cypher expression keeping only the digits of a string value"""
+
+    return (
+        f"reduce(digits = '', i IN range(0, size(coalesce({value}, '')) - 1) | "
+        f"digits + CASE WHEN substring({value}, i, 1) >= '0' "
+        f"AND substring({value}, i, 1) <= '9' THEN substring({value}, i, 1) "
+        "ELSE '' END)"
+    )
+
+
+def _customer_lookup_keys(node: str, source: str) -> str:
+    """SET items for the normalized properties customer verification matches
+    on, so lookups are plain equality against the composite index. Keep in
+    sync with chatbot_api/src/utils/session_tokens.py"""
+
+    return f"""
+            {node}.lookup_first_name = toLower(trim({source}.first_name)),
+            {node}.lookup_last_name = toLower(trim({source}.last_name)),
+            {node}.lookup_zip = trim({source}.zip_code),
+            {node}.lookup_phone = {_digits(f'{source}.phone_number')}"""
+
+
+
+@dataclass(frozen=True)
+class LoadStep:
+    """A single ETL statement, run once per CSV row bound to `row`"""
+
+    name: str
+    source: str
+    cypher: str
+    label: Optional[str] = None
+    id_expression: Optional[str] = None
+    delete_missing: bool = False
+    endpoints: tuple[str, ...] = ()
+    # Deletes the relationships this step merged for `row`, so a changed row
+    # re-merges its current relationships instead of adding to stale ones
+    stale_cypher: Optional[str] = None
+
+
+# Source CSVs and the column that identifies a row in each of them
+SOURCES = {
+    "BRANCHES_CSV_PATH": (BRANCHES_CSV_PATH, "branch_id"),
+    "CUSTOMER_CSV_PATH": (CUSTOMER_CSV_PATH, "customer_id"),
+    "MORTGAGE_CSV_PATH": (MORTGAGE_CSV_PATH, "loan_number"),
+    "PAYMENTS_MADE_CSV_PATH": (PAYMENTS_MADE_CSV_PATH, "payment_made_id"),
+    "PAYMENTS_DUE_CSV_PATH": (PAYMENTS_DUE_CSV_PATH, "payment_due_id"),
+    "FEES_CSV_PATH": (FEES_CSV_PATH, "fee_id"),
+    "FAQS_CSV_PATH": (FAQS_CSV_PATH, "faq_id"),
+    "EXAMPLE_CYPHER_CSV_PATH": (EXAMPLE_CYPHER_CSV_PATH, "question"),
+}
+
+# Local copies of SOURCES, filled in by _stage_sources()
+STAGED_SOURCES: dict[str, StagedSource] = {}
+
+# Python-side type coercion for the UNWIND loaders, so Neo4j receives typed
+# parameters instead of converting strings row by row
+COLUMN_TYPES = {
+    "BRANCHES_CSV_PATH": {"branch_id": int},
+    "MORTGAGE_CSV_PATH": {
+        "loan_amount": float,
+        "interest_rate": float,
+        "start_date": date.fromisoformat,
+    },
+    "PAYMENTS_MADE_CSV_PATH": {"amount": float, "payment_date": date.fromisoformat},
+    "PAYMENTS_DUE_CSV_PATH": {"amount": float, "due_date": date.fromisoformat},
+    "FEES_CSV_PATH": {"amount": float, "date_incurred": date.fromisoformat},
+}
+
+NODE_STEPS = [
+    LoadStep(
+        name="Branch nodes",
+        source="BRANCHES_CSV_PATH",
+        label="Branch",
+        id_expression="toInteger(row.branch_id)",
+        delete_missing=True,
+        cypher="""
+        MERGE (h:Branch {id: toInteger(row.branch_id)})
+        SET
+            h.name = row.branch_name,
+            h.state_name = row.branch_state;
+        """,
+    ),
+    LoadStep(
+        name="Customer nodes",
+        source="CUSTOMER_CSV_PATH",
+        label="Customer",
+        id_expression="row.customer_id",
+        delete_missing=True,
+        cypher="""
+        MERGE (p:Customer {id: row.customer_id})
+        SET
+            p.first_name = row.first_name,
+            p.last_name = row.last_name,
+            p.name = row.first_name + ' ' + row.last_name,
+            p.email = row.email,
+            p.phone_number = row.phone_number,
+            p.address = row.address,
+            p.city = row.city,
+            p.state = row.state,
+            p.zip_code = row.zip_code,
+            p.country = row.country,"""
+        + _customer_lookup_keys("p", "row")
+        + ";",
+    ),
+    LoadStep(
+        name="Mortgage nodes",
+        source="MORTGAGE_CSV_PATH",
+        label="Mortgage",
+        id_expression="row.loan_number",
+        delete_missing=True,
+        cypher=f"""
+        MERGE (p:Mortgage {{id: row.loan_number}})
+        SET
+            p.loan_number = row.loan_number,
+            p.amount = toFloat(row.loan_amount),
+            p.interest = toFloat(row.interest_rate),
+            p.start = {_to_date('row.start_date')},
+            p.status = row.status,
+            p.tenure = row.tenure,
+            p.customer_id = row.customer_id;
+        """,
+    ),
+    LoadStep(
+        name="Payments nodes",
+        source="PAYMENTS_MADE_CSV_PATH",
+        label="Payments",
+        id_expression="row.payment_made_id",
+        delete_missing=True,
+        cypher=f"""
+        MERGE (p:Payments {{id: row.payment_made_id}})
+        SET
+            p.amount = toFloat(row.amount),
+            p.payment_date = {_to_date('row.payment_date')},
+            p.customer_id = row.customer_id;
+        """,
+    ),
+    LoadStep(
+        name="PaymentsDue nodes",
+        source="PAYMENTS_DUE_CSV_PATH",
+        label="PaymentsDue",
+        id_expression="row.payment_due_id",
+        delete_missing=True,
+        cypher=f"""
+        MERGE (pd:PaymentsDue {{id: row.payment_due_id}})
+        SET
+            pd.amount = toFloat(row.amount),
+            pd.due_date = {_to_date('row.due_date')},
+            pd.status = row.status,
+            pd.customer_id = row.customer_id,
+            pd.mortgage_id = row.mortgage_id;
+        """,
+    ),
+    LoadStep(
+        name="Fees nodes",
+        source="FEES_CSV_PATH",
+        label="Fees",
+        id_expression="row.fee_id",
+        delete_missing=True,
+        cypher=f"""
+        MERGE (f:Fees {{id: row.fee_id}})
+        SET
+            f.type = row.fee_type,
+            f.amount = toFloat(row.amount),
+            f.date_incurred = {_to_date('row.date_incurred')},
+            f.status = row.status,
+            f.customer_id = row.customer_id,
+            f.mortgage_id = row.mortgage_id;
+        """,
+    ),
+    # FAQ embeddings and portal-added Question examples are owned by other
+    # services, so rows missing from these CSVs are never deleted
+    LoadStep(
+        name="FAQs nodes",
+        source="FAQS_CSV_PATH",
+        label="FAQs",
+        id_expression="row.faq_id",
+        cypher="""
+        MERGE (q:FAQs {id: row.faq_id})
+        SET
+            q.question = row.question,
+            q.answer = row.answer,
+            q.related_topics = row.related_topics,
+            q.topics = [topic IN split(coalesce(row.related_topics, ''), ',')
+                        WHERE trim(topic) <> '' | trim(topic)];
+        """,
+    ),
+    LoadStep(
+        name="Question nodes",
+        source="EXAMPLE_CYPHER_CSV_PATH",
+        label="Question",
+        cypher="""
+        MERGE (Q:Question {question: row.question})
+        SET Q.cypher = row.cypher;
+        """,
+    ),
+]
+
+RELATIONSHIP_STEPS = [
+    LoadStep(
+        name="HAS relationships between Customer and Mortgage nodes",
+        source="MORTGAGE_CSV_PATH",
+        endpoints=("Customer", "Mortgage"),
+        cypher="""
+        MATCH (c:Customer {id: row.customer_id})
+        MATCH (m:Mortgage {id: row.loan_number})
+        MERGE (c)-[:HAS]->(m);
+        """,
+        stale_cypher="""
+        MATCH (:Customer)-[r:HAS]->(:Mortgage {id: row.loan_number})
+        DELETE r
+        """,
+    ),
+    LoadStep(
+        name="MADE relationships between customer and payments",
+        source="PAYMENTS_MADE_CSV_PATH",
+        endpoints=("Customer", "Payments"),
+        cypher="""
+        MATCH (c:Customer {id: row.customer_id})
+        MATCH (p:Payments {id: row.payment_made_id})
+        MERGE (c)-[:MADE]->(p);
+        """,
+        stale_cypher="""
+        MATCH (:Customer)-[r:MADE]->(:Payments {id: row.payment_made_id})
+        DELETE r
+        """,
+    ),
+    LoadStep(
+        name="SCHEDULE relationships between mortgage and payments due",
+        source="PAYMENTS_DUE_CSV_PATH",
+        endpoints=("Mortgage", "PaymentsDue"),
+        cypher="""
+        MATCH (m:Mortgage {id: row.mortgage_id})
+        MATCH (pd:PaymentsDue {id: row.payment_due_id})
+        MERGE (m)-[:SCHEDULE]->(pd);
+        """,
+        stale_cypher="""
+        MATCH (:Mortgage)-[r:SCHEDULE]->(:PaymentsDue {id: row.payment_due_id})
+        DELETE r
+        """,
+    ),
+    LoadStep(
+        name="HAS relationships between mortgage and fees nodes",
+        source="FEES_CSV_PATH",
+        endpoints=("Mortgage", "Fees"),
+        cypher="""
+        MATCH (m:Mortgage {id: row.mortgage_id})
+        MATCH (f:Fees {id: row.fee_id})
+        MERGE (m)-[:HAS]->(f);
+        """,
+        stale_cypher="""
+        MATCH (:Mortgage)-[r:HAS]->(:Fees {id: row.fee_id})
+        DELETE r
+        """,
+    ),
+    # Assumes fees are incurred when payment is due and status is 'Due'
+    LoadStep(
+        name="MAY INCUR relationships between payments due and fees nodes",
+        source="FEES_CSV_PATH",
+        endpoints=("PaymentsDue", "Fees"),
+        cypher="""
+        MATCH (pd:PaymentsDue {customer_id: row.customer_id, mortgage_id: row.mortgage_id})
+        MATCH (f:Fees {id: row.fee_id})
+        WHERE row.status = 'Due'
+        MERGE (pd)-[:MAY_INCUR]->(f);
+        """,
+        stale_cypher="""
+        MATCH (:PaymentsDue)-[r:MAY_INCUR]->(:Fees {id: row.fee_id})
+        DELETE r
+        """,
+    ),
+]
 
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
-    # Add a step to clear the database before loading new data
-    LOGGER.info("Clearing existing graph data...")
-    with driver.session(database="neo4j") as session:
-        session.run("MATCH (n) DETACH DELETE n;")
-    LOGGER.info("Existing graph data cleared.")
+
+def _set_up_schema(driver) -> None:
+    """Create constraints and indexes and wait for them to come online"""
 
     LOGGER.info("Setting uniqueness constraints on nodes")
     with driver.session(database="neo4j") as session:
         for node in NODES:
             session.execute_write(_set_uniqueness_constraints, node)
 
-    # Load Branch nodes
-    LOGGER.info("Loading branch nodes")
+    LOGGER.info("Creating range indexes")
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{BRANCHES_CSV_PATH}' AS branches
-        MERGE (h:Branch {{id: toInteger(branches.branch_id)}})
-        SET
-            h.name = branches.branch_name,
-            h.state_name = branches.branch_state;
-        """
-        session.run(query, {})
+        for node, properties in INDEXES:
+            session.execute_write(_create_range_index, node, properties)
 
-    # Load Customer nodes
-    LOGGER.info("Loading customer nodes")
+    LOGGER.info("Waiting for indexes to come online")
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{CUSTOMER_CSV_PATH}' AS customers
-        MERGE (p:Customer {{id: customers.customer_id}})
-        SET
-            p.first_name = customers.first_name,
-            p.last_name = customers.last_name,
-            p.name = customers.first_name + ' ' + customers.last_name,
-            p.email = customers.email,
-            p.phone_number = customers.phone_number,
-            p.address = customers.address,
-            p.city = customers.city,
-            p.state = customers.state,
-            p.zip_code = customers.zip_code,
-            p.country = customers.country;
-        """
-        session.run(query, {})
-
-    # Load Mortgage nodes
-    LOGGER.info("Loading mortgage nodes")
+        session.run(
+            "CALL db.awaitIndexes($timeout)", {"timeout": INDEX_ONLINE_TIMEOUT_SECONDS}
+        ).consume()
+
+    # Incremental loads skip unchanged customers, so fill in the lookup keys
+    # of customers loaded before they existed
+    LOGGER.info("Backfilling customer lookup keys")
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{MORTGAGE_CSV_PATH}' AS mortgage
-        MERGE (p:Mortgage {{id: mortgage.loan_number}})
-        SET
-            p.loan_number = mortgage.loan_number,
-            p.amount = toFloat(mortgage.loan_amount),
-            p.interest = toFloat(mortgage.interest_rate),
-            p.start = mortgage.start_date,
-            p.status = mortgage.status,
-            p.tenure = mortgage.tenure,
-            p.customer_id = mortgage.customer_id;
+        session.run(
+            f"""
+            MATCH (c:Customer) WHERE c.lookup_phone IS NULL
+            CALL {{ WITH c SET {_customer_lookup_keys("c", "c")} }}
+            IN TRANSACTIONS OF {ETL_BATCH_SIZE} ROWS
+            """
+        ).consume()
 
-        """
-        session.run(query, {})
 
+def _row_hash(row: dict) -> str:
+    return hashlib.sha256(json.dumps(row, sort_keys=True).encode()).hexdigest()
 
-    LOGGER.info("Loading payments nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_MADE_CSV_PATH}' AS payments
-        MERGE (p:Payments {{id: payments.payment_made_id}})
-        SET
-            p.amount = toFloat(payments.amount),
-            p.payment_date = payments.payment_date,
-            p.customer_id = payments.customer_id;
-        """
-        session.run(query, {})
-    # Load Payments Due nodes
-    LOGGER.info("Loading PaymentsDue nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_DUE_CSV_PATH}' AS payments_due
-        MERGE (pd:PaymentsDue {{id: payments_due.payment_due_id}})
-        SET
-            pd.amount = toFloat(payments_due.amount),
-            pd.due_date = payments_due.due_date,
-            pd.status = payments_due.status,
-            pd.customer_id = payments_due.customer_id,
-            pd.mortgage_id = payments_due.mortgage_id;
 
-        """
-        session.run(query, {})
+def _coerced_batches(source: str, batches):
+    column_types = COLUMN_TYPES.get(source, {})
+    for batch in batches:
+        yield [coerce_row(row, column_types) for row in batch]
 
-    # Load Fees nodes
-    LOGGER.info("Loading Fees nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FEES_CSV_PATH}' AS fees
-        MERGE (f:Fees {{id: fees.fee_id}})
-        SET
-            f.type = fees.fee_type,
-            f.amount = toFloat(fees.amount),
-            f.date_incurred = fees.date_incurred,
-            f.status = fees.status,
-            f.customer_id = fees.customer_id,
-            f.mortgage_id = fees.mortgage_id;
-        """
-        session.run(query, {})
-
-    # add FAQs
-    LOGGER.info("Loading FAQs nodes (assuming a simple structure)")
-    # Note: No specific CSV for FAQs was provided, so this assumes a basic structure.
-    # You would need to create a 'faqs.csv' file with 'faq_id', 'question', 'answer' columns.
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FAQS_CSV_PATH}' AS faqs
-        MERGE (q:FAQs {{id: faqs.faq_id,
-                        question: faqs.question,
-                        answer: faqs.answer,
-                        topics: faqs.related_topics
-                        }});
-        """
-        session.run(query, {})     
-
-    LOGGER.info("Loading question nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{EXAMPLE_CYPHER_CSV_PATH}' AS questions
-        MERGE (Q:Question {{
-                         question: questions.question,
-                         cypher: questions.cypher
-                        }});
-        """
-        _ = session.run(query, {})
-
-    LOGGER.info("Creating HAS relationships between Customer and Mortgage nodes")
-    with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{MORTGAGE_CSV_PATH}' AS mortgage
-        MATCH (c:Customer {{id: mortgage.customer_id}})
-        MATCH (m:Mortgage {{id: mortgage.loan_number}})
-        MERGE (c)-[:HAS]->(m);
-        """
-        _ = session.run(query, {})
 
-    LOGGER.info("Creating MADE relationships between customer and payments")
+def _chunks(rows: list[dict]):
+    for start in range(0, len(rows), ETL_BATCH_SIZE):
+        yield rows[start : start + ETL_BATCH_SIZE]
+
+
+def _source_batches(source: str, keys: Optional[set] = None):
+    """Stream a source in batches, keeping only rows whose key is in `keys`
+    when given"""
+
+    _, key = SOURCES[source]
+    for batch in stream_batches(_local_path(source), ETL_BATCH_SIZE):
+        if keys is not None:
+            batch = [row for row in batch if row.get(key) in keys]
+        if batch:
+            yield batch
+
+
+def _unwind_query(step: LoadStep) -> str:
+    return f"UNWIND $rows AS row\n{step.cypher}"
+
+
+def _resync_query(step: LoadStep) -> str:
+    """Like _unwind_query, but first deletes the relationships each row
+    merged before, in the same transaction"""
+
+    if not step.stale_cypher:
+        return _unwind_query(step)
+    return f"""UNWIND $rows AS row
+    CALL {{
+        WITH row
+        {step.stale_cypher.strip()}
+    }}
+    {step.cypher}"""
+
+
+def _stage_sources() -> None:
+    """Copy or download every source once into the local cache"""
+
+    checksums = {}
+    if ETL_SOURCE_CHECKSUMS:
+        with open(ETL_SOURCE_CHECKSUMS) as f:
+            checksums = json.load(f)
+
+    cache = SourceCache(
+        ETL_CACHE_DIR,
+        local_data_dir=ETL_LOCAL_DATA_DIR,
+        offline=ETL_OFFLINE,
+        checksums=checksums,
+    )
+    for source, (path, _) in SOURCES.items():
+        STAGED_SOURCES[source] = cache.stage(path)
+    cache.prune({staged.sha256 for staged in STAGED_SOURCES.values()})
+
+
+def _local_path(source: str) -> str:
+    staged = STAGED_SOURCES.get(source)
+    return staged.local_path if staged else SOURCES[source][0]
+
+
+def _source_fingerprint(source: str) -> str:
+    staged = STAGED_SOURCES.get(source)
+    return staged.sha256 if staged else fingerprint_source(SOURCES[source][0])
+
+
+def _manifest_entry(source: str) -> dict:
+    path, key = SOURCES[source]
+    return {
+        "path": path,
+        "sha256": _source_fingerprint(source),
+        "rows": {
+            row[key]: _row_hash(row)
+            for batch in stream_batches(_local_path(source), ETL_BATCH_SIZE)
+            for row in batch
+            if row.get(key)
+        },
+    }
+
+
+def _read_manifest() -> dict:
+    if not os.path.exists(LOAD_MANIFEST_PATH):
+        return {}
+    with open(LOAD_MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest: dict) -> None:
+    os.makedirs(ETL_STATE_DIR, exist_ok=True)
+    tmp_path = f"{LOAD_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, LOAD_MANIFEST_PATH)
+
+
+def _read_load_marker(driver) -> Optional[str]:
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_MADE_CSV_PATH}' AS payments
-        MATCH (c:Customer {{id: payments.customer_id}})
-        MATCH (p:Payments {{id: payments.payment_made_id}})
-        MERGE (c)-[:MADE]->(p);
-        """
-        session.run(query, {})
+        record = session.run(
+            f"MATCH (m:{LOAD_MARKER_LABEL} {{name: 'bank'}}) RETURN m.load_id AS load_id"
+        ).single()
+    return record["load_id"] if record else None
 
-    LOGGER.info("Creating SCHEDULE relationships between mortgage and payments due")
+
+def _write_load_marker(driver, load_id: str) -> None:
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{PAYMENTS_DUE_CSV_PATH}' AS payments_due
-        MATCH (m:Mortgage {{id: payments_due.mortgage_id}})
-        MATCH (pd:PaymentsDue {{id: payments_due.payment_due_id}})
-        MERGE (m)-[:SCHEDULE]->(pd);
-        """
-        session.run(query, {})
+        session.run(
+            f"""
+            MERGE (m:{LOAD_MARKER_LABEL} {{name: 'bank'}})
+            SET m.load_id = $load_id, m.loaded_at = datetime()
+            """,
+            {"load_id": load_id},
+        ).consume()
 
-    LOGGER.info("Creating HAS relationships between mortgage and fees nodes")
+
+def _load_step_with_load_csv(driver, step: LoadStep) -> None:
+    # Neo4j fetches the file itself here, so the local cache is not used
+    path, _ = SOURCES[step.source]
+    body = step.cypher.strip().rstrip(";")
+    query = f"""
+    LOAD CSV WITH HEADERS
+    FROM '{path}' AS row
+    CALL {{
+        WITH row
+        {body}
+    }} IN TRANSACTIONS OF {ETL_BATCH_SIZE} ROWS
+    """
+    # CALL {} IN TRANSACTIONS needs an implicit (auto-commit) transaction
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FEES_CSV_PATH}' AS fees
-        MATCH (m:Mortgage {{id: fees.mortgage_id}})
-        MATCH (f:Fees {{id: fees.fee_id}})
-        MERGE (m)-[:HAS]->(f);
-        """
-        session.run(query, {})
+        session.run(query, {}).consume()
+
+
+def _load_step_with_unwind(driver, step: LoadStep, checkpoint: LoadCheckpoint) -> None:
+    path = _local_path(step.source)
+    checkpoint.start_step(step.name, _source_fingerprint(step.source))
+    batches = _coerced_batches(step.source, stream_batches(path, ETL_BATCH_SIZE))
+    run_batches(
+        driver,
+        _unwind_query(step),
+        batches,
+        step=step.name,
+        parallelism=ETL_PARALLELISM,
+        checkpoint=checkpoint,
+    )
+
+
+def _step_dependencies(step: LoadStep) -> tuple[str, ...]:
+    """Names of the node steps that load the endpoint labels of a
+    relationship step"""
+
+    label_steps = {node_step.label: node_step.name for node_step in NODE_STEPS}
+    return tuple(label_steps[label] for label in step.endpoints)
+
+
+def load_full(driver) -> dict:
+    """Clear the database and reload every source. With the UNWIND loader,
+    a failed load resumes from its last committed batch on the next run."""
+
+    checkpoint = LoadCheckpoint(LOAD_CHECKPOINT_PATH)
+    if checkpoint.exists and ETL_LOADER == "unwind":
+        LOGGER.info("Resuming interrupted load from checkpoint")
+    else:
+        LOGGER.info("Clearing existing graph data...")
+        with driver.session(database="neo4j") as session:
+            session.run("MATCH (n) DETACH DELETE n;")
+        LOGGER.info("Existing graph data cleared.")
+
+    _set_up_schema(driver)
+
+    def load_step(step: LoadStep) -> None:
+        if checkpoint.is_step_complete(step.name):
+            LOGGER.info(f"{step.name} already loaded, skipping")
+            return
+
+        LOGGER.info(f"Loading {step.name}")
+        if ETL_LOADER == "load_csv":
+            _load_step_with_load_csv(driver, step)
+        else:
+            _load_step_with_unwind(driver, step, checkpoint)
+            checkpoint.complete_step(step.name)
+
+    # Node labels load concurrently, and each relationship type starts as
+    # soon as both of its endpoint labels are loaded
+    tasks = [
+        Task(step.name, lambda step=step: load_step(step)) for step in NODE_STEPS
+    ] + [
+        Task(
+            step.name,
+            lambda step=step: load_step(step),
+            depends_on=_step_dependencies(step),
+        )
+        for step in RELATIONSHIP_STEPS
+    ]
+    timings = timing_report(run_dag(tasks, max_workers=ETL_STEP_WORKERS))
+    log_timing_report(timings)
+
+    checkpoint.clear()
+
+    sources = {source: _manifest_entry(source) for source in SOURCES}
+    changes = {source: {"status": "reloaded"} for source in SOURCES}
+
+    return {"sources": sources, "changes": changes, "timings": timings}
+
+
+def _sweep_missing(driver, step: LoadStep, key: str, row_keys) -> int:
+    """Delete the nodes of `step` whose id is not in the source, in
+    batches. Used when there is no previous manifest to diff against."""
 
-    LOGGER.info("Creating MAY INCUR relationships between mortgage and fees nodes")
     with driver.session(database="neo4j") as session:
-        query = f"""
-        LOAD CSV WITH HEADERS
-        FROM '{FEES_CSV_PATH}' AS fees
-        MATCH (pd:PaymentsDue {{customer_id: fees.customer_id, mortgage_id: fees.mortgage_id}})
-        MATCH (f:Fees {{id: fees.fee_id}})
-        WHERE fees.status = 'Due' // Assuming fees are incurred when payment is due and status is 'Due'
-        MERGE (pd)-[:MAY_INCUR]->(f);
-        """
-        # NOTE: This query assumes `payments_due` nodes have `customer_id` and `mortgage_id` properties
-        # which they do based on the CSV. It also assumes `fees.csv` has these IDs for linking.
-        session.run(query, {})
+        existing = set(
+            session.run(f"MATCH (n:{step.label}) RETURN n.id AS id").value("id")
+        )
+        # The CSV keys as node ids, converted the way the load step does
+        kept = set()
+        for batch in _chunks([{key: k} for k in row_keys]):
+            kept.update(
+                session.run(
+                    f"UNWIND $rows AS row RETURN {step.id_expression} AS id",
+                    {"rows": batch},
+                ).value("id")
+            )
+
+    stale = [{"id": node_id} for node_id in existing - kept]
+    delete_query = f"""
+    UNWIND $rows AS row
+    MATCH (n:{step.label} {{id: row.id}})
+    DETACH DELETE n;
+    """
+    run_batches(driver, delete_query, _chunks(stale), step=step.name)
+    return len(stale)
+
+
+def _sync_source(driver, source: str, previous: Optional[dict]) -> tuple:
+    """Upsert new and changed rows of a source and delete removed ones,
+    streaming the file. Returns its manifest entry, its change summary and,
+    when the file changed, the keys of its new and changed rows."""
+
+    path, key = SOURCES[source]
+    fingerprint = _source_fingerprint(source)
+
+    if previous and previous.get("sha256") == fingerprint:
+        LOGGER.info(f"{source} is unchanged, skipping")
+        return previous, {"status": "unchanged"}, None
+
+    previous_hashes = (previous or {}).get("rows", {})
+    row_hashes: dict[str, str] = {}
+    upserted: set = set()
+
+    def upsert_batches():
+        # Row hashes are collected while the file streams through the upsert
+        for batch in _source_batches(source):
+            changed = []
+            for row in batch:
+                if not row.get(key):
+                    continue
+                row_hashes[row[key]] = _row_hash(row)
+                if previous_hashes.get(row[key]) != row_hashes[row[key]]:
+                    upserted.add(row[key])
+                    changed.append(row)
+            if changed:
+                yield changed
+
+    steps = [step for step in NODE_STEPS if step.source == source]
+    for step in steps:
+        LOGGER.info(f"Loading {step.name}")
+        run_batches(
+            driver,
+            _unwind_query(step),
+            _coerced_batches(source, upsert_batches()),
+            step=step.name,
+            parallelism=ETL_PARALLELISM,
+        )
+    if not steps:
+        for _ in upsert_batches():
+            pass
+
+    deleted = 0
+    for step in [step for step in steps if step.delete_missing]:
+        if previous:
+            delete_query = f"""
+            UNWIND $rows AS row
+            MATCH (n:{step.label} {{id: {step.id_expression}}})
+            DETACH DELETE n;
+            """
+            deleted_rows = [{key: k} for k in previous_hashes if k not in row_hashes]
+            run_batches(driver, delete_query, _chunks(deleted_rows), step=step.name)
+            deleted = len(deleted_rows)
+        else:
+            # Without a previous manifest, sweep nodes missing from the CSV
+            deleted = _sweep_missing(driver, step, key, row_hashes)
+
+    LOGGER.info(
+        f"{source}: {len(upserted)} new or changed rows, {deleted} removed rows"
+    )
+
+    entry = {"path": path, "sha256": fingerprint, "rows": row_hashes}
+    change = {"status": "changed", "upserted": len(upserted), "deleted": deleted}
+    return entry, change, upserted
+
+
+def load_incremental(driver, previous_manifest: dict) -> dict:
+    """Upsert rows that changed since the previous load and delete rows
+    that disappeared, skipping source files whose fingerprint is unchanged"""
+
+    _set_up_schema(driver)
+
+    previous_sources = previous_manifest.get("sources", {})
+    label_sources = {step.label: step.source for step in NODE_STEPS}
+    results = {}
+
+    def sync(source: str) -> None:
+        results[source] = _sync_source(driver, source, previous_sources.get(source))
+
+    # Relationships are re-synced for changed rows of their own source, and
+    # for every row when a source of one of their endpoint labels changed,
+    # since new, changed or deleted endpoint nodes can add or remove
+    # relationships of rows that did not change themselves. Each re-synced
+    # row drops the relationships it owns before merging them again, so the
+    # graph ends up the same as after a full load
+    def merge_relationships(step: LoadStep) -> None:
+        diffs = {
+            source: result[2] for source, result in results.items() if result[2] is not None
+        }
+        endpoint_sources = {label_sources[label] for label in step.endpoints}
+        if any(source in diffs for source in endpoint_sources - {step.source}):
+            batches = _source_batches(step.source)
+        elif step.source in diffs:
+            batches = _source_batches(step.source, diffs[step.source])
+        else:
+            return
+
+        LOGGER.info(f"Creating {step.name}")
+        run_batches(
+            driver,
+            _resync_query(step),
+            _coerced_batches(step.source, batches),
+            step=step.name,
+            parallelism=ETL_PARALLELISM,
+        )
+
+    tasks = [Task(source, lambda source=source: sync(source)) for source in SOURCES]
+    tasks += [
+        Task(
+            step.name,
+            lambda step=step: merge_relationships(step),
+            depends_on=tuple(
+                {step.source} | {label_sources[label] for label in step.endpoints}
+            ),
+        )
+        for step in RELATIONSHIP_STEPS
+    ]
+    timings = timing_report(run_dag(tasks, max_workers=ETL_STEP_WORKERS))
+    log_timing_report(timings)
+
+    sources = {source: results[source][0] for source in SOURCES}
+    changes = {source: results[source][1] for source in SOURCES}
+
+    return {"sources": sources, "changes": changes, "timings": timings}
+
+
+@retry(tries=100, delay=10)
+def load_bank_graph_from_csv() -> None:
+    """Load structured bank CSV data following
+    a specific ontology into Neo4j"""
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    started_at = datetime.now(timezone.utc).isoformat()
+
+    _stage_sources()
+
+    previous_manifest = _read_manifest()
+    load_marker = _read_load_marker(driver)
+    if previous_manifest and (
+        load_marker is None or previous_manifest.get("load_id") != load_marker
+    ):
+        # The database was wiped or replaced since the manifest was written
+        # (or the manifest predates load markers), so nothing in it can be
+        # assumed to be loaded
+        LOGGER.warning(
+            "Load manifest does not match the database, re-syncing every source"
+        )
+        previous_manifest = {}
+
+    if ETL_LOAD_MODE == "full":
+        manifest = load_full(driver)
+    else:
+        manifest = load_incremental(driver, previous_manifest)
+
+    load_id = str(uuid.uuid4())
+    _write_load_marker(driver, load_id)
+    manifest.update(
+        {
+            "load_id": load_id,
+            "mode": ETL_LOAD_MODE,
+            "started_at": started_at,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "staged": {
+                source: {"origin": staged.origin, "size": staged.size}
+                for source, staged in STAGED_SOURCES.items()
+            },
+        }
+    )
+    _write_manifest(manifest)
+    LOGGER.info(f"Load manifest written to {LOAD_MANIFEST_PATH}")
+    driver.close()
 
 
 if __name__ == "__main__":
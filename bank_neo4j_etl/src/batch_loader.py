@@ -0,0 +1,168 @@
+"""Streaming, batched UNWIND loading with per-batch checkpoints."""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+@contextmanager
+def open_source_binary(path: str):
+    """Open a source CSV from a URL or a local path as a byte stream"""
+
+    if "://" in path and not path.startswith("file://"):
+        with urllib.request.urlopen(path) as response:
+            yield response
+    else:
+        with open(path.removeprefix("file://"), "rb") as f:
+            yield f
+
+
+@contextmanager
+def open_source(path: str):
+    """Open a source CSV from a URL or a local path as a text stream"""
+
+    with open_source_binary(path) as f:
+        yield io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+
+
+def fingerprint_source(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a source CSV, computed without holding it in memory"""
+
+    digest = hashlib.sha256()
+    with open_source_binary(path) as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stream_batches(path: str, batch_size: int) -> Iterator[list[dict]]:
+    """Read a CSV in fixed-size chunks of row dicts, with empty fields as
+    null like LOAD CSV, without holding the whole file in memory"""
+
+    with open_source(path) as f:
+        rows = (
+            {key: (value if value != "" else None) for key, value in row.items()}
+            for row in csv.DictReader(f)
+        )
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+
+def coerce_row(row: dict, column_types: dict[str, Callable]) -> dict:
+    """Convert CSV strings to typed values; unparsable values become null,
+    matching what toFloat()/toInteger() do in Cypher"""
+
+    coerced = dict(row)
+    for column, converter in column_types.items():
+        value = coerced.get(column)
+        if value is None:
+            continue
+        try:
+            coerced[column] = converter(value)
+        except (TypeError, ValueError):
+            coerced[column] = None
+    return coerced
+
+
+class LoadCheckpoint:
+    """Records which batches of which steps were committed, so a failed
+    load can resume where it stopped instead of starting over"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {"fingerprints": {}, "completed_steps": [], "batches": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def start_step(self, step: str, fingerprint: Optional[str]) -> None:
+        """Forget committed batches of a step whose source has changed"""
+
+        with self._lock:
+            if self.state["fingerprints"].get(step) != fingerprint:
+                self.state["fingerprints"][step] = fingerprint
+                self.state["batches"][step] = []
+                self._save()
+
+    def is_step_complete(self, step: str) -> bool:
+        return step in self.state["completed_steps"]
+
+    def is_batch_done(self, step: str, batch_index: int) -> bool:
+        return batch_index in self.state["batches"].get(step, [])
+
+    def mark_batch_done(self, step: str, batch_index: int) -> None:
+        with self._lock:
+            self.state["batches"].setdefault(step, []).append(batch_index)
+            self._save()
+
+    def complete_step(self, step: str) -> None:
+        with self._lock:
+            self.state["completed_steps"].append(step)
+            self.state["batches"].pop(step, None)
+            self._save()
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+def run_batches(
+    driver,
+    query: str,
+    batches: Iterable[list[dict]],
+    *,
+    step: str,
+    parallelism: int = 1,
+    checkpoint: Optional[LoadCheckpoint] = None,
+    database: str = "neo4j",
+) -> int:
+    """Send each batch through `query` (which reads `$rows`) in its own
+    managed write transaction, with up to `parallelism` batches in flight.
+    Returns the number of rows written."""
+
+    def write_batch(batch_index: int, rows: list[dict]) -> int:
+        with driver.session(database=database) as session:
+            session.execute_write(lambda tx: tx.run(query, {"rows": rows}).consume())
+        if checkpoint:
+            checkpoint.mark_batch_done(step, batch_index)
+        return len(rows)
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=max(parallelism, 1)) as executor:
+        in_flight = set()
+        for batch_index, rows in enumerate(batches):
+            if checkpoint and checkpoint.is_batch_done(step, batch_index):
+                continue
+            # Bound the number of queued batches so large files stream
+            if len(in_flight) >= 2 * max(parallelism, 1):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                written += sum(future.result() for future in done)
+            in_flight.add(executor.submit(write_batch, batch_index, rows))
+
+        written += sum(future.result() for future in in_flight)
+
+    LOGGER.info(f"{step}: wrote {written} rows")
+    return written
@@ -0,0 +1,160 @@
+"""Dependency-aware, concurrent execution of ETL load steps."""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class Task:
+    """A load step and the names of the tasks it has to wait for"""
+
+    name: str
+    run: Callable[[], object]
+    depends_on: tuple = ()
+
+
+@dataclass
+class TaskTiming:
+    name: str
+    queued_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = "pending"
+    error: Optional[str] = None
+    result: object = field(default=None, repr=False)
+
+    @property
+    def seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def as_dict(self, origin: float) -> dict:
+        return {
+            "status": self.status,
+            "started": _offset(self.started_at, origin),
+            "finished": _offset(self.finished_at, origin),
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "error": self.error,
+        }
+
+
+def _offset(timestamp: Optional[float], origin: float) -> Optional[float]:
+    return round(timestamp - origin, 3) if timestamp is not None else None
+
+
+class DependencyError(ValueError):
+    """Raised for unknown dependencies or dependency cycles"""
+
+
+def _check_graph(tasks: dict[str, Task]) -> None:
+    for task in tasks.values():
+        unknown = set(task.depends_on) - tasks.keys()
+        if unknown:
+            raise DependencyError(f"{task.name} depends on unknown tasks {unknown}")
+
+    visiting, visited = set(), set()
+
+    def visit(name: str) -> None:
+        if name in visited:
+            return
+        if name in visiting:
+            raise DependencyError(f"Dependency cycle through {name}")
+        visiting.add(name)
+        for dependency in tasks[name].depends_on:
+            visit(dependency)
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in tasks:
+        visit(name)
+
+
+def run_dag(tasks: list[Task], max_workers: int = 4) -> dict[str, TaskTiming]:
+    """Run every task on a thread pool as soon as all of its dependencies
+    have finished. A failed task skips its dependents, the remaining
+    tasks still run, and the first failure is re-raised at the end."""
+
+    by_name = {task.name: task for task in tasks}
+    _check_graph(by_name)
+
+    origin = time.perf_counter()
+    timings = {name: TaskTiming(name, queued_at=origin) for name in by_name}
+    remaining = dict(by_name)
+    first_error: Optional[BaseException] = None
+
+    def execute(task: Task):
+        timings[task.name].started_at = time.perf_counter()
+        try:
+            return task.run()
+        finally:
+            timings[task.name].finished_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        running = {}
+        while remaining or running:
+            for name, task in list(remaining.items()):
+                statuses = [timings[d].status for d in task.depends_on]
+                if any(status in ("failed", "skipped") for status in statuses):
+                    timings[name].status = "skipped"
+                    LOGGER.warning(f"{name}: skipped, a dependency did not load")
+                    del remaining[name]
+                elif all(status == "done" for status in statuses):
+                    timings[name].status = "running"
+                    running[executor.submit(execute, task)] = name
+                    del remaining[name]
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                timing = timings[name]
+                try:
+                    timing.result = future.result()
+                    timing.status = "done"
+                    LOGGER.info(f"{name}: finished in {timing.seconds:.2f}s")
+                except Exception as e:
+                    timing.status = "failed"
+                    timing.error = repr(e)
+                    LOGGER.error(f"{name}: failed after {timing.seconds:.2f}s: {e!r}")
+                    first_error = first_error or e
+
+    if first_error:
+        raise first_error
+
+    return timings
+
+
+def timing_report(timings: dict[str, TaskTiming]) -> dict:
+    """Per-step timings relative to the start of the run, plus the wall time
+    and the summed step time it replaced"""
+
+    if not timings:
+        return {"wall_seconds": 0.0, "step_seconds": 0.0, "steps": {}}
+
+    origin = min(timing.queued_at for timing in timings.values())
+    finished = [t.finished_at for t in timings.values() if t.finished_at is not None]
+    return {
+        "wall_seconds": round(max(finished, default=origin) - origin, 3),
+        "step_seconds": round(sum(t.seconds or 0.0 for t in timings.values()), 3),
+        "steps": {name: timing.as_dict(origin) for name, timing in timings.items()},
+    }
+
+
+def log_timing_report(report: dict) -> None:
+    for name, step in sorted(
+        report["steps"].items(), key=lambda item: item[1]["started"] or 0.0
+    ):
+        seconds = f"{step['seconds']:.2f}s" if step["seconds"] is not None else "-"
+        LOGGER.info(f"  {name:<40} {step['status']:<8} {seconds:>8}")
+    LOGGER.info(
+        f"Loaded in {report['wall_seconds']:.2f}s wall time "
+        f"({report['step_seconds']:.2f}s of summed step time)"
+    )
@@ -0,0 +1,163 @@
+"""Content-addressed local cache of the ETL source CSVs."""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from batch_loader import open_source_binary
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ChecksumMismatchError(ValueError):
+    """Raised when a staged source does not match its pinned checksum"""
+
+
+@dataclass(frozen=True)
+class StagedSource:
+    """A source CSV copied into the cache under its SHA-256"""
+
+    original_path: str
+    local_path: str
+    sha256: str
+    size: int
+    origin: str  # "local", "network", "cache"
+
+
+def _sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SourceCache:
+    """Stages every source once into `cache_dir/<sha256>.csv` so all load
+    steps read the same validated local copy.
+
+    A file with the same name in `local_data_dir` is preferred over the
+    remote source, and in `offline` mode the last staged copy of a source is
+    reused instead of fetching it. `checksums` pins the expected SHA-256 of
+    sources by file name.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        local_data_dir: Optional[str] = None,
+        offline: bool = False,
+        checksums: Optional[dict[str, str]] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.local_data_dir = local_data_dir
+        self.offline = offline
+        self.checksums = checksums or {}
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _record(self, staged: StagedSource) -> None:
+        with self._lock:
+            index = self._read_index()
+            index[staged.original_path] = asdict(staged)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+
+    def _local_copy(self, path: str) -> Optional[str]:
+        if path.startswith("file://") or "://" not in path:
+            return path.removeprefix("file://")
+        if self.local_data_dir:
+            candidate = os.path.join(self.local_data_dir, os.path.basename(path))
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def _cached_copy(self, path: str) -> Optional[StagedSource]:
+        entry = self._read_index().get(path)
+        if not entry or not os.path.exists(entry["local_path"]):
+            return None
+        # Re-hash so a truncated or edited cache file is never served
+        if _sha256_file(entry["local_path"]) != entry["sha256"]:
+            LOGGER.warning(f"Cached copy of {path} is corrupt, discarding it")
+            os.remove(entry["local_path"])
+            return None
+        return StagedSource(**{**entry, "origin": "cache"})
+
+    def _validate(self, path: str, sha256: str) -> None:
+        expected = self.checksums.get(os.path.basename(path))
+        if expected and expected != sha256:
+            raise ChecksumMismatchError(
+                f"{path} has sha256 {sha256}, expected {expected}"
+            )
+
+    def stage(self, path: str) -> StagedSource:
+        """Copy or download `path` into the cache once, hashing it on the way"""
+
+        local_copy = self._local_copy(path)
+        if local_copy is None and self.offline:
+            staged = self._cached_copy(path)
+            if staged is None:
+                raise FileNotFoundError(
+                    f"{path} is not available offline: no local copy and "
+                    "nothing cached"
+                )
+            self._validate(path, staged.sha256)
+            return staged
+
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".part", delete=False
+        ) as tmp:
+            with open_source_binary(local_copy or path) as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        try:
+            self._validate(path, sha256)
+        except ChecksumMismatchError:
+            os.remove(tmp.name)
+            raise
+
+        local_path = os.path.join(self.cache_dir, f"{sha256}.csv")
+        if os.path.exists(local_path):
+            os.remove(tmp.name)
+        else:
+            shutil.move(tmp.name, local_path)
+
+        staged = StagedSource(
+            original_path=path,
+            local_path=local_path,
+            sha256=sha256,
+            size=size,
+            origin="local" if local_copy else "network",
+        )
+        self._record(staged)
+        LOGGER.info(f"Staged {path} ({size} bytes, {staged.origin}) as {sha256[:12]}")
+        return staged
+
+    def prune(self, keep: set[str]) -> None:
+        """Remove cached files whose hash is not in `keep`"""
+
+        for name in os.listdir(self.cache_dir):
+            sha256, extension = os.path.splitext(name)
+            if extension == ".csv" and sha256 not in keep:
+                os.remove(os.path.join(self.cache_dir, name))
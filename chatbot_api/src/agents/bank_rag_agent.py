@@ -12,6 +12,8 @@ from typing import Any, Optional
 from src.chains.bank_faq_chain import faq_vector_chain
 from src.chains.bank_cypher_chain import bank_cypher_chain
 from src.tools.wait_times import get_current_wait_times, get_most_available_branch
+from src.utils.deadlines import check_deadline
+from src.utils.tracing import AGENT_VERBOSE
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -40,6 +42,7 @@ def explore_product_faqs(question: str) -> str:
     payment plans and interest rates.
     """
 
+    check_deadline()
     return faq_vector_chain.invoke(question)
 
 # ✅ REPLACED OLD TOOL WITH ARGS_SCHEMA-BASED TOOL
@@ -49,6 +52,7 @@ def explore_bank_database_tool(question: str, customer_id: Optional[str] = None,
     Answers questions about customers and their financial data. 
     If the role is 'Customer', restrict results to the given customer_id.
     """
+    check_deadline()
     return bank_cypher_chain.invoke({
         "question": question,
         "customer_id": customer_id,
@@ -116,6 +120,6 @@ bank_rag_agent = (
 bank_rag_agent_executor = AgentExecutor(
     agent=bank_rag_agent,
     tools=agent_tools,
-    verbose=True,
+    verbose=AGENT_VERBOSE,
     return_intermediate_steps=True,
 )
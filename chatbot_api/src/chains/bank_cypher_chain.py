@@ -3,8 +3,15 @@ from langchain_community.graphs import Neo4jGraph
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain_community.vectorstores.neo4j_vector import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
 from src.langchain_custom.graph_qa.cypher import GraphCypherQAChain
+from src.langchain_custom.graph_qa.cypher_guard import CypherGuard
+from src.langchain_custom.graph_qa.few_shot import ScoredVectorStoreRetriever
+from src.utils.embeddings import (
+    embedding_properties,
+    resolve_vector_index,
+    text_retrieval_query,
+)
+from src.utils.tracing import AGENT_VERBOSE
 
 # --- environment config ---
 NEO4J_URI = os.getenv("NEO4J_URI")
@@ -22,6 +29,16 @@ NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY = os.getenv(
 )
 NEO4J_CYPHER_EXAMPLES_NODE_NAME = os.getenv("NEO4J_CYPHER_EXAMPLES_NODE_NAME")
 NEO4J_CYPHER_EXAMPLES_METADATA_NAME = os.getenv("NEO4J_CYPHER_EXAMPLES_METADATA_NAME")
+CYPHER_EXAMPLES_TOKEN_BUDGET = int(os.getenv("CYPHER_EXAMPLES_TOKEN_BUDGET", "800"))
+CYPHER_EXAMPLES_MIN_SIMILARITY = float(
+    os.getenv("CYPHER_EXAMPLES_MIN_SIMILARITY", "0.85")
+)
+CYPHER_CONTEXT_TOKEN_BUDGET = int(os.getenv("CYPHER_CONTEXT_TOKEN_BUDGET", "1500"))
+# Generated queries run read-only under this server-side timeout (seconds),
+# after an EXPLAIN that rejects plans estimated above the row limit
+CYPHER_QUERY_TIMEOUT = float(os.getenv("CYPHER_QUERY_TIMEOUT", "10"))
+CYPHER_MAX_ESTIMATED_ROWS = float(os.getenv("CYPHER_MAX_ESTIMATED_ROWS", "1000000"))
+CYPHER_EXPLAIN_GUARD = os.getenv("CYPHER_EXPLAIN_GUARD", "true").lower() == "true"
 
 # --- graph connection ---
 graph = Neo4jGraph(
@@ -33,21 +50,35 @@ graph = Neo4jGraph(
 graph.refresh_schema()
 
 # --- vector index ---
+# Follows the index alias, so a migrated (e.g. reduced-dimension) index is
+# searched with the model it was built with
+cypher_example_target = resolve_vector_index(graph, NEO4J_CYPHER_EXAMPLES_INDEX_NAME)
 cypher_example_index = Neo4jVector.from_existing_graph(
-    embedding=OpenAIEmbeddings(),
+    embedding=cypher_example_target.query_embeddings(),
     url=NEO4J_URI,
     username=NEO4J_USERNAME,
     password=NEO4J_PASSWORD,
-    index_name=NEO4J_CYPHER_EXAMPLES_INDEX_NAME,
+    index_name=cypher_example_target.index_name,
     node_label=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY.capitalize(),
     text_node_properties=[
         NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
     ],
     text_node_property=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
-    embedding_node_property="embedding",
+    embedding_node_property=cypher_example_target.embedding_property,
+    # Returns only the example's Cypher, never a vector of another index
+    retrieval_query=text_retrieval_query(
+        [NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY],
+        embedding_properties(graph, NEO4J_CYPHER_EXAMPLES_INDEX_NAME),
+        [NEO4J_CYPHER_EXAMPLES_METADATA_NAME]
+        if NEO4J_CYPHER_EXAMPLES_METADATA_NAME
+        else None,
+    ),
 )
 
-cypher_example_retriever = cypher_example_index.as_retriever(search_kwargs={"k": 8})
+# Keeps the similarity of each example for the token-budgeted packing
+cypher_example_retriever = ScoredVectorStoreRetriever(
+    vectorstore=cypher_example_index, search_kwargs={"k": 8}
+)
 
 # --- cypher prompt ---
 cypher_generation_prompt = PromptTemplate(
@@ -102,9 +133,26 @@ _raw_bank_cypher_chain = GraphCypherQAChain.from_llm(
     cypher_llm=ChatOpenAI(model=BANK_CYPHER_MODEL, temperature=0),
     qa_llm=ChatOpenAI(model=BANK_QA_MODEL, temperature=0),
     cypher_example_retriever=cypher_example_retriever,
+    example_token_budget=CYPHER_EXAMPLES_TOKEN_BUDGET,
+    example_min_similarity=CYPHER_EXAMPLES_MIN_SIMILARITY,
+    # Without a configured key every metadata key is shown with the examples
+    example_metadata_keys=(
+        [NEO4J_CYPHER_EXAMPLES_METADATA_NAME]
+        if NEO4J_CYPHER_EXAMPLES_METADATA_NAME
+        else None
+    ),
+    example_structure_key=NEO4J_CYPHER_EXAMPLES_METADATA_NAME,
     node_properties_to_exclude=["embedding"],
+    context_format="table",
+    context_token_budget=CYPHER_CONTEXT_TOKEN_BUDGET,
+    deterministic_answers=True,
+    cypher_guard=CypherGuard(
+        timeout=CYPHER_QUERY_TIMEOUT,
+        explain=CYPHER_EXPLAIN_GUARD,
+        max_estimated_rows=CYPHER_MAX_ESTIMATED_ROWS,
+    ),
     graph=graph,
-    verbose=True,
+    verbose=AGENT_VERBOSE,
     qa_prompt=qa_generation_prompt,
     cypher_prompt=cypher_generation_prompt,
     validate_cypher=True,
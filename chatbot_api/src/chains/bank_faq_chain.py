@@ -1,6 +1,7 @@
+import logging
 import os
+from langchain_community.graphs import Neo4jGraph
 from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
 from langchain.chains import RetrievalQA
 from langchain_openai import ChatOpenAI
 from langchain.prompts import (
@@ -10,28 +11,124 @@ from langchain.prompts import (
     ChatPromptTemplate,
 )
 
+from src.langchain_custom.faq_answers import DirectAnswerFAQChain
+from src.langchain_custom.retrievers.faq import (
+    CANONICAL_ANSWER_RETRIEVAL_QUERY,
+    CollapsedFAQRetriever,
+    HybridFAQRetriever,
+    TopicInferrer,
+    neo4j_fulltext_search,
+    neo4j_topic_examples,
+    neo4j_topic_filtered_search,
+)
+from src.utils.embeddings import (
+    embedding_properties,
+    resolve_vector_index,
+    text_retrieval_query,
+)
+
 from dotenv import load_dotenv
 load_dotenv()
 
+LOGGER = logging.getLogger(__name__)
 
 BANK_QA_MODEL = os.getenv("BANK_QA_MODEL")
 
-neo4j_vector_index = Neo4jVector.from_existing_graph(
-    embedding=OpenAIEmbeddings(),
+# Must match the layout written by scripts/index_faqs.py
+FAQ_INDEX_LAYOUT = os.getenv("FAQ_INDEX_LAYOUT", "canonical")
+FAQ_RETRIEVAL_K = int(os.getenv("FAQ_RETRIEVAL_K", "4"))
+# Raw cosine similarity (not Neo4j's (1 + cosine) / 2 score) at or above
+# which the top canonical answer is returned as-is, without the QA LLM call.
+# Off unless set: distinct banking questions are often 0.9 similar
+FAQ_DIRECT_ANSWER_MIN_COSINE = os.getenv("FAQ_DIRECT_ANSWER_MIN_COSINE")
+# "hybrid" fuses full-text and vector search, "vector" uses vector search only
+FAQ_RETRIEVAL_MODE = os.getenv("FAQ_RETRIEVAL_MODE", "hybrid")
+# Full-text (Lucene) score above which a clear keyword winner skips the
+# vector search entirely; unset disables the fast path
+FAQ_FULLTEXT_FAST_SCORE = os.getenv("FAQ_FULLTEXT_FAST_SCORE")
+# Restrict vector search to the FAQ topics inferred from the question
+FAQ_TOPIC_FILTER = os.getenv("FAQ_TOPIC_FILTER", "true").lower() == "true"
+
+faq_graph = Neo4jGraph(
     url=os.getenv("NEO4J_URI"),
     username=os.getenv("NEO4J_USERNAME"),
     password=os.getenv("NEO4J_PASSWORD"),
-    index_name="faqs",
-    node_label="FAQs",
-    text_node_properties=[
-        "question",
-        "answer",
-        "related_topics",
+    refresh_schema=False,
+)
+faq_index_alias = "faq_answers" if FAQ_INDEX_LAYOUT == "canonical" else "faqs"
+# scripts/index_faqs.py switches this alias once a re-embedded index is built
+faq_index_target = resolve_vector_index(faq_graph, faq_index_alias)
+
+if FAQ_INDEX_LAYOUT == "canonical":
+    neo4j_vector_index = Neo4jVector.from_existing_index(
+        embedding=faq_index_target.query_embeddings(),
+        url=os.getenv("NEO4J_URI"),
+        username=os.getenv("NEO4J_USERNAME"),
+        password=os.getenv("NEO4J_PASSWORD"),
+        index_name=faq_index_target.index_name,
+        embedding_node_property=faq_index_target.embedding_property,
+        retrieval_query=CANONICAL_ANSWER_RETRIEVAL_QUERY,
+    )
+else:
+    neo4j_vector_index = Neo4jVector.from_existing_graph(
+        embedding=faq_index_target.query_embeddings(),
+        url=os.getenv("NEO4J_URI"),
+        username=os.getenv("NEO4J_USERNAME"),
+        password=os.getenv("NEO4J_PASSWORD"),
+        index_name=faq_index_target.index_name,
+        node_label="FAQs",
+        text_node_properties=[
+            "question",
+            "answer",
+            "related_topics",
 
-    ],
-    embedding_node_property="embedding",
+        ],
+        embedding_node_property=faq_index_target.embedding_property,
+        retrieval_query=text_retrieval_query(
+            ["question", "answer", "related_topics"],
+            embedding_properties(faq_graph, faq_index_alias),
+        ),
+    )
+
+faq_node_label = "FAQAnswer" if FAQ_INDEX_LAYOUT == "canonical" else "FAQs"
+topic_inferrer = topic_search = None
+if FAQ_TOPIC_FILTER:
+    topic_examples = neo4j_topic_examples(neo4j_vector_index, faq_node_label)
+    if topic_examples:
+        topic_inferrer = TopicInferrer.from_examples(topic_examples)
+        topic_search = neo4j_topic_filtered_search(neo4j_vector_index, faq_node_label)
+    else:
+        LOGGER.warning(
+            "FAQ_TOPIC_FILTER is enabled but no FAQ has topics (the FAQ CSV "
+            "needs a related_topics column), so FAQ search is not topic-filtered"
+        )
+
+faq_retriever = CollapsedFAQRetriever(
+    vectorstore=neo4j_vector_index,
+    k=FAQ_RETRIEVAL_K,
+    # Question-per-row indexes need more candidates to fill k distinct answers
+    fetch_k=FAQ_RETRIEVAL_K if FAQ_INDEX_LAYOUT == "canonical" else 12,
+    topic_inferrer=topic_inferrer,
+    topic_search=topic_search,
 )
 
+if FAQ_RETRIEVAL_MODE == "hybrid":
+    faq_retriever = HybridFAQRetriever(
+        vector_retriever=faq_retriever,
+        fulltext_search=neo4j_fulltext_search(
+            neo4j_vector_index,
+            labels=(
+                (faq_node_label, "FAQVariant")
+                if FAQ_INDEX_LAYOUT == "canonical"
+                else (faq_node_label,)
+            ),
+        ),
+        k=FAQ_RETRIEVAL_K,
+        fulltext_fast_score=(
+            float(FAQ_FULLTEXT_FAST_SCORE) if FAQ_FULLTEXT_FAST_SCORE else None
+        ),
+    )
+
 review_template = """Your job is to use the provided product FAQs 
 to answer questions about general mortgage-related queries.Add commentMore actions
 Use ONLY the following context to answer questions.
@@ -54,9 +151,21 @@ faq_prompt = ChatPromptTemplate(
     input_variables=["context", "question"], messages=messages
 )
 
-faq_vector_chain = RetrievalQA.from_chain_type(
+_raw_faq_vector_chain = RetrievalQA.from_chain_type(
     llm=ChatOpenAI(model=BANK_QA_MODEL, temperature=0),
     chain_type="stuff",
-    retriever=neo4j_vector_index.as_retriever(k=12),
+    retriever=faq_retriever,
+)
+_raw_faq_vector_chain.combine_documents_chain.llm_chain.prompt = faq_prompt
+
+
+# Only canonical documents are the answer text itself
+faq_vector_chain = DirectAnswerFAQChain(
+    _raw_faq_vector_chain,
+    faq_retriever,
+    direct_answer_min_cosine=(
+        float(FAQ_DIRECT_ANSWER_MIN_COSINE)
+        if FAQ_DIRECT_ANSWER_MIN_COSINE and FAQ_INDEX_LAYOUT == "canonical"
+        else None
+    ),
 )
-faq_vector_chain.combine_documents_chain.llm_chain.prompt = faq_prompt
@@ -3,10 +3,14 @@ from langchain_community.graphs import Neo4jGraph
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain_community.vectorstores.neo4j_vector import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
 # Assuming src.langchain_custom.graph_qa.cypher.GraphCypherQAChain is available
 # If not, you might need to adjust this import or use the standard one from langchain_community
 from src.langchain_custom.graph_qa.cypher import GraphCypherQAChain
+from src.utils.embeddings import (
+    embedding_properties,
+    resolve_vector_index,
+    text_retrieval_query,
+)
 
 # --- Environment Variable Setup ---
 # Ensure these are set in your environment
@@ -43,19 +47,24 @@ except Exception as e:
 # This part is useful if you have a Neo4j index of example Cypher queries.
 # For specific customer verification, its utility depends on having relevant examples.
 try:
+    cypher_example_target = resolve_vector_index(graph, NEO4J_CYPHER_EXAMPLES_INDEX_NAME)
     cypher_example_index = Neo4jVector.from_existing_graph(
-        embedding=OpenAIEmbeddings(), # Requires OPENAI_API_KEY
+        embedding=cypher_example_target.query_embeddings(), # Requires OPENAI_API_KEY
         url=NEO4J_URI,
         username=NEO4J_USERNAME,
         password=NEO4J_PASSWORD,
-        index_name=NEO4J_CYPHER_EXAMPLES_INDEX_NAME,
+        index_name=cypher_example_target.index_name,
         # Ensure this node_label matches how your example query nodes are labelled.
         # NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY.capitalize() might be e.g., "Text"
         node_label=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY.capitalize(),
         text_node_properties=[
             NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
         ],
-        embedding_node_property="embedding",
+        embedding_node_property=cypher_example_target.embedding_property,
+        retrieval_query=text_retrieval_query(
+            [NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY],
+            embedding_properties(graph, NEO4J_CYPHER_EXAMPLES_INDEX_NAME),
+        ),
     )
     cypher_example_retriever = cypher_example_index.as_retriever(search_kwargs={"k": 3}) # Reduced k for focused examples
 except Exception as e:
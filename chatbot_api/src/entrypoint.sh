@@ -5,7 +5,7 @@ echo "Starting Banking System Chatbot RAG FastAPI service..."
 
 # NEW: Run FAQ embedding indexing script
 echo "Running FAQ vector indexer..."
-python scripts/index_faqs.py
+python -m src.scripts.index_faqs
 
 # Start the main application
 uvicorn main:app --host 0.0.0.0 --port 8000
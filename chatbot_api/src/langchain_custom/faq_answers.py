@@ -0,0 +1,54 @@
+"""FAQ answers that skip the QA LLM when a canonical answer clearly matches."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Union
+
+from src.utils.deadlines import check_deadline
+
+
+def cosine_to_neo4j_score(cosine: float) -> float:
+    """Neo4j reports cosine similarity as (1 + cosine) / 2, in [0, 1]"""
+
+    return (1 + cosine) / 2
+
+
+class DirectAnswerFAQChain:
+    """
+    Answers with the canonical answer itself when the best match is at
+    least `direct_answer_min_cosine` similar to the question, and otherwise
+    runs the RetrievalQA chain on the already retrieved, answer-collapsed
+    documents. Direct answers are off when the threshold is None.
+    """
+
+    def __init__(self, chain, retriever, direct_answer_min_cosine: Optional[float] = None):
+        self.chain = chain
+        self.retriever = retriever
+        self.direct_answer_min_cosine = direct_answer_min_cosine
+
+    def invoke(self, inputs: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        if isinstance(inputs, str):
+            question = inputs
+        else:
+            question = inputs.get("query") or inputs.get("question", "")
+
+        check_deadline()
+        matches = self.retriever.search_with_scores(question)
+        # Only a vector similarity is comparable with the threshold
+        top_similarity = matches[0][0].metadata.get("vector_score") if matches else None
+        if (
+            top_similarity is not None
+            and self.direct_answer_min_cosine is not None
+            and top_similarity >= cosine_to_neo4j_score(self.direct_answer_min_cosine)
+        ):
+            return {
+                "query": question,
+                "result": matches[0][0].page_content,
+                "answer_path": "direct",
+            }
+
+        check_deadline()
+        answer = self.chain.combine_documents_chain.run(
+            input_documents=[document for document, _ in matches], question=question
+        )
+        return {"query": question, "result": answer, "answer_path": "qa_llm"}
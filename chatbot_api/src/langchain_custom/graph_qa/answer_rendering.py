@@ -0,0 +1,153 @@
+"""Rule-based answers for Cypher results that do not need the QA LLM."""
+
+from __future__ import annotations
+
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+EMPTY_RESULT_ANSWER = "I could not find any matching records for your question."
+
+_MONEY_WORDS = r"amount|payment|paid|fee|due|balance|cost|price"
+
+# Value kinds keyed by patterns on the snake_cased property (or alias) a
+# column holds; aggregates such as `sum(p.amount)` take the kind of their
+# argument. The first matching pattern wins.
+COLUMN_KINDS: List[Tuple[Pattern[str], str]] = [
+    # Numbers that are names rather than quantities are never grouped
+    (
+        re.compile(
+            r"^(?:id|year|code|zip|zip_code|phone|phone_number)$"
+            r"|_(?:id|year|code|number)$"
+        ),
+        "identifier",
+    ),
+    (
+        re.compile(rf"count|number|^num_|_num$|^total_(?!.*(?:{_MONEY_WORDS}))"),
+        "count",
+    ),
+    (re.compile(_MONEY_WORDS), "currency"),
+]
+# Integers are only shown as money when the name says it is an amount;
+# `total_payments: 3` is far more likely a count than three dollars
+_AMOUNT_PATTERN = re.compile(r"amount")
+
+SINGLE_VALUE_TEMPLATE = "The {label} is {value}."
+KEY_VALUE_TEMPLATE = "Here is what I found: {pairs}."
+
+_FUNCTION_CALL_PATTERN = re.compile(r"(\w+)\((?:distinct\s+)?(.*)\)", re.I)
+# Short names such as `c` or `pd` are query variables, not readable aliases
+_BARE_VARIABLE_PATTERN = re.compile(r"[A-Za-z]\w?")
+_CAMEL_CASE_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _snake_case(name: str) -> str:
+    """`numberOfPayments` -> `number_of_payments`"""
+
+    return _CAMEL_CASE_BOUNDARY.sub("_", name).lower()
+
+
+def _column_label(column: str) -> Optional[str]:
+    """Turn a returned column name such as `sum(p.amount)` or `c.first_name`
+    into a readable label, or None when it names a bare query variable"""
+
+    function_call = _FUNCTION_CALL_PATTERN.fullmatch(column)
+    if function_call:
+        function, argument = function_call.groups()
+        if argument == "*":
+            return function.lower()
+        if "." not in argument and not _FUNCTION_CALL_PATTERN.fullmatch(argument):
+            # e.g. count(c) is just "the count"; "the sum of c" reads badly
+            return "count" if function.lower() == "count" else None
+        argument_label = _column_label(argument)
+        return f"{function.lower()} of {argument_label}" if argument_label else None
+
+    if _BARE_VARIABLE_PATTERN.fullmatch(column):
+        return None
+    label = _snake_case(column.rsplit(".", 1)[-1])
+    return label.replace("_", " ").strip()
+
+
+def value_kind(column: str) -> Optional[str]:
+    """The COLUMN_KINDS kind of the values in `column`, if any"""
+
+    function_call = _FUNCTION_CALL_PATTERN.fullmatch(column)
+    if function_call:
+        function, argument = function_call.groups()
+        if function.lower() == "count":
+            return "count"
+        return value_kind(function) or value_kind(argument)
+
+    name = _snake_case(column.rsplit(".", 1)[-1])
+    return next((kind for pattern, kind in COLUMN_KINDS if pattern.search(name)), None)
+
+
+def _is_temporal(value: Any) -> bool:
+    # neo4j.time values expose iso_format() rather than subclassing datetime
+    return isinstance(value, (date, datetime)) or hasattr(value, "iso_format")
+
+
+def _is_scalar(value: Any) -> bool:
+    return (
+        value is None
+        or isinstance(value, (str, int, float, bool))
+        or _is_temporal(value)
+    )
+
+
+def _format_value(column: str, value: Any) -> str:
+    if value is None:
+        return "not available"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if _is_temporal(value):
+        return value.isoformat() if hasattr(value, "isoformat") else value.iso_format()
+    if isinstance(value, (int, float)):
+        kind = value_kind(column)
+        if kind == "identifier":
+            return str(int(value)) if float(value).is_integer() else str(value)
+        if kind == "count" and float(value).is_integer():
+            return f"{int(value):,}"
+        if kind == "currency" and (
+            isinstance(value, float) or _AMOUNT_PATTERN.search(_snake_case(column))
+        ):
+            return f"${value:,.2f}"
+        if isinstance(value, float):
+            return f"{value:,.2f}".rstrip("0").rstrip(".")
+        return f"{value:,}"
+    return str(value)
+
+
+def render_deterministic_answer(
+    context: List[Dict[str, Any]], max_columns: int = 4
+) -> Optional[str]:
+    """Render an answer for empty results, a single scalar or a short
+    key/value row. Returns None when the result needs the QA LLM."""
+
+    if not context:
+        return EMPTY_RESULT_ANSWER
+
+    if len(context) != 1 or not isinstance(context[0], dict):
+        return None
+
+    row = context[0]
+    if not row or len(row) > max_columns:
+        return None
+    if not all(_is_scalar(value) for value in row.values()):
+        return None
+
+    labels = {column: _column_label(column) for column in row}
+    if not all(labels.values()):
+        return None
+
+    if len(row) == 1:
+        column, value = next(iter(row.items()))
+        return SINGLE_VALUE_TEMPLATE.format(
+            label=labels[column], value=_format_value(column, value)
+        )
+
+    pairs = "; ".join(
+        f"{labels[column]}: {_format_value(column, value)}"
+        for column, value in row.items()
+    )
+    return KEY_VALUE_TEMPLATE.format(pairs=pairs)
@@ -0,0 +1,118 @@
+"""Compact serialization of Cypher query results for the QA prompt."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional
+
+from src.langchain_custom.graph_qa.answer_rendering import value_kind
+from src.langchain_custom.graph_qa.few_shot import approximate_token_count
+
+
+def _flatten_row(row: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Flatten nested node/map values into dotted column names"""
+
+    flat: Dict[str, Any] = {}
+    for key, value in row.items():
+        column = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten_row(value, prefix=f"{column}."))
+        else:
+            flat[column] = value
+    return flat
+
+
+def _format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_format_cell(v) for v in value) + "]"
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _summarize_numeric_columns(
+    columns: List[str], rows: List[Dict[str, Any]]
+) -> List[str]:
+    """Summarize every numeric column over `rows`, except identifier-like
+    ones such as ids and years whose sums mean nothing"""
+
+    summaries = []
+    for column in columns:
+        if value_kind(column) == "identifier":
+            continue
+        values = [
+            row[column]
+            for row in rows
+            if isinstance(row.get(column), (int, float))
+            and not isinstance(row.get(column), bool)
+        ]
+        if not values:
+            continue
+        total = sum(values)
+        summaries.append(
+            f"{column}: count={len(values)} sum={_format_cell(float(total))} "
+            f"min={_format_cell(min(values))} max={_format_cell(max(values))} "
+            f"mean={_format_cell(total / len(values))}"
+        )
+    return summaries
+
+
+def format_context_as_table(
+    context: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    total_rows: Optional[int] = None,
+    length_function: Callable[[str], int] = approximate_token_count,
+) -> str:
+    """Format query results as a row count, a header and one line per row.
+
+    `total_rows` is the number of rows the query returned when `context`
+    holds only the first of them. When the table would exceed
+    `token_budget`, only the leading rows that fit are kept and every
+    numeric column is summarized over the rows in `context` instead.
+    """
+
+    if not context:
+        return "rows: 0"
+
+    rows = [
+        _flatten_row(row) if isinstance(row, dict) else {"value": row}
+        for row in context
+    ]
+    columns: List[str] = []
+    for row in rows:
+        columns.extend(column for column in row if column not in columns)
+
+    truncated = total_rows is not None and total_rows > len(rows)
+    row_count = f"rows: {len(rows)} of {total_rows}" if truncated else f"rows: {len(rows)}"
+    header = [row_count, " | ".join(columns)]
+    lines = [
+        " | ".join(_format_cell(row.get(column)) for column in columns) for row in rows
+    ]
+
+    table = "\n".join(header + lines)
+    if token_budget is None or length_function(table) <= token_budget:
+        return table
+
+    summary = _summarize_numeric_columns(columns, rows)
+    covered = f"the first {len(rows)} rows" if truncated else "all rows"
+    footer_lines = [f"summary of {covered}:"] + summary if summary else []
+    used = length_function("\n".join(header + footer_lines)) + 10
+
+    kept: List[str] = []
+    for line in lines:
+        cost = length_function(line) + 1
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+
+    omitted = [f"... {len(lines) - len(kept)} more rows omitted"]
+
+    return "\n".join(header + kept + omitted + footer_lines)
+
+
+CONTEXT_FORMATTERS: Dict[str, Callable[..., str]] = {
+    "repr": lambda context, token_budget=None, total_rows=None: str(context),
+    "table": format_context_as_table,
+}
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from langchain.chains.base import Chain
 from langchain.chains.llm import LLMChain
@@ -24,7 +24,7 @@ from langchain_core.prompts import (
 )
 from langchain_core.documents import Document
 from langchain_core.pydantic_v1 import Field
-from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables import Runnable
 
 from langchain_community.chains.graph_qa.cypher_utils import (
     CypherQueryCorrector,
@@ -41,9 +41,27 @@ from operator import itemgetter
 from src.langchain_custom.graph_qa.custom_prompts import (
     CYPHER_GENERATION_WITH_EXAMPLES_PROMPT,
 )
+from src.langchain_custom.graph_qa.answer_rendering import render_deterministic_answer
+from src.langchain_custom.graph_qa.context_formatting import CONTEXT_FORMATTERS
+from src.langchain_custom.graph_qa.cypher_guard import (
+    CypherGuard,
+    CypherRejectedError,
+    regeneration_question,
+)
+from src.langchain_custom.graph_qa.few_shot import (
+    ScoredVectorStoreRetriever,
+    pack_few_shot_examples,
+    split_scores,
+)
+from src.utils.deadlines import check_deadline
 
 INTERMEDIATE_STEPS_KEY = "intermediate_steps"
 
+REJECTED_QUERY_ANSWER = (
+    "I could not find a query for this question that is cheap enough to run "
+    "safely. Could you make the question more specific?"
+)
+
 FUNCTION_RESPONSE_SYSTEM = """You are an assistant that helps to form nice and human
 understandable answers based on the provided information from tools.
 Do not add any other information that wasn't present in the tools, and use
@@ -97,13 +115,30 @@ def construct_schema(
         ],
     }
 
+    # Range-indexed node properties, as reported in the schema metadata
+    indexed_props = {
+        (index.get("label"), prop)
+        for index in structured_schema.get("metadata", {}).get("index", [])
+        for prop in index.get("properties") or []
+    }
+
     # Format node properties
     formatted_node_props = []
+    date_props = []
     for label, properties in filtered_schema["node_props"].items():
         props_str = ", ".join(
-            [f"{prop['property']}: {prop['type']}" for prop in properties]
+            [
+                f"{prop['property']}: {prop['type']}"
+                + (" (indexed)" if (label, prop["property"]) in indexed_props else "")
+                for prop in properties
+            ]
         )
         formatted_node_props.append(f"{label} {{{props_str}}}")
+        date_props.extend(
+            f"{label}.{prop['property']}"
+            for prop in properties
+            if prop["type"] in ("DATE", "LOCAL_DATE_TIME", "DATE_TIME")
+        )
 
     # Format relationship properties
     formatted_rel_props = []
@@ -119,20 +154,30 @@ def construct_schema(
         for el in filtered_schema["relationships"]
     ]
 
-    return "\n".join(
-        [
-            "Node properties are the following:",
-            ",".join(formatted_node_props),
-            "Relationship properties are the following:",
-            ",".join(formatted_rel_props),
-            "The relationships are the following:",
-            ",".join(formatted_rels),
-        ]
-    )
+    schema_lines = [
+        "Node properties are the following:",
+        ",".join(formatted_node_props),
+        "Relationship properties are the following:",
+        ",".join(formatted_rel_props),
+        "The relationships are the following:",
+        ",".join(formatted_rels),
+    ]
+    if date_props:
+        schema_lines.extend(
+            [
+                "The following properties are temporal values and must be "
+                "compared with date values, e.g. p.payment_date >= "
+                "date('2024-01-01') or f.date_incurred >= date() - "
+                "duration('P1M'):",
+                ",".join(date_props),
+            ]
+        )
+
+    return "\n".join(schema_lines)
 
 
 def get_function_response(
-    question: str, context: List[Dict[str, Any]]
+    question: str, context: Union[str, List[Dict[str, Any]]]
 ) -> List[BaseMessage]:
     TOOL_ID = "call_H7fABDuzEau48T10Qn0Lsh0D"
     messages = [
@@ -159,35 +204,183 @@ def get_function_response(
 def format_retrieved_documents(documents: list[Document]) -> str:
     """Format retrieved documents and metadata as a single string"""
 
-    result = ""
+    parts = []
     for doc in documents:
-        # question = doc.page_content.strip().replace('question: ', '')
-        page_content = doc.page_content
-        result += f"{page_content}\n"
+        parts.append(f"{doc.page_content}\n")
+        parts.extend(f"{key}:\n{value}" for key, value in doc.metadata.items())
+        parts.append("\n\n")
+
+    return "".join(parts)
 
-        for key in doc.metadata.keys():
-            result += f"{key}:\n{doc.metadata[key]}"
 
-        result += "\n\n"
+def remove_keys_from_dicts(input_list: list, keys_to_remove: list):
+    """Remove keys from nested dictionaries in place.
 
-    return result
+    Query-time projection (see `project_excluded_properties`) keeps excluded
+    properties out of most results, so this only pops the leftover keys
+    rather than rebuilding every dictionary.
+    """
 
+    keys = set(keys_to_remove)
 
-def remove_keys_from_dicts(input_list: list, keys_to_remove: list):
-    """Remove keys from a nested dictionary"""
+    def remove_keys_from_item(item):
+        if isinstance(item, dict):
+            for key in keys.intersection(item):
+                del item[key]
+            values = item.values()
+        elif isinstance(item, list):
+            values = item
+        else:
+            return
+        for value in values:
+            if isinstance(value, (dict, list)):
+                remove_keys_from_item(value)
 
-    def remove_keys_from_dict(d, keys):
-        if isinstance(d, dict):
-            d = {
-                k: (remove_keys_from_dict(v, keys) if isinstance(v, dict) else v)
-                for k, v in d.items()
-                if k not in keys
-            }
-        elif isinstance(d, list):
-            d = [remove_keys_from_dict(i, keys) for i in d]
-        return d
+    remove_keys_from_item(input_list)
 
-    return [remove_keys_from_dict(item, keys_to_remove) for item in input_list]
+    return input_list
+
+
+_STRING_LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+# A node pattern's opening bracket, unlike a function call's, does not
+# follow a name
+_NODE_VARIABLE_PATTERN = re.compile(r"(?<![\w.`])\(\s*([A-Za-z_]\w*)\s*[:{)]")
+_BINDING_CLAUSE_PATTERN = re.compile(r"\b(MATCH|WITH|UNWIND)\b", re.IGNORECASE)
+_CLAUSE_END_PATTERN = re.compile(
+    r"\b(?:OPTIONAL|MATCH|WHERE|WITH|RETURN|UNWIND|CALL|ORDER|SKIP|LIMIT|UNION"
+    r"|MERGE|CREATE|SET|DELETE|DETACH|REMOVE|FOREACH)\b|;",
+    re.IGNORECASE,
+)
+_ALIAS_PATTERN = re.compile(
+    r"^(?:DISTINCT\s+)?(.+?)\s+AS\s+([A-Za-z_]\w*)$", re.IGNORECASE | re.DOTALL
+)
+_RETURN_PATTERN = re.compile(r"\bRETURN\b", re.IGNORECASE)
+_RETURN_END_PATTERN = re.compile(
+    r"\b(?:ORDER\s+BY|SKIP|LIMIT|UNION)\b|;", re.IGNORECASE
+)
+_RETURN_ITEM_PATTERN = re.compile(
+    r"^(DISTINCT\s+)?([A-Za-z_]\w*)(?:\s+AS\s+([A-Za-z_]\w*|`[^`]+`))?$",
+    re.IGNORECASE,
+)
+
+
+def _split_top_level(text: str, separator: str = ",") -> List[str]:
+    """Split on a separator that is not nested in brackets"""
+
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _clause_body(masked: str, start: int) -> str:
+    """The text of the clause starting at `start`, up to the next top-level
+    clause keyword or the end of the enclosing subquery"""
+
+    depth = 0
+    ends = {m.start() for m in _CLAUSE_END_PATTERN.finditer(masked, start)}
+    for i in range(start, len(masked)):
+        char = masked[i]
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+            if depth < 0:
+                return masked[start:i]
+        elif depth == 0 and i in ends:
+            return masked[start:i]
+    return masked[start:]
+
+
+def _node_variables(masked: str) -> set:
+    """Variables that hold nodes where the query ends: those bound by node
+    patterns in MATCH clauses, minus any later rebound to something else by
+    WITH ... AS or UNWIND"""
+
+    nodes = set()
+    for clause in _BINDING_CLAUSE_PATTERN.finditer(masked):
+        keyword = clause.group(1).upper()
+        body = _clause_body(masked, clause.end())
+        if keyword == "MATCH":
+            nodes.update(_NODE_VARIABLE_PATTERN.findall(body))
+        elif keyword == "UNWIND":
+            alias = _ALIAS_PATTERN.match(body.strip())
+            if alias:
+                nodes.discard(alias.group(2))
+        else:
+            for item in _split_top_level(body):
+                alias = _ALIAS_PATTERN.match(item.strip())
+                if alias is None:
+                    continue
+                expression, variable = alias.group(1).strip(), alias.group(2)
+                if expression in nodes:
+                    nodes.add(variable)
+                else:
+                    nodes.discard(variable)
+    return nodes
+
+
+def project_excluded_properties(query: str, properties: List[str]) -> str:
+    """Rewrite whole-node items in the final RETURN clause(s) of a query into
+    map projections that null out the excluded properties, so large
+    properties such as embeddings never leave the database.
+
+    For example, `MATCH (q:Question) RETURN q LIMIT 5` becomes
+    `MATCH (q:Question) RETURN q {.*, embedding: null} AS q LIMIT 5`.
+    """
+
+    if not properties:
+        return query
+
+    # Mask string literals so keywords and brackets inside them are ignored
+    masked = _STRING_LITERAL_PATTERN.sub(lambda m: "_" * len(m.group()), query)
+    node_variables = _node_variables(masked)
+    if not node_variables:
+        return query
+
+    projection = ", ".join([".*"] + [f"{p}: null" for p in properties])
+    rewritten, last_end = [], 0
+
+    for match in _RETURN_PATTERN.finditer(masked):
+        # Only rewrite RETURN clauses of the outer query, not of subqueries
+        prefix = masked[: match.start()]
+        if prefix.count("{") != prefix.count("}"):
+            continue
+
+        items_start = match.end()
+        end_match = _RETURN_END_PATTERN.search(masked, items_start)
+        items_end = end_match.start() if end_match else len(masked)
+
+        items = []
+        offset = items_start
+        for masked_item in _split_top_level(masked[items_start:items_end]):
+            item = query[offset : offset + len(masked_item)]
+            offset += len(masked_item) + 1
+            item_match = _RETURN_ITEM_PATTERN.match(masked_item.strip())
+            if item_match and item_match.group(2) in node_variables:
+                distinct, variable, alias = item_match.groups()
+                leading = item[: len(item) - len(item.lstrip())]
+                trailing = item[len(item.rstrip()) :]
+                item = (
+                    f"{leading}{distinct or ''}{variable} {{{projection}}} "
+                    f"AS {alias or variable}{trailing}"
+                )
+            items.append(item)
+
+        rewritten.append(query[last_end:items_start])
+        rewritten.append(",".join(items))
+        last_end = items_end
+
+    rewritten.append(query[last_end:])
+
+    return "".join(rewritten)
 
 
 class GraphCypherQAChain(Chain):
@@ -225,6 +418,23 @@ class GraphCypherQAChain(Chain):
     """Optional retriever to augment the prompt with example Cypher queries"""
     node_properties_to_exclude: Optional[list[str]] = None
     """Optional list of node properties to exclude from context in the QA prompt"""
+    example_token_budget: Optional[int] = None
+    """Optional token budget for the retrieved Cypher examples in the prompt"""
+    example_min_similarity: Optional[float] = None
+    """Optional similarity floor below which retrieved examples are dropped"""
+    example_metadata_keys: Optional[list[str]] = None
+    """Optional metadata keys of retrieved examples to include in the prompt"""
+    example_structure_key: Optional[str] = None
+    """Optional metadata key holding each example's Cypher, used to drop
+    structural duplicates (defaults to the first of `example_metadata_keys`)"""
+    context_format: str = "repr"
+    """How query results are serialized for the QA prompt ("repr" or "table")"""
+    context_token_budget: Optional[int] = None
+    """Optional token budget for the serialized query results"""
+    deterministic_answers: bool = False
+    """Whether to answer empty and scalar results without calling the QA LLM"""
+    cypher_guard: Optional[CypherGuard] = None
+    """Optional cost guard that plans, time-limits and read-restricts queries"""
 
     @property
     def input_keys(self) -> List[str]:
@@ -265,10 +475,17 @@ class GraphCypherQAChain(Chain):
         use_function_response: bool = False,
         function_response_system: str = FUNCTION_RESPONSE_SYSTEM,
         node_properties_to_exclude: Optional[list[str]] = None,
+        context_format: str = "repr",
         **kwargs: Any,
     ) -> GraphCypherQAChain:
         """Initialize from LLM."""
 
+        if context_format not in CONTEXT_FORMATTERS:
+            raise ValueError(
+                f"Unknown context_format '{context_format}'. "
+                f"Choose one of: {', '.join(CONTEXT_FORMATTERS)}"
+            )
+
         if not cypher_llm and not llm:
             raise ValueError("Either `llm` or `cypher_llm` parameters must be provided")
         if not qa_llm and not llm:
@@ -328,9 +545,7 @@ class GraphCypherQAChain(Chain):
         if cypher_example_retriever is not None:
             cypher_generation_chain = (
                 {
-                    "example_queries": itemgetter("question")
-                    | cypher_example_retriever
-                    | RunnableLambda(format_retrieved_documents),
+                    "example_queries": itemgetter("example_queries"),
                     "schema": itemgetter("schema"),
                     "question": itemgetter("question"),
                 }
@@ -369,24 +584,69 @@ class GraphCypherQAChain(Chain):
             use_function_response=use_function_response,
             cypher_example_retriever=cypher_example_retriever,
             node_properties_to_exclude=node_properties_to_exclude,
+            context_format=context_format,
             **kwargs,
         )
 
-    def _call(
-        self,
-        inputs: Dict[str, Any],
-        run_manager: Optional[CallbackManagerForChainRun] = None,
-    ) -> Dict[str, Any]:
-        """Generate Cypher statement, use it to look up in db and answer question."""
-        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
-        callbacks = _run_manager.get_child()
-        question = inputs[self.input_key]
+    @property
+    def _packs_examples(self) -> bool:
+        return (
+            self.example_token_budget is not None
+            or self.example_min_similarity is not None
+            or self.example_metadata_keys is not None
+        )
 
-        intermediate_steps: List = []
+    def _retrieve_example_queries(
+        self, question: str, callbacks: Any = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Retrieve Cypher examples for the question and format them for the
+        prompt, packing them into the token budget when one is configured"""
+
+        if not self._packs_examples:
+            documents = self.cypher_example_retriever.invoke(  # type: ignore
+                question, {"callbacks": callbacks}
+            )
+            example_queries = format_retrieved_documents(
+                [document for document, _ in split_scores(documents)]
+            )
+            return example_queries, {"examples": len(documents)}
+
+        retriever = self.cypher_example_retriever
+        if not isinstance(retriever, ScoredVectorStoreRetriever):
+            retriever = ScoredVectorStoreRetriever.from_retriever(retriever)  # type: ignore
+        documents = retriever.invoke(question, {"callbacks": callbacks})
+        structure_key = self.example_structure_key or next(
+            iter(self.example_metadata_keys or []), None
+        )
+        packed = pack_few_shot_examples(
+            split_scores(documents),
+            token_budget=self.example_token_budget,
+            min_similarity=self.example_min_similarity or 0.0,
+            metadata_keys=self.example_metadata_keys,
+            structure_key=structure_key,
+        )
 
+        return packed.text, {
+            "examples": len(packed.included),
+            "example_tokens": packed.tokens_used,
+            "dropped_low_similarity": packed.dropped_low_similarity,
+            "dropped_duplicates": packed.dropped_duplicates,
+            "dropped_over_budget": packed.dropped_over_budget,
+        }
+
+    def _generate_cypher(
+        self, question: str, example_queries: Optional[str], callbacks: Any = None
+    ) -> str:
+        """Generate, extract and (optionally) correct a Cypher statement"""
+
+        check_deadline()
         if self.cypher_example_retriever:
             generated_cypher = self.cypher_generation_chain.invoke(
-                {"schema": self.graph_schema, "question": question},
+                {
+                    "schema": self.graph_schema,
+                    "question": question,
+                    "example_queries": example_queries,
+                },
                 {"callbacks": callbacks},
             )
 
@@ -402,17 +662,107 @@ class GraphCypherQAChain(Chain):
         if self.cypher_query_corrector:
             generated_cypher = self.cypher_query_corrector(generated_cypher)
 
+        return generated_cypher
+
+    def _guarded_query(
+        self,
+        question: str,
+        cypher: str,
+        example_queries: Optional[str],
+        intermediate_steps: List,
+        run_manager: CallbackManagerForChainRun,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Run a query through the cost guard, regenerating it with the
+        rejection reason as feedback. Returns None if every attempt is
+        rejected."""
+
+        guard = self.cypher_guard
+        for attempt in range(guard.max_regenerations + 1):  # type: ignore[union-attr]
+            try:
+                return guard.query(self.graph, cypher)  # type: ignore[union-attr]
+            except CypherRejectedError as e:
+                intermediate_steps.append({"rejected_query": cypher, "reason": e.reason})
+                run_manager.on_text(
+                    f"Rejected Cypher: {e.reason}", end="\n", verbose=self.verbose
+                )
+                if attempt == guard.max_regenerations:  # type: ignore[union-attr]
+                    return None
+
+                cypher = self._generate_cypher(
+                    regeneration_question(question, cypher, e.reason),
+                    example_queries,
+                    run_manager.get_child(),
+                )
+                if not cypher:
+                    return None
+                if self.node_properties_to_exclude:
+                    cypher = project_excluded_properties(
+                        cypher, self.node_properties_to_exclude
+                    )
+                run_manager.on_text(
+                    "Regenerated Cypher:", end="\n", verbose=self.verbose
+                )
+                run_manager.on_text(cypher, color="green", end="\n", verbose=self.verbose)
+                intermediate_steps.append({"query": cypher})
+
+        return None
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        """Generate Cypher statement, use it to look up in db and answer question."""
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        callbacks = _run_manager.get_child()
+        question = inputs[self.input_key]
+
+        intermediate_steps: List = []
+        example_stats: Optional[Dict[str, Any]] = None
+        example_queries: Optional[str] = None
+
+        if self.cypher_example_retriever:
+            example_queries, example_stats = self._retrieve_example_queries(
+                question, callbacks
+            )
+            _run_manager.on_text("Few-shot examples:", end="\n", verbose=self.verbose)
+            _run_manager.on_text(
+                str(example_stats), color="green", end="\n", verbose=self.verbose
+            )
+
+        generated_cypher = self._generate_cypher(question, example_queries, callbacks)
+
         _run_manager.on_text("Generated Cypher:", end="\n", verbose=self.verbose)
         _run_manager.on_text(
             generated_cypher, color="green", end="\n", verbose=self.verbose
         )
 
         intermediate_steps.append({"query": generated_cypher})
+        if example_stats is not None:
+            intermediate_steps.append({"few_shot_examples": example_stats})
 
         # Retrieve and limit the number of results
         # Generated Cypher be null if query corrector identifies invalid schema
+        total_rows = None
         if generated_cypher:
-            context = self.graph.query(generated_cypher)[: self.top_k]
+            if self.node_properties_to_exclude:
+                generated_cypher = project_excluded_properties(
+                    generated_cypher, self.node_properties_to_exclude
+                )
+            if self.cypher_guard:
+                context = self._guarded_query(
+                    question,
+                    generated_cypher,
+                    example_queries,
+                    intermediate_steps,
+                    _run_manager,
+                )
+            else:
+                check_deadline()
+                context = self.graph.query(generated_cypher)
+            if context is not None:
+                total_rows = len(context)
+                context = context[: self.top_k]
 
             # Enhance customer context with full name if available  ## <<--- add 
             if isinstance(context, list):
@@ -429,27 +779,55 @@ class GraphCypherQAChain(Chain):
         else:
             context = []
 
-        if self.return_direct:
+        deterministic_answer = (
+            render_deterministic_answer(context)
+            if self.deterministic_answers and isinstance(context, list)
+            else None
+        )
+
+        if context is None:
+            answer_path = "rejected"
+            final_result = REJECTED_QUERY_ANSWER
+        elif self.return_direct:
+            answer_path = "direct"
             final_result = context
+        elif deterministic_answer is not None:
+            answer_path = "deterministic"
+            intermediate_steps.append({"context": context})
+            final_result = deterministic_answer
         else:
+            answer_path = "qa_llm"
+            check_deadline()
             _run_manager.on_text("Full Context:", end="\n", verbose=self.verbose)
             _run_manager.on_text(
                 str(context), color="green", end="\n", verbose=self.verbose
             )
 
             intermediate_steps.append({"context": context})
+            formatted_context = CONTEXT_FORMATTERS[self.context_format](
+                context,
+                token_budget=self.context_token_budget,
+                total_rows=total_rows,
+            )
             if self.use_function_response:
-                function_response = get_function_response(question, context)
+                function_response = get_function_response(
+                    question, formatted_context
+                )
                 final_result = self.qa_chain.invoke(  # type: ignore
                     {"question": question, "function_response": function_response},
                 )
             else:
                 result = self.qa_chain.invoke(  # type: ignore
-                    {"question": question, "context": context},
+                    {"question": question, "context": formatted_context},
                     callbacks=callbacks,
                 )
                 final_result = result[self.qa_chain.output_key]  # type: ignore
 
+        _run_manager.on_text(
+            f"Answer path: {answer_path}", end="\n", verbose=self.verbose
+        )
+        intermediate_steps.append({"answer_path": answer_path})
+
         chain_result: Dict[str, Any] = {self.output_key: final_result}
         if self.return_intermediate_steps:
             chain_result[INTERMEDIATE_STEPS_KEY] = intermediate_steps
@@ -0,0 +1,155 @@
+"""Cost guard and read-only, time-limited execution for generated Cypher."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import neo4j
+from neo4j.exceptions import ClientError, CypherSyntaxError
+
+from src.utils.deadlines import bounded_timeout, check_deadline
+
+_TIMEOUT_CODES = (
+    "Neo.ClientError.Transaction.TransactionTimedOut",
+    "Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration",
+)
+
+_COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+class CypherRejectedError(ValueError):
+    """Raised when a generated query is refused before or during execution"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def iter_plan_operators(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Walk an EXPLAIN plan depth first, from the root operator"""
+
+    pending = [plan]
+    while pending:
+        operator = pending.pop()
+        pending.extend(reversed(operator.get("children", [])))
+        yield operator
+
+
+@dataclass
+class CypherGuard:
+    """Plans generated queries with EXPLAIN and rejects expensive plans,
+    then runs them in read-only transactions with a server-side timeout.
+
+    EXPLAIN plans carry row estimates but no db hits (only PROFILE, which
+    executes the query, reports those), so the largest estimated row count
+    of any operator stands in for the query's cost.
+    """
+
+    timeout: Optional[float] = 10.0
+    """Server-side transaction timeout in seconds"""
+    explain: bool = True
+    """Whether to plan queries with EXPLAIN before running them"""
+    max_estimated_rows: Optional[float] = 1_000_000
+    """Reject plans with an operator estimated above this many rows"""
+    reject_cartesian_products: bool = True
+    """Reject plans joining unconnected patterns"""
+    max_regenerations: int = 1
+    """Regenerations allowed after a rejection, with the reason as feedback"""
+
+    def _session(self, graph: Any):
+        return graph._driver.session(
+            database=graph._database, default_access_mode=neo4j.READ_ACCESS
+        )
+
+    def check_plan(self, plan: Dict[str, Any]) -> Optional[str]:
+        """Return why a plan is too expensive to run, or None"""
+
+        operators = list(iter_plan_operators(plan))
+        names = [operator["operatorType"].split("@")[0] for operator in operators]
+        if self.reject_cartesian_products and "CartesianProduct" in names:
+            return (
+                "the query builds a cartesian product of unconnected "
+                "patterns; connect them through relationships"
+            )
+
+        if self.max_estimated_rows is None:
+            return None
+        rows, name, operator = max(
+            (
+                (operator.get("args", {}).get("EstimatedRows") or 0, name, operator)
+                for name, operator in zip(names, operators)
+            ),
+            key=lambda item: item[0],
+        )
+        if rows > self.max_estimated_rows:
+            details = operator.get("args", {}).get("Details", "")
+            return (
+                f"the {name} step ({details}) is estimated to process about "
+                f"{rows:,.0f} rows, above the limit of "
+                f"{self.max_estimated_rows:,.0f}; filter on indexed "
+                "properties earlier or aggregate"
+            )
+        return None
+
+    def query(
+        self, graph: Any, query: str, params: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Check and run a query, raising CypherRejectedError if the plan is
+        too expensive, the query writes or it exceeds the timeout"""
+
+        if not hasattr(graph, "_driver"):
+            # Not a Neo4jGraph, so there is no session to restrict
+            return graph.query(query, params or {})
+        if not _COMMENT_PATTERN.sub("", query).strip():
+            # e.g. "// No Cypher statement can be generated": nothing to run
+            return []
+
+        # Never outlive the request this query serves
+        timeout = bounded_timeout(self.timeout)
+        try:
+            with self._session(graph) as session:
+                if self.explain:
+                    summary = session.run(
+                        neo4j.Query(f"EXPLAIN {query}", timeout=timeout),
+                        params or {},
+                    ).consume()
+                    reason = self.check_plan(summary.plan) if summary.plan else None
+                    if reason:
+                        raise CypherRejectedError(reason)
+
+                def run(tx: neo4j.ManagedTransaction) -> List[Dict[str, Any]]:
+                    return [record.data() for record in tx.run(query, params or {})]
+
+                return session.execute_read(
+                    neo4j.unit_of_work(timeout=timeout)(run)
+                )
+
+        except CypherSyntaxError as e:
+            # Same error as Neo4jGraph.query raises for invalid statements
+            raise ValueError(f"Generated Cypher Statement is not valid\n{e}") from e
+        except ClientError as e:
+            if e.code in _TIMEOUT_CODES:
+                check_deadline()
+                if timeout is None:
+                    raise CypherRejectedError(
+                        "the query exceeded the database's transaction timeout"
+                    ) from e
+                raise CypherRejectedError(
+                    f"the query did not finish within {timeout:g} seconds"
+                ) from e
+            if e.code == "Neo.ClientError.Statement.AccessMode":
+                raise CypherRejectedError("the query tries to write to the graph") from e
+            raise
+
+
+def regeneration_question(question: str, cypher: str, reason: str) -> str:
+    """The question to regenerate a rejected query with"""
+
+    return (
+        f"{question}\n\n"
+        "Note: this previous Cypher query for the question was rejected "
+        f"because {reason}:\n{cypher}\n"
+        "Write a cheaper, read-only query that answers the same question."
+    )
@@ -0,0 +1,194 @@
+"""Scored retrieval and token-budgeted packing of Cypher examples for
+few-shot prompts."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+
+_CYPHER_COMMENT_PATTERN = re.compile(r"//[^\n]*")
+_CYPHER_STRING_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_CYPHER_NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+SCORE_METADATA_KEY = "_similarity_score"
+
+
+def approximate_token_count(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English and Cypher)"""
+
+    return (len(text) + 3) // 4
+
+
+def normalize_cypher_structure(cypher: str) -> str:
+    """Reduce a Cypher query to its structure by stripping comments,
+    literal values, case and whitespace"""
+
+    structure = _CYPHER_COMMENT_PATTERN.sub("", cypher)
+    structure = _CYPHER_STRING_PATTERN.sub("$str", structure)
+    structure = _CYPHER_NUMBER_PATTERN.sub("$num", structure)
+    structure = _WHITESPACE_PATTERN.sub(" ", structure)
+
+    return structure.strip().rstrip(";").lower()
+
+
+class ScoredVectorStoreRetriever(VectorStoreRetriever):
+    """
+    Vector store retriever that keeps the similarity of each document, under
+    SCORE_METADATA_KEY in a copy of its metadata, so callers that rank by
+    score still go through the retriever's callbacks and search settings.
+    """
+
+    @classmethod
+    def from_retriever(cls, retriever: VectorStoreRetriever) -> "ScoredVectorStoreRetriever":
+        return cls(
+            vectorstore=retriever.vectorstore,
+            search_type=retriever.search_type,
+            search_kwargs=retriever.search_kwargs,
+            tags=retriever.tags,
+            metadata=retriever.metadata,
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.search_type == "similarity":
+            pairs = self.vectorstore.similarity_search_with_score(
+                query, **self.search_kwargs
+            )
+        elif self.search_type == "similarity_score_threshold":
+            pairs = self.vectorstore.similarity_search_with_relevance_scores(
+                query, **self.search_kwargs
+            )
+        else:
+            raise ValueError(f"search_type of {self.search_type} does not return scores.")
+        return [_with_score(document, score) for document, score in pairs]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.search_type == "similarity":
+            pairs = await self.vectorstore.asimilarity_search_with_score(
+                query, **self.search_kwargs
+            )
+        elif self.search_type == "similarity_score_threshold":
+            pairs = await self.vectorstore.asimilarity_search_with_relevance_scores(
+                query, **self.search_kwargs
+            )
+        else:
+            raise ValueError(f"search_type of {self.search_type} does not return scores.")
+        return [_with_score(document, score) for document, score in pairs]
+
+
+def _with_score(document: Document, score: float) -> Document:
+    return Document(
+        page_content=document.page_content,
+        metadata={**document.metadata, SCORE_METADATA_KEY: score},
+    )
+
+
+def split_scores(documents: Iterable[Document]) -> List[Tuple[Document, Optional[float]]]:
+    """(document, score) pairs for documents from a ScoredVectorStoreRetriever,
+    with the score removed from the metadata again"""
+
+    pairs = []
+    for document in documents:
+        metadata = dict(document.metadata)
+        score = metadata.pop(SCORE_METADATA_KEY, None)
+        pairs.append((Document(page_content=document.page_content, metadata=metadata), score))
+    return pairs
+
+
+def format_example(
+    document: Document, metadata_keys: Optional[Sequence[str]] = None
+) -> str:
+    """Format a single retrieved example and the selected metadata keys"""
+
+    keys = metadata_keys if metadata_keys is not None else document.metadata.keys()
+    parts = [document.page_content.strip()]
+    for key in keys:
+        value = document.metadata.get(key)
+        if value is None:
+            continue
+        parts.append(f"{key}:\n{str(value).strip()}")
+
+    return "\n".join(parts)
+
+
+@dataclass
+class PackedExamples:
+    """Result of packing few-shot examples into a token budget"""
+
+    text: str
+    tokens_used: int
+    included: List[Document] = field(default_factory=list)
+    dropped_low_similarity: int = 0
+    dropped_duplicates: int = 0
+    dropped_over_budget: int = 0
+
+
+def pack_few_shot_examples(
+    documents_and_scores: Iterable[Tuple[Document, float]],
+    *,
+    token_budget: Optional[int] = None,
+    min_similarity: float = 0.0,
+    metadata_keys: Optional[Sequence[str]] = None,
+    structure_key: Optional[str] = "cypher",
+    length_function: Callable[[str], int] = approximate_token_count,
+) -> PackedExamples:
+    """Select retrieved examples for the Cypher generation prompt.
+
+    Examples below `min_similarity` are dropped, examples whose Cypher
+    (read from the `structure_key` metadata key, when given) is structurally
+    identical to a more relevant example are removed, and the remaining
+    examples are added in order of relevance until the next one would exceed
+    `token_budget`. Only examples that pass the first two checks count as
+    dropped over budget.
+    """
+
+    separator = "\n\n"
+    separator_tokens = length_function(separator)
+    ranked = sorted(documents_and_scores, key=lambda pair: pair[1], reverse=True)
+
+    packed = PackedExamples(text="", tokens_used=0)
+    blocks: List[str] = []
+    seen_structures = set()
+
+    for document, score in ranked:
+        if score < min_similarity:
+            packed.dropped_low_similarity += 1
+            continue
+
+        cypher = document.metadata.get(structure_key) if structure_key else None
+        if cypher:
+            structure = normalize_cypher_structure(str(cypher))
+            if structure in seen_structures:
+                packed.dropped_duplicates += 1
+                continue
+            seen_structures.add(structure)
+
+        if packed.dropped_over_budget:
+            packed.dropped_over_budget += 1
+            continue
+
+        block = format_example(document, metadata_keys)
+        cost = length_function(block) + (separator_tokens if blocks else 0)
+        if token_budget is not None and packed.tokens_used + cost > token_budget:
+            packed.dropped_over_budget += 1
+            continue
+
+        blocks.append(block)
+        packed.included.append(document)
+        packed.tokens_used += cost
+
+    packed.text = separator.join(blocks)
+
+    return packed
@@ -0,0 +1,406 @@
+"""FAQ retrieval collapsed to one document per canonical answer."""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+# Retrieval query for the `faq_answers` index, whose nodes are canonical
+# answers linked to their question variants
+CANONICAL_ANSWER_RETRIEVAL_QUERY = """
+RETURN node.answer AS text, score, {
+    answer_id: node.id,
+    related_topics: node.related_topics,
+    topics: node.topics,
+    variant_count: node.variant_count,
+    sample_questions: node.sample_questions
+} AS metadata
+"""
+
+
+FULLTEXT_INDEX_NAME = "faq_fulltext"
+
+# Full-text hits on question variants are mapped to their canonical answer;
+# documents match the shape of the vector retrieval queries so both result
+# lists can be fused
+FULLTEXT_RETRIEVAL_QUERY = """
+CALL db.index.fulltext.queryNodes($index_name, $query, {limit: $limit})
+YIELD node, score
+WHERE any(label IN labels(node) WHERE label IN $labels)
+OPTIONAL MATCH (node)-[:VARIANT_OF]->(answer)
+WITH coalesce(answer, node) AS node, max(score) AS score
+RETURN
+    CASE WHEN node:FAQAnswer THEN node.answer
+    ELSE reduce(text = '', key IN ['question', 'answer', 'related_topics'] |
+        text + '\\n' + key + ': ' + coalesce(node[key], ''))
+    END AS text,
+    score,
+    {
+        answer_id: coalesce(node.answer_id, node.id),
+        faq_id: node.faq_id,
+        related_topics: node.related_topics
+    } AS metadata
+ORDER BY score DESC
+"""
+
+_LUCENE_SPECIAL_CHARACTERS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+_QUERY_TERM_PATTERN = re.compile(r"[\w][\w'-]*")
+_STOPWORDS = frozenset(
+    "a an and are can do does for from how i if in is it my of on or the to "
+    "what when where which who why will with you your".split()
+)
+
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="faq-search")
+
+
+def lucene_query(question: str) -> str:
+    """Turn a question into an escaped Lucene OR-query of its keywords"""
+
+    terms = [
+        _LUCENE_SPECIAL_CHARACTERS.sub(r"\\\1", term)
+        for term in _QUERY_TERM_PATTERN.findall(question)
+        if term.lower() not in _STOPWORDS and len(term) > 1
+    ]
+    return " ".join(dict.fromkeys(terms))
+
+
+def neo4j_fulltext_search(
+    graph: Any,
+    index_name: str = FULLTEXT_INDEX_NAME,
+    labels: Sequence[str] = ("FAQAnswer", "FAQVariant"),
+) -> Callable[[str, int], List[Tuple[Document, float]]]:
+    """Full-text search over FAQ nodes through anything with a
+    `query(cypher, params)` method, such as Neo4jVector or Neo4jGraph"""
+
+    def search(question: str, k: int) -> List[Tuple[Document, float]]:
+        query = lucene_query(question)
+        if not query:
+            return []
+        rows = graph.query(
+            FULLTEXT_RETRIEVAL_QUERY,
+            params={
+                "index_name": index_name,
+                "query": query,
+                "limit": k,
+                "labels": list(labels),
+            },
+        )
+        return [
+            (Document(page_content=row["text"], metadata=row["metadata"]), row["score"])
+            for row in rows
+        ]
+
+    return search
+
+
+# Exact cosine search over the FAQ nodes linked to any of the inferred
+# topics. The MATCH starts from the FAQTopic nodes (unique on name), so only
+# the FAQs of those topics are scored (needs Neo4j 5.18+ for
+# vector.similarity.cosine)
+TOPIC_FILTERED_SEARCH_QUERY = """
+MATCH (topic:FAQTopic) WHERE topic.name IN $topics
+MATCH (topic)<-[:ABOUT]-(node:`{label}`)
+WHERE node[$embedding_property] IS NOT NULL
+WITH DISTINCT node
+WITH node, vector.similarity.cosine(node[$embedding_property], $embedding) AS score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+# Older servers: over-fetch from the vector index and filter afterwards
+TOPIC_POST_FILTERED_SEARCH_QUERY = """
+CALL db.index.vector.queryNodes($index_name, $fetch_k, $embedding)
+YIELD node, score
+WHERE any(topic IN node.topics WHERE topic IN $topics)
+WITH node, score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+DEFAULT_RETRIEVAL_QUERY = """
+RETURN node.text AS text, score,
+    node {{.*, text: Null, `{embedding_property}`: Null, id: Null}} AS metadata
+"""
+
+
+def split_topics(related_topics: Any) -> List[str]:
+    """Parse a related_topics value such as "Fees, Payments" into a list"""
+
+    if isinstance(related_topics, (list, tuple)):
+        topics = [str(topic) for topic in related_topics]
+    elif isinstance(related_topics, str):
+        topics = related_topics.split(",")
+    else:
+        return []
+    return [topic.strip().strip('"') for topic in topics if topic.strip().strip('"')]
+
+
+def _terms(text: str) -> List[str]:
+    # Plural "s" is stripped so "fee" matches the "Fees" topic
+    return [
+        term[:-1] if term.endswith("s") and not term.endswith("ss") else term
+        for term in _QUERY_TERM_PATTERN.findall(text.lower())
+        if term not in _STOPWORDS and len(term) > 2
+    ]
+
+
+class TopicInferrer:
+    """Infers the FAQ topics a question is about from keyword weights.
+
+    Each topic's vocabulary is its own name plus the distinctive terms
+    (TF-IDF across topics) of the questions filed under it, so inference is
+    a dictionary lookup rather than a model call.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, Dict[str, float]],
+        max_topics: int = 2,
+        min_score: float = 1.0,
+    ):
+        self.vocabulary = vocabulary
+        self.max_topics = max_topics
+        self.min_score = min_score
+
+    @classmethod
+    def from_examples(
+        cls,
+        examples: List[Tuple[str, Sequence[str]]],
+        terms_per_topic: int = 30,
+        **kwargs: Any,
+    ) -> "TopicInferrer":
+        """Build the vocabulary from (question, topics) pairs"""
+
+        term_counts: Dict[str, Counter] = defaultdict(Counter)
+        for text, topics in examples:
+            for topic in topics:
+                term_counts[topic].update(_terms(text))
+
+        topic_frequency = Counter(
+            term for counts in term_counts.values() for term in counts
+        )
+        vocabulary: Dict[str, Dict[str, float]] = {}
+        for topic, counts in term_counts.items():
+            total = sum(counts.values()) or 1
+            weights = {
+                term: (count / total)
+                * math.log(1 + len(term_counts) / topic_frequency[term])
+                for term, count in counts.items()
+            }
+            top_terms = sorted(weights, key=weights.get, reverse=True)
+            scale = max(weights.values(), default=1.0) or 1.0
+            vocabulary[topic] = {
+                term: weights[term] / scale for term in top_terms[:terms_per_topic]
+            }
+            # A topic's own name is always strong evidence
+            for term in _terms(topic):
+                vocabulary[topic][term] = max(vocabulary[topic].get(term, 0.0), 2.0)
+
+        return cls(vocabulary, **kwargs)
+
+    def infer(self, question: str) -> List[str]:
+        """The most likely topics of `question`, or [] when unsure"""
+
+        terms = set(_terms(question))
+        scores = {
+            topic: sum(weight for term, weight in weights.items() if term in terms)
+            for topic, weights in self.vocabulary.items()
+        }
+        ranked = sorted(
+            (topic for topic, score in scores.items() if score >= self.min_score),
+            key=scores.get,
+            reverse=True,
+        )
+        return ranked[: self.max_topics]
+
+
+def neo4j_topic_examples(graph: Any, label: str) -> List[Tuple[str, List[str]]]:
+    """(question, topics) pairs of the FAQ nodes with a `label`, following
+    VARIANT_OF links from canonical answers to their questions"""
+
+    rows = graph.query(f"""
+        MATCH (node:`{label}`)
+        WHERE node.topics IS NOT NULL
+        OPTIONAL MATCH (node)<-[:VARIANT_OF]-(variant)
+        RETURN coalesce(variant.question, node.question) AS text,
+               node.topics AS topics
+        """)
+    return [(row["text"], split_topics(row["topics"])) for row in rows if row["text"]]
+
+
+def neo4j_topic_filtered_search(
+    vectorstore: Any, label: str
+) -> Callable[[str, List[str], int], List[Tuple[Document, float]]]:
+    """Vector search restricted to FAQ nodes tagged with given topics,
+    through a Neo4jVector store"""
+
+    embedding_property = vectorstore.embedding_node_property
+    retrieval_query = vectorstore.retrieval_query or DEFAULT_RETRIEVAL_QUERY.format(
+        embedding_property=embedding_property
+    )
+
+    def search(
+        question: str, topics: List[str], k: int
+    ) -> List[Tuple[Document, float]]:
+        params = {
+            "embedding": vectorstore.embedding.embed_query(question),
+            "topics": topics,
+            "k": k,
+        }
+        if getattr(vectorstore, "support_metadata_filter", False):
+            query = TOPIC_FILTERED_SEARCH_QUERY.format(label=label)
+            params["embedding_property"] = embedding_property
+        else:
+            query = TOPIC_POST_FILTERED_SEARCH_QUERY
+            params.update(index_name=vectorstore.index_name, fetch_k=k * 10)
+
+        rows = vectorstore.query(query + retrieval_query, params=params)
+        return [
+            (Document(page_content=row["text"], metadata=row["metadata"]), row["score"])
+            for row in rows
+        ]
+
+    return search
+
+
+def _collapse_key(document: Document, collapse_key: str) -> str:
+    return document.metadata.get(collapse_key) or document.page_content
+
+
+class CollapsedFAQRetriever(BaseRetriever):
+    """Retrieves FAQ documents and keeps only the best-scoring document per
+    answer, so paraphrases of the same answer do not crowd out the context.
+
+    Documents are grouped by the `collapse_key` metadata value, or by their
+    text when it is missing. The similarity score of each returned document
+    is stored in its `score` metadata key.
+
+    With a `topic_inferrer` and `topic_search`, the search is restricted to
+    the FAQs tagged with the topics inferred from the question, falling back
+    to the whole index when no topic is inferred or nothing matches.
+    """
+
+    vectorstore: VectorStore
+    k: int = 4
+    fetch_k: int = 20
+    collapse_key: str = "answer_id"
+    topic_inferrer: Optional[TopicInferrer] = None
+    topic_search: Optional[
+        Callable[[str, List[str], int], List[Tuple[Document, float]]]
+    ] = None
+
+    def search_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """The top `k` distinct answers for `query` with their scores"""
+
+        fetch_k = max(self.fetch_k, self.k)
+        topics = self.topic_inferrer.infer(query) if self.topic_inferrer else []
+        results = []
+        if topics and self.topic_search:
+            results = self.topic_search(query, topics, fetch_k)
+            for document, _ in results:
+                document.metadata["topic_filter"] = topics
+        if not results:
+            results = self.vectorstore.similarity_search_with_score(query, k=fetch_k)
+
+        best = {}
+        for document, score in results:
+            key = _collapse_key(document, self.collapse_key)
+            if key not in best or score > best[key][1]:
+                best[key] = (document, score)
+
+        ranked = sorted(best.values(), key=lambda pair: pair[1], reverse=True)
+        for document, score in ranked:
+            document.metadata["score"] = score
+            document.metadata["vector_score"] = score
+
+        return ranked[: self.k]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [document for document, _ in self.search_with_scores(query)]
+
+
+class HybridFAQRetriever(BaseRetriever):
+    """Fuses full-text and vector FAQ retrieval with reciprocal rank fusion.
+
+    Both searches run concurrently. When `fulltext_fast_score` is set, the
+    cheap full-text search runs first instead, and a top hit that scores at
+    least `fulltext_fast_score` and `fulltext_fast_margin` times the runner-up
+    is returned without the embedding call of the vector search (and
+    without a `vector_score`).
+
+    Fused documents carry `score` (fused), `vector_score` and
+    `fulltext_score` metadata keys.
+    """
+
+    vector_retriever: CollapsedFAQRetriever
+    fulltext_search: Callable[[str, int], List[Tuple[Document, float]]]
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    fulltext_fast_score: Optional[float] = None
+    fulltext_fast_margin: float = 1.5
+
+    def _fulltext(self, query: str) -> List[Tuple[Document, float]]:
+        best: Dict[str, Tuple[Document, float]] = {}
+        for document, score in self.fulltext_search(query, self.fetch_k):
+            key = _collapse_key(document, self.vector_retriever.collapse_key)
+            if key not in best or score > best[key][1]:
+                best[key] = (document, score)
+        return sorted(best.values(), key=lambda pair: pair[1], reverse=True)
+
+    def _is_strong_keyword_match(self, results: List[Tuple[Document, float]]) -> bool:
+        if self.fulltext_fast_score is None or not results:
+            return False
+        top = results[0][1]
+        runner_up = results[1][1] if len(results) > 1 else 0.0
+        return top >= self.fulltext_fast_score and (
+            top >= self.fulltext_fast_margin * runner_up
+        )
+
+    def search_with_scores(self, query: str) -> List[Tuple[Document, float]]:
+        """The top `k` distinct answers for `query` with their fused scores"""
+
+        if self.fulltext_fast_score is not None:
+            fulltext_results = self._fulltext(query)
+            if self._is_strong_keyword_match(fulltext_results):
+                for document, score in fulltext_results:
+                    document.metadata["fulltext_score"] = score
+                    document.metadata["score"] = score
+                return fulltext_results[: self.k]
+            vector_results = self.vector_retriever.search_with_scores(query)
+        else:
+            fulltext_future = _SEARCH_POOL.submit(self._fulltext, query)
+            vector_results = self.vector_retriever.search_with_scores(query)
+            fulltext_results = fulltext_future.result()
+
+        fused: Dict[str, Tuple[Document, float]] = {}
+        for name, results in (
+            ("vector_score", vector_results),
+            ("fulltext_score", fulltext_results),
+        ):
+            for rank, (document, score) in enumerate(results, start=1):
+                key = _collapse_key(document, self.vector_retriever.collapse_key)
+                fused_document, fused_score = fused.get(key, (document, 0.0))
+                fused_document.metadata[name] = score
+                fused[key] = (fused_document, fused_score + 1.0 / (self.rrf_k + rank))
+
+        ranked = sorted(fused.values(), key=lambda pair: pair[1], reverse=True)
+        for document, score in ranked:
+            document.metadata["score"] = score
+
+        return ranked[: self.k]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [document for document, _ in self.search_with_scores(query)]
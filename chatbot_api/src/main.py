@@ -1,18 +1,39 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware # prevent unpredictable browers blocks
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from src.agents.bank_rag_agent import bank_rag_agent_executor
 from src.models.bank_rag_query import BankQueryInput, BankQueryOutput
+from src.utils.admission import AdmissionRejected, controller_from_env, traffic_class
 from src.utils.async_utils import async_retry
-from neo4j import GraphDatabase   # add user verification
+from src.utils.deadlines import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    request_deadline,
+    run_until_cancelled,
+)
+from src.utils.tracing import ToolTimer, format_steps, sink_from_env
+from src.utils.session_tokens import (
+    SESSION_TOKEN_TTL_SECONDS,
+    issue_token,
+    lookup_keys,
+    verify_token,
+)
+from neo4j import AsyncGraphDatabase   # add user verification
 import os
+import time
 from src.memory_manager import MemoryManager
 
 # Initialize memory
 memory = MemoryManager()
 
+# Bounds concurrent agent runs and queues the rest by traffic class
+admission = controller_from_env()
+
+# Receives a sample of full agent traces
+trace_sink = sink_from_env()
+
 # Create FastAPI app
 app = FastAPI(
     title="Retail Bank Chatbot",
@@ -36,7 +57,13 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 # Checking NEO4J_URL
 
 print("NEO4J_URI =", os.getenv("NEO4J_URI"))
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+
+# Recent successful verifications, so a retried or repeated login skips the
+# graph: lookup keys -> (expires at, customer id, email)
+VERIFICATION_CACHE_SECONDS = float(os.getenv("VERIFICATION_CACHE_SECONDS", "60"))
+VERIFICATION_CACHE_SIZE = int(os.getenv("VERIFICATION_CACHE_SIZE", "10000"))
+verification_cache: dict = {}
 
 # -----------------------------
 # Step 1: Customer Verification 
@@ -50,37 +77,54 @@ class CustomerVerificationRequest(BaseModel):
 
 # Verify Customer identity endpoint
 @app.post("/verify-customer")
-def verify_customer(data: CustomerVerificationRequest):
+async def verify_customer(data: CustomerVerificationRequest):
+    # Equality on the lookup_* properties the ETL normalizes, so the match is
+    # served by the composite Customer index instead of a label scan
     query = """
     MATCH (c:Customer)
-    WHERE toLower(c.first_name) = toLower($first_name)
-      AND toLower(c.last_name) = toLower($last_name)
-      AND c.zip_code = $zip_code
-      AND c.phone_number = $phone
+    WHERE c.lookup_last_name = $last_name
+      AND c.lookup_first_name = $first_name
+      AND c.lookup_zip = $zip_code
+      AND c.lookup_phone = $phone
     RETURN c.id AS customer_id, c.email AS email
+    LIMIT 1
     """
 
-    with driver.session(database="neo4j") as session:
-        result = session.run(query, {
-            "first_name": data.first_name,
-            "last_name": data.last_name,
-            "zip_code": data.zip_code,
-            "phone": data.phone
-        })
-        record = result.single()
-
-    print("✅ Neo4j raw record:", record)
+    keys = lookup_keys(data.first_name, data.last_name, data.zip_code, data.phone)
+    cached = verification_cache.get(keys)
+    if cached and cached[0] > time.monotonic():
+        _, customer_id, email = cached
+    else:
+        first_name, last_name, zip_code, phone = keys
+        async with driver.session(database="neo4j") as session:
+            result = await session.run(query, {
+                "first_name": first_name,
+                "last_name": last_name,
+                "zip_code": zip_code,
+                "phone": phone
+            })
+            record = await result.single()
+
+        if not record or record.get("customer_id") is None:
+            print("❌ Verification failed: No matching customer found or missing customer_id.")
+            return {"verified": False}
 
-    if record and record.get("customer_id") is not None:
         customer_id = str(record["customer_id"])  # ✅ Ensure string conversion
-        return {
-            "verified": True,
-            "customer_id": customer_id,
-            "email": record.get("email", "")
-        }
-    else:
-        print("❌ Verification failed: No matching customer found or missing customer_id.")
-        return {"verified": False}
+        email = record.get("email", "")
+        if len(verification_cache) >= VERIFICATION_CACHE_SIZE:
+            verification_cache.clear()
+        verification_cache[keys] = (
+            time.monotonic() + VERIFICATION_CACHE_SECONDS, customer_id, email
+        )
+
+    return {
+        "verified": True,
+        "customer_id": customer_id,
+        "email": email,
+        # Sent with later chat turns instead of verifying again
+        "session_token": issue_token(customer_id),
+        "expires_in": SESSION_TOKEN_TTL_SECONDS,
+    }
 
 
 # ------------------------------
@@ -95,13 +139,13 @@ def verify_customer(data: CustomerVerificationRequest):
 # Step 3: Protected Chat Agent Endpoint
 # -------------------------------------
 @async_retry(max_retries=10, delay=1)
-async def invoke_agent_with_retry(input_payload:dict):
+async def invoke_agent_with_retry(input_payload:dict, config:dict=None):
     """
     Retry the agent if a tool fails to run. This can help when there
     are intermittent connection issues to external APIs.
     """
 
-    return await bank_rag_agent_executor.ainvoke(input_payload)
+    return await bank_rag_agent_executor.ainvoke(input_payload, config=config)
 
 
 
@@ -116,9 +160,21 @@ async def ask_bank_agent(query: BankQueryInput, request:Request) -> BankQueryOut
     role = query.role
     customer_id = query.customer_id
 
+    # Customers are identified by the session token from /verify-customer
+    # only, never by a customer_id the client sends
+    verified_customer_id = None
+    if role == "Customer":
+        if query.session_token:
+            verified_customer_id = verify_token(query.session_token)
+        if verified_customer_id is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Missing or expired session, please verify again.",
+            )
+        customer_id = verified_customer_id
+
     # <added> get memory from history
     history = memory.get_messages(role,customer_id)
-    memory.append_message(role, customer_id, f"{role}: {query.input}")
 
     # <added> prepend history
     full_input = "\n".join(history) + f"\n{role}: {query.input}"
@@ -137,18 +193,54 @@ async def ask_bank_agent(query: BankQueryInput, request:Request) -> BankQueryOut
         "role": role
     }
 
-    # debug
-    print("📨 Agent input payload:", input_payload)
-
-    #  call ainvoke with full payload
-    query_response = await invoke_agent_with_retry(input_payload)
-
-    query_response["intermediate_steps"] = [
-        str(s) for s in query_response["intermediate_steps"]
-    ]
-    print(query_response)
-
-    # <added> Save response to memory
+    #  call ainvoke with full payload once admitted, abandoning the agent run
+    #  as soon as the client disconnects or the request deadline passes
+    deadline = request_deadline(request)
+    timer = ToolTimer()
+    started = time.perf_counter()
+    try:
+        # An exhausted deadline is a timeout, not a sign of overload
+        deadline.check()
+        async with admission.admit(
+            traffic_class(role, verified_customer_id), timeout=deadline.remaining()
+        ):
+            query_response = await run_until_cancelled(
+                request,
+                deadline,
+                lambda: invoke_agent_with_retry(input_payload, {"callbacks": [timer]}),
+            )
+    except AdmissionRejected as e:
+        if deadline.remaining() == 0.0:
+            # The queue wait was cut short by the request's own deadline
+            raise HTTPException(status_code=504, detail="The request deadline passed.")
+        # Shed load quickly rather than serving everyone slowly
+        return JSONResponse(
+            status_code=429,
+            content={"status": "overloaded", "detail": e.reason},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="The request deadline passed.")
+    except ClientDisconnected:
+        # Nobody is waiting for the answer (499: client closed request)
+        return JSONResponse(status_code=499, content={"status": "cancelled"})
+
+    steps = query_response["intermediate_steps"]
+    query_response["intermediate_steps"] = format_steps(
+        steps, timer.timings, query.verbosity
+    )
+    trace_sink.submit({
+        "role": role,
+        "customer_id": customer_id,
+        "input": input_payload["input"],
+        "output": query_response["output"],
+        "seconds": time.perf_counter() - started,
+        "tool_timings": timer.timings,
+        "intermediate_steps": [str(s) for s in steps],
+    })
+
+    # <added> Save question and response to memory
+    memory.append_message(role, customer_id, f"{role}: {query.input}")
     memory.append_message(role, customer_id, f"bot: {query_response['output']}")
 
     return query_response
@@ -165,6 +257,11 @@ async def reset_conversation(request: Request, role: str="Customer"):
         return JSONResponse(status_code=500, content = {"status": "error", "message": str(e)})
 
 
+@app.get("/metrics/admission")
+async def get_admission_metrics():
+    return admission.metrics()
+
+
 @app.get("/")
 async def get_status():
     return {"status": "running"}
\ No newline at end of file
@@ -1,10 +1,15 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
+
+from src.utils.tracing import DEFAULT_VERBOSITY
 
 class BankQueryInput(BaseModel):
     input: str
     customer_id: Optional[str] = None
     role: Optional[str] = None  
+    session_token: Optional[str] = None  # issued by /verify-customer
+    # none: no steps, summary: tool names, timings and Cypher, full: raw steps
+    verbosity: Literal["none", "summary", "full"] = DEFAULT_VERBOSITY
 
 class BankQueryOutput(BaseModel):
     output: str
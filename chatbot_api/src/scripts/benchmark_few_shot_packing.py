@@ -0,0 +1,109 @@
+"""
+Benchmark few-shot example packing against the example Cypher CSV.
+
+Every example question is used as a query against the remaining examples.
+Candidates are ranked with a lexical cosine similarity as an offline stand-in
+for the vector index, and the prompt size of the unpacked example block is
+compared with the packed one.
+
+Run from the chatbot_api directory:
+
+    python -m src.scripts.benchmark_few_shot_packing --csv ../data/example_cypher.csv
+"""
+
+import argparse
+import math
+import re
+import statistics
+import time
+from collections import Counter
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from src.langchain_custom.graph_qa.cypher import format_retrieved_documents
+from src.langchain_custom.graph_qa.few_shot import (
+    approximate_token_count,
+    pack_few_shot_examples,
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _bag_of_words(text: str) -> Counter:
+    return Counter(_TOKEN_PATTERN.findall(text.lower()))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b[token] for token, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(
+        sum(v * v for v in b.values())
+    )
+    return dot / norm if norm else 0.0
+
+
+def run_benchmark(
+    csv_path: str, k: int, token_budget: int, min_similarity: float
+) -> dict:
+    """Compare unpacked and packed example blocks for every example question"""
+
+    df = pd.read_csv(csv_path)
+    documents = [
+        Document(page_content=row.question, metadata={"cypher": row.cypher})
+        for row in df.itertuples(index=False)
+    ]
+    bags = [_bag_of_words(doc.page_content) for doc in documents]
+
+    baseline_tokens, packed_tokens, packed_counts = [], [], []
+    baseline_seconds = packed_seconds = 0.0
+
+    for i, query_bag in enumerate(bags):
+        scored = sorted(
+            (
+                (documents[j], _cosine(query_bag, bags[j]))
+                for j in range(len(documents))
+                if j != i
+            ),
+            key=lambda pair: pair[1],
+            reverse=True,
+        )[:k]
+
+        start = time.perf_counter()
+        baseline = format_retrieved_documents([doc for doc, _ in scored])
+        baseline_seconds += time.perf_counter() - start
+        baseline_tokens.append(approximate_token_count(baseline))
+
+        start = time.perf_counter()
+        packed = pack_few_shot_examples(
+            scored,
+            token_budget=token_budget,
+            min_similarity=min_similarity,
+            metadata_keys=["cypher"],
+        )
+        packed_seconds += time.perf_counter() - start
+        packed_tokens.append(packed.tokens_used)
+        packed_counts.append(len(packed.included))
+
+    return {
+        "queries": len(documents),
+        "baseline_mean_tokens": statistics.mean(baseline_tokens),
+        "packed_mean_tokens": statistics.mean(packed_tokens),
+        "packed_max_tokens": max(packed_tokens),
+        "packed_mean_examples": statistics.mean(packed_counts),
+        "token_reduction": 1 - sum(packed_tokens) / sum(baseline_tokens),
+        "baseline_ms": baseline_seconds * 1000,
+        "packed_ms": packed_seconds * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", default="../data/example_cypher.csv")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--token-budget", type=int, default=800)
+    parser.add_argument("--min-similarity", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.csv, args.k, args.token_budget, args.min_similarity)
+    for name, value in results.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
@@ -1,11 +1,30 @@
+"""
+Incrementally embeds the FAQ CSV into Neo4j. Run from the directory that
+contains `src` (the chatbot_api directory, or /app in the container):
+
+    python -m src.scripts.index_faqs
+"""
+
 import os
+import time
+import random
+import asyncio
+import hashlib
 import logging
+import openai
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
-from langchain.docstore.document import Document
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
+
+from src.utils.embeddings import (
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MODEL,
+    RESOLVE_ALIAS_QUERY,
+    SWITCH_ALIAS_QUERY,
+    build_embeddings,
+    versioned_target,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,91 +38,591 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 FAQS_CSV_PATH = os.getenv("FAQS_CSV_PATH", "./data/faqs.csv") # Default path if not set
 
-def clear_existing_faqs():
+# Rows read from the CSV at a time, rows per embedding request / UNWIND
+# write, and embedding requests in flight
+FAQ_CSV_CHUNK_SIZE = int(os.getenv("FAQ_CSV_CHUNK_SIZE", "2000"))
+FAQ_EMBED_BATCH_SIZE = int(os.getenv("FAQ_EMBED_BATCH_SIZE", "100"))
+FAQ_EMBED_CONCURRENCY = int(os.getenv("FAQ_EMBED_CONCURRENCY", "4"))
+FAQ_EMBED_MAX_RETRIES = int(os.getenv("FAQ_EMBED_MAX_RETRIES", "8"))
+
+# "canonical" stores one FAQAnswer node per distinct answer, linked to its
+# FAQVariant question nodes and indexed by the centroid of their embeddings;
+# "questions" keeps one indexed FAQs node per CSV row
+FAQ_INDEX_LAYOUT = os.getenv("FAQ_INDEX_LAYOUT", "canonical")
+
+FAQ_INDEX_NAME = "faqs"
+FAQ_NODE_LABEL = "FAQs"
+FAQ_ANSWER_INDEX_NAME = "faq_answers"
+FAQ_ANSWER_LABEL = "FAQAnswer"
+FAQ_VARIANT_LABEL = "FAQVariant"
+FAQ_TOPIC_LABEL = "FAQTopic"
+
+
+def sync_topics(node: str) -> str:
+    """
+    Cypher linking `node` to an FAQTopic node per entry of its `topics`
+    list, and unlinking topics no longer in it. Topic-filtered search
+    starts from the topic nodes, so it only touches the FAQs they link to.
+    """
+    return f"""
+CALL {{
+    WITH {node}
+    OPTIONAL MATCH ({node})-[old:ABOUT]->(topic:{FAQ_TOPIC_LABEL})
+    WHERE NOT topic.name IN coalesce({node}.topics, [])
+    DELETE old
+}}
+CALL {{
+    WITH {node}
+    UNWIND coalesce({node}.topics, []) AS name
+    MERGE (topic:{FAQ_TOPIC_LABEL} {{name: name}})
+    MERGE ({node})-[:ABOUT]->(topic)
+}}"""
+
+
+WRITE_FAQS_QUERY = f"""
+UNWIND $rows AS row
+MERGE (n:{FAQ_NODE_LABEL} {{id: row.id}})
+SET n.text = row.text, n += row.metadata
+WITH n, row
+{sync_topics("n")}
+WITH n, row
+CALL db.create.setNodeVectorProperty(n, $embedding_property, row.embedding)
+"""
+
+WRITE_VARIANTS_QUERY = f"""
+UNWIND $rows AS row
+MERGE (a:{FAQ_ANSWER_LABEL} {{id: row.answer_id}})
+SET a.answer = row.answer, a.text = row.answer, a.related_topics = row.related_topics,
+    a.topics = row.topics
+WITH a, row
+{sync_topics("a")}
+MERGE (v:{FAQ_VARIANT_LABEL} {{id: row.id}})
+SET v += row.metadata
+WITH v, a, row
+CALL db.create.setNodeVectorProperty(v, $embedding_property, row.embedding)
+WITH v, a
+OPTIONAL MATCH (v)-[old:VARIANT_OF]->(other)
+WHERE other <> a
+DELETE old
+MERGE (v)-[:VARIANT_OF]->(a)
+"""
+
+# Keyword search for the hybrid FAQ retriever, over both index layouts
+CREATE_FULLTEXT_INDEX_QUERY = f"""
+CREATE FULLTEXT INDEX faq_fulltext IF NOT EXISTS
+FOR (n:{FAQ_NODE_LABEL}|{FAQ_ANSWER_LABEL}|{FAQ_VARIANT_LABEL})
+ON EACH [n.question, n.answer, n.related_topics]
+"""
+
+# Topic nodes are looked up by name when pre-filtering vector search
+CREATE_TOPIC_CONSTRAINT_QUERY = f"""
+CREATE CONSTRAINT IF NOT EXISTS FOR (t:{FAQ_TOPIC_LABEL}) REQUIRE t.name IS UNIQUE
+"""
+
+CREATE_INDEX_QUERY = """
+CREATE VECTOR INDEX {index_name} IF NOT EXISTS
+FOR (n:{label}) ON (n.{embedding_property})
+OPTIONS {{indexConfig: {{
+    `vector.dimensions`: $dimensions,
+    `vector.similarity_function`: 'cosine'
+}}}}
+"""
+
+def embedding_key(model: str, dimensions: int = None) -> str:
+    """The model identity stored with, and hashed into, every FAQ"""
+    return f"{model}@{dimensions}" if dimensions else model
+
+
+def split_topics(related_topics) -> list:
+    """
+    Parses a related_topics value such as "Fees, Payments" into a list.
+    """
+    if not isinstance(related_topics, str):
+        return []
+    return [t.strip().strip('"') for t in related_topics.split(",") if t.strip().strip('"')]
+
+
+def prepare_faqs(
+    df: pd.DataFrame, embedding_model: str, layout: str = "questions"
+) -> pd.DataFrame:
+    """
+    Adds the `faq_id`, `answer_id`, `text` and `content_hash` columns to a
+    chunk of FAQ rows. The id is the `faq_id` column when the CSV has one,
+    otherwise a hash of the question; the content hash covers the answer,
+    the topics and the embedding model, so unchanged rows are never
+    re-embedded. In the canonical layout only the question is embedded.
+    """
+    df = df.dropna(subset=['question', 'answer']).fillna('')
+    questions = df['question'].astype(str)
+    if 'related_topics' not in df.columns:
+        df = df.assign(related_topics='')
+
+    question_ids = "faq-" + pd.Series(
+        [hashlib.sha256(q.encode()).hexdigest()[:16] for q in questions],
+        index=df.index,
+        dtype=object,
+    )
+    if 'faq_id' in df.columns:
+        ids = df['faq_id'].astype(str).str.strip()
+        ids = ids.where(ids != '', question_ids)
+    else:
+        ids = question_ids
+
+    answers = df['answer'].astype(str)
+    answer_ids = [
+        "ans-" + hashlib.sha256(a.strip().encode()).hexdigest()[:16] for a in answers
+    ]
+    if layout == "canonical":
+        text = questions
+    else:
+        text = "Question: " + questions + "\nAnswer: " + answers
+    content = (
+        embedding_model + "\n" + layout + "\n" + text + "\n" + answers
+        + "\n" + df['related_topics'].astype(str)
+    )
+    hashes = [hashlib.sha256(c.encode()).hexdigest() for c in content]
+
+    return df.assign(faq_id=ids, answer_id=answer_ids, text=text, content_hash=hashes)
+
+
+def plan_faq_changes(
+    df: pd.DataFrame, existing_hashes: dict, embedding_model: str, layout: str = "questions"
+):
     """
-    Connects to Neo4j and deletes all nodes with the 'FAQs' label to prevent
-    the ConstraintError on subsequent runs.
+    Compares FAQ rows against the content hashes stored on the FAQ nodes.
+    Returns the rows to (re-)embed and the ids of nodes missing from `df`.
     """
+    df = prepare_faqs(df, embedding_model, layout)
+    df = df.drop_duplicates(subset='faq_id', keep='last')
+    stored = df['faq_id'].map(existing_hashes)
+    changed = df[stored != df['content_hash']]
+    removed = sorted(set(existing_hashes) - set(df['faq_id']))
+    return changed, removed
+
+
+class AdaptiveBackoff:
+    """
+    Shared pause for all embedding workers. Every rate-limit response
+    doubles it (or uses the provider's Retry-After), successful calls decay
+    it, so concurrency settles just below the provider's limit.
+    """
+
+    def __init__(self, initial: float = 1.0, maximum: float = 60.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = 0.0
+        self.rate_limited = 0
+
+    async def wait(self):
+        if self.delay:
+            await asyncio.sleep(self.delay * random.uniform(0.5, 1.0))
+
+    def on_rate_limit(self, retry_after: float = None):
+        self.rate_limited += 1
+        self.delay = min(self.maximum, retry_after or max(self.initial, self.delay * 2))
+
+    def on_success(self):
+        self.delay = self.delay / 2 if self.delay > 0.1 else 0.0
+
+
+def _retry_after(error: openai.RateLimitError):
     try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
-        with driver.session(database="neo4j") as session:
-            logger.info("Clearing all existing FAQ nodes from the database...")
-            # This Cypher query finds all FAQ nodes and removes them and their relationships
-            session.run("MATCH (n:FAQs) DETACH DELETE n")
-            logger.info("Successfully cleared existing FAQ nodes.")
-        driver.close()
-    except Exception as e:
-        logger.error(f"Failed to clear existing FAQs from Neo4j. Error: {e}")
-        # We raise the exception to stop the script if we can't clear the DB
-        raise e
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
 
-def index_faqs():
+
+async def embed_batch(embeddings, texts: list, semaphore, backoff: AdaptiveBackoff):
     """
-    Reads the FAQ CSV file and indexes the questions and answers into a
-    Neo4j vector store for Retrieval-Augmented Generation (RAG).
+    Embeds one batch under the concurrency semaphore, retrying rate-limited
+    requests with the shared adaptive backoff.
     """
-    if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, OPENAI_API_KEY]):
-        logger.error("Missing required environment variables. Please check your .env file.")
+    for attempt in range(FAQ_EMBED_MAX_RETRIES + 1):
+        await backoff.wait()
+        async with semaphore:
+            try:
+                vectors = await embeddings.aembed_documents(texts)
+                backoff.on_success()
+                return vectors
+            except openai.RateLimitError as e:
+                if attempt == FAQ_EMBED_MAX_RETRIES:
+                    raise
+                backoff.on_rate_limit(_retry_after(e))
+                logger.warning(f"Rate limited, backing off {backoff.delay:.1f}s.")
+
+
+async def write_batch(
+    driver, batch: pd.DataFrame, vectors: list, embedding_model: str,
+    embedding_property: str = "embedding",
+):
+    if FAQ_INDEX_LAYOUT == "canonical":
+        rows = [
+            {
+                'id': row.faq_id,
+                'answer_id': row.answer_id,
+                'answer': row.answer,
+                'related_topics': str(row.related_topics),
+                'topics': split_topics(row.related_topics),
+                'embedding': vector,
+                'metadata': {
+                    'faq_id': row.faq_id,
+                    'question': row.question,
+                    'content_hash': row.content_hash,
+                    'embedding_model': embedding_model,
+                },
+            }
+            for row, vector in zip(batch.itertuples(index=False), vectors)
+        ]
+        await driver.execute_query(
+            WRITE_VARIANTS_QUERY,
+            rows=rows,
+            embedding_property=embedding_property,
+            database_="neo4j",
+        )
         return
 
-    # --- Step 1: Clear existing data (The Fix) ---
-    clear_existing_faqs()
+    rows = [
+        {
+            'id': row.faq_id,
+            'text': row.text,
+            'embedding': vector,
+            'metadata': {
+                'faq_id': row.faq_id,
+                'answer_id': row.answer_id,
+                'question': row.question,
+                'answer': row.answer,
+                'related_topics': str(row.related_topics),
+                'topics': split_topics(row.related_topics),
+                'content_hash': row.content_hash,
+                'embedding_model': embedding_model,
+            },
+        }
+        for row, vector in zip(batch.itertuples(index=False), vectors)
+    ]
+    await driver.execute_query(
+        WRITE_FAQS_QUERY,
+        rows=rows,
+        embedding_property=embedding_property,
+        database_="neo4j",
+    )
 
-    # --- Step 2: Read the corrected CSV file ---
-    logger.info(f"Reading FAQ data from {FAQS_CSV_PATH}")
-    try:
-        # Use pandas to read the CSV, which is robust
-        df = pd.read_csv(FAQS_CSV_PATH, quotechar='"', skip_blank_lines=True)
-        # Ensure the required columns exist
-        required_columns = ['question', 'answer']
-        if not all(col in df.columns for col in required_columns):
-            logger.error(f"CSV file must contain the following columns: {required_columns}")
-            return
-    except FileNotFoundError:
-        logger.error(f"The FAQ file was not found at path: {FAQS_CSV_PATH}")
+
+async def refresh_answer_centroids(
+    driver, answer_ids: set, batch_size: int = 100,
+    index_name: str = FAQ_ANSWER_INDEX_NAME, embedding_property: str = "embedding",
+) -> int:
+    """
+    Recomputes the embedding of each affected FAQAnswer node as the
+    normalized mean of its variants' embeddings, then deletes answers that
+    lost all of their variants. Returns the number of refreshed answers.
+    """
+    refreshed = 0
+    index_ready = False
+    answer_ids = sorted(answer_ids)
+    for start in range(0, len(answer_ids), batch_size):
+        records, _, _ = await driver.execute_query(
+            f"""
+            MATCH (a:{FAQ_ANSWER_LABEL}) WHERE a.id IN $ids
+            MATCH (a)<-[:VARIANT_OF]-(v:{FAQ_VARIANT_LABEL})
+            RETURN a.id AS id, collect(v[$embedding_property]) AS embeddings,
+                   collect(v.question)[..5] AS sample_questions
+            """,
+            ids=answer_ids[start:start + batch_size],
+            embedding_property=embedding_property,
+            database_="neo4j",
+        )
+        rows = []
+        for record in records:
+            if not record['embeddings']:
+                continue
+            centroid = np.mean(np.asarray(record['embeddings'], dtype=float), axis=0)
+            centroid /= np.linalg.norm(centroid) or 1.0
+            rows.append(
+                {
+                    'id': record['id'],
+                    'embedding': centroid.tolist(),
+                    'variant_count': len(record['embeddings']),
+                    'sample_questions': record['sample_questions'],
+                }
+            )
+        if not rows:
+            continue
+
+        if not index_ready:
+            await driver.execute_query(
+                CREATE_INDEX_QUERY.format(
+                    index_name=index_name,
+                    label=FAQ_ANSWER_LABEL,
+                    embedding_property=embedding_property,
+                ),
+                dimensions=len(rows[0]['embedding']),
+                database_="neo4j",
+            )
+            index_ready = True
+        await driver.execute_query(
+            f"""
+            UNWIND $rows AS row
+            MATCH (a:{FAQ_ANSWER_LABEL} {{id: row.id}})
+            SET a.variant_count = row.variant_count,
+                a.sample_questions = row.sample_questions
+            WITH a, row
+            CALL db.create.setNodeVectorProperty(a, $embedding_property, row.embedding)
+            """,
+            rows=rows,
+            embedding_property=embedding_property,
+            database_="neo4j",
+        )
+        refreshed += len(rows)
+
+    await driver.execute_query(
+        f"MATCH (a:{FAQ_ANSWER_LABEL}) WHERE NOT (a)<-[:VARIANT_OF]-() DETACH DELETE a",
+        database_="neo4j",
+    )
+    return refreshed
+
+
+async def switch_index_alias(driver, alias_name: str, target):
+    """
+    Points the alias read by the FAQ chain at the index this run wrote,
+    once that index has been fully built.
+    """
+    records, _, _ = await driver.execute_query(
+        RESOLVE_ALIAS_QUERY, name=alias_name, database_="neo4j"
+    )
+    current = records[0]['index_name'] if records else alias_name
+    if current == target.index_name:
         return
-    except Exception as e:
-        logger.error(f"Failed to read or parse the CSV file. Error: {e}")
+
+    records, _, _ = await driver.execute_query(
+        "SHOW VECTOR INDEXES YIELD name WHERE name = $name RETURN name",
+        name=target.index_name,
+        database_="neo4j",
+    )
+    if not records:
         return
+    await driver.execute_query(
+        "CALL db.awaitIndex($name, 300)", name=target.index_name, database_="neo4j"
+    )
+    await driver.execute_query(
+        SWITCH_ALIAS_QUERY,
+        name=alias_name,
+        index_name=target.index_name,
+        embedding_property=target.embedding_property,
+        model=target.model,
+        dimensions=target.dimensions,
+        database_="neo4j",
+    )
+    logger.info(f"Switched {alias_name} from {current} to {target.index_name}.")
 
-    # --- Step 3: Create LangChain Document objects ---
-    # We combine the question and answer for better semantic search results.
-    # The 'metadata' holds the original fields for reference.
-    documents = []
-    for _, row in df.iterrows():
-        doc = Document(
-            page_content=f"Question: {row['question']}\nAnswer: {row['answer']}",
-            metadata={
-                'faq_id': str(row.get('faq_id', '')),
-                'question': row['question'],
-                'answer': row['answer'],
-                'related_topics': str(row.get('related_topics', ''))
-            }
-        )
-        documents.append(doc)
 
-    logger.info(f"Prepared {len(documents)} documents for indexing.")
+def read_faq_chunks(path: str):
+    """The FAQ CSV in chunks of FAQ_CSV_CHUNK_SIZE rows, keeping their
+    positions in the file as the index"""
+    for chunk in pd.read_csv(
+        path, quotechar='"', skip_blank_lines=True, chunksize=FAQ_CSV_CHUNK_SIZE
+    ):
+        missing = {'question', 'answer'} - set(chunk.columns)
+        if missing:
+            raise ValueError(f"CSV file is missing the columns: {sorted(missing)}")
+        yield chunk
+
+
+def latest_rows(path: str, embedding_model: str) -> set:
+    """
+    Positions of the last row of every FAQ id in the CSV. Read once before
+    indexing, so a later duplicate of an id always replaces earlier ones,
+    whether or not they fall in the same chunk.
+    """
+    last = {}
+    for chunk in read_faq_chunks(path):
+        ids = prepare_faqs(chunk, embedding_model)['faq_id']
+        last.update(zip(ids, ids.index))
+    return set(last.values())
+
+
+class IndexingStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows_read = 0
+        self.rows_embedded = 0
+        self.embed_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows_embedded / elapsed if elapsed else 0.0
+
+
+async def index_faqs_async():
+    """
+    Streams the FAQ CSV in chunks, embeds new or changed rows in concurrent
+    batches and writes each batch with a single UNWIND query as soon as it
+    is embedded. Every written batch carries its content hashes, so an
+    interrupted run resumes with only the rows that are still missing.
+    """
+    canonical = FAQ_INDEX_LAYOUT == "canonical"
+    alias_name = FAQ_ANSWER_INDEX_NAME if canonical else FAQ_INDEX_NAME
+    target = versioned_target(alias_name, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+    index_name, embedding_property = target.index_name, target.embedding_property
+    embeddings = build_embeddings(
+        target.model, target.dimensions, max_retries=0  # retries are handled here
+    )
+    model_key = embedding_key(target.model, target.dimensions)
+    driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    semaphore = asyncio.Semaphore(FAQ_EMBED_CONCURRENCY)
+    backoff = AdaptiveBackoff()
+    stats = IndexingStats()
+    label = FAQ_VARIANT_LABEL if canonical else FAQ_NODE_LABEL
+    # The questions layout indexes its nodes directly; canonical variants
+    # are only indexed through their answer's centroid
+    index_ready = canonical
+    seen_ids = set()
+    affected_answers = set()
+
+    async def process(batch: pd.DataFrame):
+        nonlocal index_ready
+        started = time.perf_counter()
+        vectors = await embed_batch(embeddings, list(batch['text']), semaphore, backoff)
+        stats.embed_seconds += time.perf_counter() - started
+
+        if not index_ready:
+            await driver.execute_query(
+                CREATE_INDEX_QUERY.format(
+                    index_name=index_name,
+                    label=FAQ_NODE_LABEL,
+                    embedding_property=embedding_property,
+                ),
+                dimensions=len(vectors[0]),
+                database_="neo4j",
+            )
+            index_ready = True
+
+        started = time.perf_counter()
+        await write_batch(driver, batch, vectors, model_key, embedding_property)
+        stats.write_seconds += time.perf_counter() - started
+        stats.rows_embedded += len(batch)
 
-    # --- Step 4: Index documents into Neo4jVector ---
-    logger.info("Starting indexing process into Neo4jVector...")
     try:
-        # This command connects to OpenAI to create embeddings and then saves
-        # them to your Neo4j database.
-        _ = Neo4jVector.from_documents(
-            documents=documents,
-            embedding=OpenAIEmbeddings(),
-            url=NEO4J_URI,
-            username=NEO4J_USERNAME,
-            password=NEO4J_PASSWORD,
-            index_name="faqs",          # Name of the vector index in Neo4j
-            node_label="FAQs",          # Label for the nodes created in Neo4j
-            embedding_node_property="embedding", # Property to store the vector
+        await driver.execute_query(CREATE_FULLTEXT_INDEX_QUERY, database_="neo4j")
+        topic_label = FAQ_ANSWER_LABEL if canonical else FAQ_NODE_LABEL
+        await driver.execute_query(CREATE_TOPIC_CONSTRAINT_QUERY, database_="neo4j")
+        if canonical:
+            # Keeps the per-row MERGEs of the variant writes index-backed
+            for node_label in (FAQ_ANSWER_LABEL, FAQ_VARIANT_LABEL):
+                await driver.execute_query(
+                    f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{node_label}) "
+                    "REQUIRE n.id IS UNIQUE",
+                    database_="neo4j",
+                )
+
+        records, _, _ = await driver.execute_query(
+            f"""
+            MATCH (n:{label})
+            OPTIONAL MATCH (n)-[:VARIANT_OF]->(a:{FAQ_ANSWER_LABEL})
+            RETURN n.id AS id, n.content_hash AS content_hash, a.id AS answer_id
+            """,
+            database_="neo4j",
+        )
+        existing_hashes = {record['id']: record['content_hash'] for record in records}
+        existing_answers = {record['id']: record['answer_id'] for record in records}
+
+        keep = latest_rows(FAQS_CSV_PATH, model_key)
+        for chunk in read_faq_chunks(FAQS_CSV_PATH):
+            stats.rows_read += len(chunk)
+            # Only the last row of a duplicated id is indexed
+            chunk = chunk[chunk.index.isin(keep)]
+            changed, _ = plan_faq_changes(
+                chunk, existing_hashes, model_key, FAQ_INDEX_LAYOUT
+            )
+            seen_ids.update(prepare_faqs(chunk, model_key)['faq_id'])
+            affected_answers.update(changed['answer_id'])
+            affected_answers.update(existing_answers.get(i) for i in changed['faq_id'])
+
+            await asyncio.gather(
+                *(
+                    process(changed.iloc[start:start + FAQ_EMBED_BATCH_SIZE])
+                    for start in range(0, len(changed), FAQ_EMBED_BATCH_SIZE)
+                )
+            )
+            logger.info(
+                f"Read {stats.rows_read} rows, embedded {stats.rows_embedded} "
+                f"({stats.rows_per_second():.1f} rows/s)."
+            )
+
+        removed = sorted(set(existing_hashes) - seen_ids)
+        if removed:
+            await driver.execute_query(
+                f"UNWIND $ids AS id MATCH (n:{label} {{id: id}}) DETACH DELETE n",
+                ids=removed,
+                database_="neo4j",
+            )
+            affected_answers.update(existing_answers.get(i) for i in removed)
+
+        # Backfill topic lists and links on nodes indexed before they were
+        # stored, then drop topics no FAQ is about any more
+        await driver.execute_query(
+            f"""
+            MATCH (n:{topic_label})
+            WHERE n.topics IS NULL AND n.related_topics IS NOT NULL
+            SET n.topics = [topic IN split(n.related_topics, ',')
+                            WHERE trim(topic) <> '' | trim(topic)]
+            """,
+            database_="neo4j",
+        )
+        await driver.execute_query(
+            f"""
+            MATCH (n:{topic_label})
+            WHERE size(n.topics) > 0 AND NOT (n)-[:ABOUT]->(:{FAQ_TOPIC_LABEL})
+            {sync_topics("n")}
+            """,
+            database_="neo4j",
         )
-        logger.info("Successfully indexed all FAQs into Neo4j.")
+        await driver.execute_query(
+            f"MATCH (t:{FAQ_TOPIC_LABEL}) WHERE NOT (t)<-[:ABOUT]-() DELETE t",
+            database_="neo4j",
+        )
+
+        affected_answers.discard(None)
+        if canonical and affected_answers:
+            refreshed = await refresh_answer_centroids(
+                driver,
+                affected_answers,
+                index_name=index_name,
+                embedding_property=embedding_property,
+            )
+            logger.info(f"Refreshed {refreshed} canonical answers.")
+
+        await switch_index_alias(driver, alias_name, target)
+
+        logger.info(
+            f"{len(seen_ids)} FAQs: {stats.rows_embedded} embedded, {len(removed)} removed, "
+            f"{len(seen_ids) - stats.rows_embedded} unchanged in "
+            f"{time.perf_counter() - stats.started:.1f}s "
+            f"({stats.rows_per_second():.1f} rows/s; {stats.embed_seconds:.1f}s in embedding calls, "
+            f"{stats.write_seconds:.1f}s in writes, {backoff.rate_limited} rate-limited requests)."
+        )
+    finally:
+        await driver.close()
+
+
+def index_faqs():
+    """
+    Incrementally indexes the FAQ CSV into the Neo4j vector store. Only new
+    or changed FAQs are embedded, FAQs removed from the CSV are deleted, and
+    nothing is written when the CSV and embedding model are unchanged.
+    """
+    if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, OPENAI_API_KEY]):
+        logger.error("Missing required environment variables. Please check your .env file.")
+        return
+
+    logger.info(f"Reading FAQ data from {FAQS_CSV_PATH}")
+    try:
+        asyncio.run(index_faqs_async())
+    except FileNotFoundError:
+        logger.error(f"The FAQ file was not found at path: {FAQS_CSV_PATH}")
     except Exception as e:
-        logger.error(f"An error occurred during the Neo4jVector indexing process. Error: {e}")
+        logger.error(f"An error occurred during the FAQ indexing process. Error: {e}")
         logger.error("Please check your Neo4j credentials, OpenAI API key, and network connection.")
 
 if __name__ == "__main__":
     index_faqs()
-
@@ -0,0 +1,268 @@
+"""
+Migrate a vector index to another embedding model or dimensionality online.
+
+The new index is built next to the live one on its own embedding property,
+so search keeps working while it is backfilled:
+
+    build     create the new index and backfill its vectors in batches
+    compare   recall@k of the new index against the live one, using the
+              questions in data/example_cypher.csv
+    switch    backfill nodes added since `build`, then point the index alias
+              at the new index in a single statement
+    drop-old  drop the previous index and its embedding property
+
+Services resolve the alias when they start. The FAQ indexes are rebuilt and
+switched by scripts/index_faqs.py instead, from the same EMBEDDING_MODEL and
+EMBEDDING_DIMENSIONS settings.
+
+Run from the chatbot_api directory:
+
+    python -m src.scripts.migrate_vector_index build --dimensions 512 \
+        --model text-embedding-3-small
+    python -m src.scripts.migrate_vector_index compare --dimensions 512 \
+        --model text-embedding-3-small --csv ../data/example_cypher.csv
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+from langchain_community.graphs import Neo4jGraph
+
+from src.utils.embeddings import (
+    ALIAS_LABEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MODEL,
+    VectorIndexTarget,
+    resolve_vector_index,
+    switch_vector_index,
+    versioned_target,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+NEO4J_CYPHER_EXAMPLES_INDEX_NAME = os.getenv("NEO4J_CYPHER_EXAMPLES_INDEX_NAME", "questions")
+NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY = os.getenv(
+    "NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY", "question"
+)
+
+CREATE_INDEX_QUERY = """
+CREATE VECTOR INDEX {index_name} IF NOT EXISTS
+FOR (n:{label}) ON (n.{embedding_property})
+OPTIONS {{indexConfig: {{
+    `vector.dimensions`: $dimensions,
+    `vector.similarity_function`: 'cosine'
+}}}}
+"""
+
+PENDING_NODES_QUERY = """
+MATCH (n:{label})
+WHERE n[$text_property] IS NOT NULL AND n[$text_property] <> ''
+  AND n[$embedding_property] IS NULL
+RETURN elementId(n) AS id, n[$text_property] AS text
+LIMIT $limit
+"""
+
+WRITE_VECTORS_QUERY = """
+UNWIND $rows AS row
+MATCH (n) WHERE elementId(n) = row.id
+CALL db.create.setNodeVectorProperty(n, $embedding_property, row.embedding)
+"""
+
+SEARCH_QUERY = """
+CALL db.index.vector.queryNodes($index_name, $k, $embedding)
+YIELD node, score
+RETURN elementId(node) AS id, node[$text_property] AS text, score
+"""
+
+
+def backfill(
+    graph: Neo4jGraph,
+    label: str,
+    text_property: str,
+    target: VectorIndexTarget,
+    batch_size: int,
+) -> int:
+    """
+    Embeds every node of `label` that has no vector on the target property
+    yet, one batch per query, creating the target index on the first batch.
+    Safe to interrupt and re-run. Returns the number of embedded nodes.
+    """
+    embeddings = target.embeddings()
+    embedded = 0
+    index_ready = False
+    while True:
+        pending = graph.query(
+            PENDING_NODES_QUERY.format(label=label),
+            params={
+                "text_property": text_property,
+                "embedding_property": target.embedding_property,
+                "limit": batch_size,
+            },
+        )
+        if not pending:
+            break
+
+        vectors = embeddings.embed_documents([row["text"] for row in pending])
+        if not index_ready:
+            graph.query(
+                CREATE_INDEX_QUERY.format(
+                    index_name=target.index_name,
+                    label=label,
+                    embedding_property=target.embedding_property,
+                ),
+                params={"dimensions": len(vectors[0])},
+            )
+            index_ready = True
+
+        graph.query(
+            WRITE_VECTORS_QUERY,
+            params={
+                "embedding_property": target.embedding_property,
+                "rows": [
+                    {"id": row["id"], "embedding": vector}
+                    for row, vector in zip(pending, vectors)
+                ],
+            },
+        )
+        embedded += len(pending)
+        logger.info(f"Backfilled {embedded} {label} nodes into {target.index_name}.")
+
+    return embedded
+
+
+def _search(
+    graph: Neo4jGraph, target: VectorIndexTarget, questions: list, text_property: str, k: int
+):
+    vectors = target.embeddings().embed_documents(questions)
+    started = time.perf_counter()
+    results = [
+        graph.query(
+            SEARCH_QUERY,
+            params={
+                "index_name": target.index_name,
+                "k": k,
+                "embedding": vector,
+                "text_property": text_property,
+            },
+        )
+        for vector in vectors
+    ]
+    return results, (time.perf_counter() - started) / max(len(questions), 1)
+
+
+def compare(
+    graph: Neo4jGraph,
+    current: VectorIndexTarget,
+    candidate: VectorIndexTarget,
+    csv_path: str,
+    text_property: str,
+    k: int,
+) -> dict:
+    """
+    Runs every example question against both indexes. `recall_at_k` is the
+    share of the live index's top k the candidate also returns, and
+    `hit_at_1` the share of questions that find themselves first.
+    """
+    questions = pd.read_csv(csv_path)["question"].dropna().astype(str).tolist()
+    current_results, current_latency = _search(graph, current, questions, text_property, k)
+    candidate_results, candidate_latency = _search(
+        graph, candidate, questions, text_property, k
+    )
+
+    def hit_at_1(results):
+        hits = [
+            bool(rows) and str(rows[0]["text"]).lower().strip() == question.lower().strip()
+            for question, rows in zip(questions, results)
+        ]
+        return sum(hits) / len(hits)
+
+    overlaps = [
+        len({r["id"] for r in new} & {r["id"] for r in old}) / max(len(old), 1)
+        for old, new in zip(current_results, candidate_results)
+    ]
+    return {
+        "questions": len(questions),
+        f"recall_at_{k}": sum(overlaps) / len(overlaps),
+        "current_hit_at_1": hit_at_1(current_results),
+        "candidate_hit_at_1": hit_at_1(candidate_results),
+        "current_query_ms": current_latency * 1000,
+        "candidate_query_ms": candidate_latency * 1000,
+    }
+
+
+def drop_previous(graph: Neo4jGraph, name: str, label: str, batch_size: int) -> None:
+    """
+    Drops the index the alias pointed at before the last switch, and
+    removes its vectors from the nodes in batches.
+    """
+    records = graph.query(
+        f"MATCH (a:{ALIAS_LABEL} {{name: $name}}) "
+        "RETURN a.index_name AS current, a.previous_index_name AS previous, "
+        "a.previous_embedding_property AS previous_property, "
+        "a.embedding_property AS current_property",
+        params={"name": name},
+    )
+    if not records or not records[0]["previous"]:
+        raise ValueError(f"{name} has not been switched, nothing to drop")
+
+    alias = records[0]
+    if alias["previous"] == alias["current"] or (
+        alias["previous_property"] == alias["current_property"]
+    ):
+        raise ValueError(f"{name} still uses {alias['previous']}, not dropping it")
+
+    graph.query(f"DROP INDEX {alias['previous']} IF EXISTS")
+    graph.query(
+        f"""
+        MATCH (n:{label}) WHERE n.{alias['previous_property']} IS NOT NULL
+        CALL {{ WITH n REMOVE n.{alias['previous_property']} }}
+        IN TRANSACTIONS OF {int(batch_size)} ROWS
+        """
+    )
+    logger.info(f"Dropped {alias['previous']} and {label}.{alias['previous_property']}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["build", "compare", "switch", "drop-old"])
+    parser.add_argument("--index", default=NEO4J_CYPHER_EXAMPLES_INDEX_NAME)
+    parser.add_argument("--label", default=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY.capitalize())
+    parser.add_argument("--text-property", default=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--csv", default="../data/example_cypher.csv")
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    graph = Neo4jGraph(
+        url=os.getenv("NEO4J_URI"),
+        username=os.getenv("NEO4J_USERNAME"),
+        password=os.getenv("NEO4J_PASSWORD"),
+    )
+    current = resolve_vector_index(graph, args.index)
+    candidate = versioned_target(args.index, args.model, args.dimensions)
+
+    if args.command == "drop-old":
+        drop_previous(graph, args.index, args.label, args.batch_size)
+    elif candidate.index_name == current.index_name:
+        logger.info(f"{args.index} already uses {candidate.index_name}.")
+    elif args.command == "build":
+        backfill(graph, args.label, args.text_property, candidate, args.batch_size)
+    elif args.command == "compare":
+        results = compare(
+            graph, current, candidate, args.csv, args.text_property, args.k
+        )
+        for name, value in results.items():
+            print(
+                f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}"
+            )
+    else:
+        backfill(graph, args.label, args.text_property, candidate, args.batch_size)
+        graph.query("CALL db.awaitIndex($name, 300)", params={"name": candidate.index_name})
+        switch_vector_index(graph, args.index, candidate)
+        logger.info(f"{args.index} now points at {candidate.index_name}.")
@@ -0,0 +1,196 @@
+"""Admission control for agent runs: bounded concurrency, bounded priority
+queueing per traffic class, and fast rejection once the queue is full."""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+
+@dataclass(frozen=True)
+class AdmissionPolicy:
+    """How one class of traffic queues for a free agent slot"""
+
+    priority: int  # lower is admitted first
+    max_queue: int  # waiting requests beyond this are rejected
+    max_wait: float  # seconds a request may wait before it is rejected
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def traffic_class(role: Optional[str], verified_customer_id: Optional[str]) -> str:
+    """Verified customers, bankers, and everything else. Only pass a customer
+    id taken from a verified session token, never one sent by the client."""
+
+    if role == "Customer" and verified_customer_id:
+        return "customer"
+    if role == "Banker":
+        return "banker"
+    return "other"
+
+
+class AdmissionController:
+    """
+    Lets at most `max_concurrency` requests run at once. Others wait in a
+    priority queue ordered by their class's policy and, within a class, by
+    arrival; a request is rejected with a Retry-After estimate when its
+    class's queue is full or it has waited longer than its policy allows.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        policies: Dict[str, AdmissionPolicy],
+        default_policy: AdmissionPolicy,
+        window: int = 1000,
+    ):
+        self.max_concurrency = max_concurrency
+        self.policies = policies
+        self.default_policy = default_policy
+        self.running = 0
+        self._waiters: list = []  # (priority, sequence, traffic class, future)
+        self._sequence = itertools.count()
+        self._queued: Dict[str, int] = defaultdict(int)
+        self._admitted: Dict[str, int] = defaultdict(int)
+        self._rejected: Dict[str, int] = defaultdict(int)
+        self._waits: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._service_seconds: Optional[float] = None
+
+    def policy(self, name: str) -> AdmissionPolicy:
+        return self.policies.get(name, self.default_policy)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+
+        service = self._service_seconds or 1.0
+        backlog = (len(self._waiters) + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(service * backlog))
+
+    def _reject(self, name: str, reason: str) -> AdmissionRejected:
+        self._rejected[name] += 1
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _wake_next(self) -> None:
+        while self._waiters and self.running < self.max_concurrency:
+            _, _, name, future = heapq.heappop(self._waiters)
+            self._queued[name] -= 1
+            self.running += 1
+            future.set_result(None)
+
+    async def acquire(self, name: str, timeout: Optional[float] = None) -> float:
+        """Wait for a slot for traffic class `name`; returns the wait time"""
+
+        policy = self.policy(name)
+        started = time.monotonic()
+        if self.running < self.max_concurrency and not self._waiters:
+            self.running += 1
+        else:
+            if self._queued[name] >= policy.max_queue:
+                raise self._reject(name, f"The {name} queue is full")
+
+            future = asyncio.get_running_loop().create_future()
+            waiter = (policy.priority, next(self._sequence), name, future)
+            heapq.heappush(self._waiters, waiter)
+            self._queued[name] += 1
+            max_wait = policy.max_wait if timeout is None else min(policy.max_wait, timeout)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), max_wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done():
+                    # Admitted just as the wait ended, so hand the slot back
+                    self.release()
+                else:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                    self._queued[name] -= 1
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._reject(name, f"Waited {max_wait:g}s for a {name} slot")
+
+        waited = time.monotonic() - started
+        self._admitted[name] += 1
+        self._waits[name].append(waited)
+        return waited
+
+    def release(self, service_seconds: Optional[float] = None) -> None:
+        self.running -= 1
+        if service_seconds is not None:
+            previous = self._service_seconds
+            self._service_seconds = (
+                service_seconds if previous is None else 0.8 * previous + 0.2 * service_seconds
+            )
+        self._wake_next()
+
+    @asynccontextmanager
+    async def admit(self, name: str, timeout: Optional[float] = None) -> AsyncIterator[float]:
+        waited = await self.acquire(name, timeout)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - started)
+
+    def metrics(self) -> dict:
+        """Queue depth, admissions, rejections and wait times per class"""
+
+        def percentile(values, q):
+            ordered = sorted(values)
+            return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+        classes = set(self.policies) | set(self._admitted) | set(self._rejected)
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "queued": len(self._waiters),
+            "service_seconds": self._service_seconds,
+            "classes": {
+                name: {
+                    "queued": self._queued[name],
+                    "admitted": self._admitted[name],
+                    "rejected": self._rejected[name],
+                    "wait_seconds_p50": percentile(self._waits[name], 0.5),
+                    "wait_seconds_p95": percentile(self._waits[name], 0.95),
+                }
+                for name in sorted(classes)
+            },
+        }
+
+
+def controller_from_env() -> AdmissionController:
+    """Admission controller configured by the ADMISSION_* variables. Verified
+    customers are admitted ahead of bankers, and both ahead of anyone else."""
+
+    max_wait = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+    return AdmissionController(
+        max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8")),
+        policies={
+            "customer": AdmissionPolicy(
+                priority=0,
+                max_queue=int(os.getenv("ADMISSION_CUSTOMER_MAX_QUEUE", "32")),
+                max_wait=max_wait,
+            ),
+            "banker": AdmissionPolicy(
+                priority=1,
+                max_queue=int(os.getenv("ADMISSION_BANKER_MAX_QUEUE", "16")),
+                max_wait=max_wait,
+            ),
+        },
+        default_policy=AdmissionPolicy(
+            priority=2,
+            max_queue=int(os.getenv("ADMISSION_OTHER_MAX_QUEUE", "4")),
+            max_wait=max_wait / 2,
+        ),
+    )
@@ -1,5 +1,12 @@
 import asyncio
 
+from src.utils.deadlines import (
+    DeadlineExceeded,
+    RequestCancelled,
+    check_deadline,
+    current_deadline,
+)
+
 
 def async_retry(max_retries: int = 3, delay: int = 1):
     def decorator(func):
@@ -8,8 +15,19 @@ def async_retry(max_retries: int = 3, delay: int = 1):
                 try:
                     result = await func(*args, **kwargs)
                     return result
+                except RequestCancelled:
+                    # Abandoned requests are never retried
+                    raise
                 except Exception as e:
                     print(f"Attempt {attempt} failed: {str(e)}")
+                    deadline = current_deadline()
+                    remaining = deadline.remaining() if deadline else None
+                    if remaining is not None and remaining <= delay:
+                        # No time left for another attempt
+                        check_deadline()
+                        raise DeadlineExceeded(
+                            "The request deadline passes before the next retry"
+                        ) from e
                     await asyncio.sleep(delay)
 
             raise ValueError(f"Failed after {max_retries} attempts")
@@ -0,0 +1,141 @@
+"""Per-request deadlines and cancellation, visible to every step of a request.
+
+The current `Deadline` lives in a context variable. LangChain copies the
+context into the threads that run sync tools and chains, so tools, chains
+and Neo4j calls all see the deadline of the request they serve.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+from fastapi import Request
+
+T = TypeVar("T")
+
+# Upper bound for a request's deadline, and the deadline of requests that
+# do not send an X-Request-Timeout header
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+
+class RequestCancelled(Exception):
+    """Raised when the request being served was abandoned"""
+
+
+class DeadlineExceeded(RequestCancelled):
+    """Raised when the request's deadline has passed"""
+
+
+class ClientDisconnected(RequestCancelled):
+    """Raised when the HTTP client went away"""
+
+
+class Deadline:
+    """A monotonic deadline that can also be cancelled early"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self._cancelled = threading.Event()
+        self._error: Optional[RequestCancelled] = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None for no deadline"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or self.remaining() == 0.0
+
+    def cancel(self, error: RequestCancelled) -> None:
+        self._error = self._error or error
+        self._cancelled.set()
+
+    def check(self) -> None:
+        """Raise if the request was cancelled or ran out of time"""
+        if self._cancelled.is_set():
+            raise self._error
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded("The request deadline has passed")
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def check_deadline() -> None:
+    """Raise if the current request was cancelled or ran out of time"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def bounded_timeout(timeout: Optional[float]) -> Optional[float]:
+    """`timeout`, shortened to the time left before the current deadline"""
+    deadline = _current_deadline.get()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return timeout
+    if remaining == 0.0:
+        deadline.check()
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline) -> Iterator[Deadline]:
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def request_deadline(request: Request) -> Deadline:
+    """The deadline requested in the X-Request-Timeout header (seconds),
+    capped at REQUEST_TIMEOUT_SECONDS"""
+
+    try:
+        seconds = float(request.headers.get(REQUEST_TIMEOUT_HEADER, ""))
+    except ValueError:
+        seconds = REQUEST_TIMEOUT_SECONDS
+    return Deadline(min(max(seconds, 0.0), REQUEST_TIMEOUT_SECONDS))
+
+
+async def run_until_cancelled(
+    request: Request, deadline: Deadline, work: Callable[[], Awaitable[T]]
+) -> T:
+    """
+    Runs `work` under `deadline` and cancels it as soon as the deadline
+    passes or the client disconnects. Raises the matching RequestCancelled.
+    """
+    with deadline_scope(deadline):
+        task = asyncio.ensure_future(work())
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                deadline.cancel(ClientDisconnected("The client disconnected"))
+            elif deadline.remaining() == 0.0:
+                deadline.cancel(DeadlineExceeded("The request deadline has passed"))
+            if deadline.cancelled:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                deadline.check()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,113 @@
+"""Cross-request micro-batching of query embeddings."""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from src.utils.deadlines import bounded_timeout, check_deadline
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Wraps `embeddings` so that single query texts embedded at about the same
+    time, by any thread or request, share one embedding request.
+
+    The first text of a batch waits at most `max_wait` seconds for others,
+    and a batch is sent as soon as it holds `max_batch_size` texts. Document
+    embedding is already batched and passes straight through.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_wait: float = 0.005,
+        max_batch_size: int = 64,
+        max_concurrent_batches: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batches = 0
+        self.texts = 0
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()  # (text, future)
+        self._pool = ThreadPoolExecutor(max_concurrent_batches, "embedding-batch")
+        self._collector = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        """Queue `text` for the next batch; the future resolves to its vector"""
+
+        if self._collector is None:
+            with self._lock:
+                if self._collector is None:
+                    self._collector = threading.Thread(
+                        target=self._collect_forever, name="embedding-batcher", daemon=True
+                    )
+                    self._collector.start()
+        future: Future = Future()
+        self._pending.put((text, future))
+        return future
+
+    def _collect_forever(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            closes_at = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._embed_batch, batch)
+
+    def _embed_batch(self, batch: list) -> None:
+        # Identical questions asked concurrently are embedded once
+        callers: Dict[str, List[Future]] = {}
+        for text, future in batch:
+            if future.set_running_or_notify_cancel():
+                callers.setdefault(text, []).append(future)
+        if not callers:
+            return
+
+        texts = list(callers)
+        try:
+            vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            for futures in callers.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+        for text, vector in zip(texts, vectors):
+            for future in callers[text]:
+                future.set_result(vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        future = self.submit(text)
+        try:
+            # Never wait beyond the deadline of the request being served
+            return future.result(timeout=bounded_timeout(None))
+        except FutureTimeoutError:
+            future.cancel()
+            check_deadline()
+            raise
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
@@ -0,0 +1,193 @@
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from src.utils.embedding_batcher import MicroBatchingEmbeddings
+
+# Used for new or migrated indexes. text-embedding-3 models accept a reduced
+# `dimensions`, which shrinks index memory, Bolt transfer and search time
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+EMBEDDING_DIMENSIONS = os.getenv("EMBEDDING_DIMENSIONS")
+
+# Query texts embedded within this window share one embedding request; 0
+# sends every query on its own
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+EMBEDDING_MAX_CONCURRENT_BATCHES = int(os.getenv("EMBEDDING_MAX_CONCURRENT_BATCHES", "4"))
+
+ALIAS_LABEL = "VectorIndexAlias"
+
+RESOLVE_ALIAS_QUERY = f"""
+MATCH (a:{ALIAS_LABEL} {{name: $name}})
+RETURN a.index_name AS index_name, a.embedding_property AS embedding_property,
+       a.model AS model, a.dimensions AS dimensions
+"""
+
+EMBEDDING_PROPERTIES_QUERY = f"""
+MATCH (a:{ALIAS_LABEL} {{name: $name}})
+RETURN [a.embedding_property, a.previous_embedding_property] AS properties
+"""
+
+# A single statement, so readers see either the old or the new index
+SWITCH_ALIAS_QUERY = f"""
+MERGE (a:{ALIAS_LABEL} {{name: $name}})
+SET a.previous_index_name = coalesce(a.index_name, $name),
+    a.previous_embedding_property = coalesce(a.embedding_property, 'embedding'),
+    a.index_name = $index_name,
+    a.embedding_property = $embedding_property,
+    a.model = $model,
+    a.dimensions = $dimensions,
+    a.switched_at = datetime()
+"""
+
+
+@dataclass(frozen=True)
+class VectorIndexTarget:
+    """The physical vector index behind a logical index name, and the
+    embedding model its vectors were made with"""
+
+    index_name: str
+    embedding_property: str
+    model: str
+    dimensions: Optional[int] = None
+
+    def embeddings(self, **kwargs) -> OpenAIEmbeddings:
+        return build_embeddings(self.model, self.dimensions, **kwargs)
+
+    def query_embeddings(self) -> Embeddings:
+        """Embeddings for searching the index, micro-batched across requests
+        together with every other index using the same model"""
+        return query_embeddings(self.model, self.dimensions)
+
+
+def build_embeddings(
+    model: Optional[str] = None, dimensions: Optional[int] = None, **kwargs
+) -> OpenAIEmbeddings:
+    """
+    OpenAI embeddings for `model`, truncated to `dimensions` when given.
+    """
+    if dimensions:
+        kwargs["dimensions"] = int(dimensions)
+    return OpenAIEmbeddings(model=model or EMBEDDING_MODEL, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def query_embeddings(
+    model: Optional[str] = None, dimensions: Optional[int] = None
+) -> Embeddings:
+    """
+    The shared query embedder for `model` at `dimensions`, batching
+    concurrent queries per EMBEDDING_BATCH_WINDOW_MS.
+    """
+    embeddings = build_embeddings(model, dimensions)
+    if EMBEDDING_BATCH_WINDOW_MS <= 0:
+        return embeddings
+    return MicroBatchingEmbeddings(
+        embeddings,
+        max_wait=EMBEDDING_BATCH_WINDOW_MS / 1000,
+        max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+        max_concurrent_batches=EMBEDDING_MAX_CONCURRENT_BATCHES,
+    )
+
+
+def versioned_target(
+    name: str, model: str, dimensions: Optional[int] = None
+) -> VectorIndexTarget:
+    """
+    Index and property names for `name` built with `model` at `dimensions`,
+    so a differently sized index can be built next to the live one. The
+    default model at full size keeps the original names.
+    """
+    if model == DEFAULT_EMBEDDING_MODEL and not dimensions:
+        return VectorIndexTarget(name, "embedding", model)
+    suffix = re.sub(r"\W+", "_", model.removeprefix("text-embedding-"))
+    if dimensions:
+        suffix = f"{suffix}_{int(dimensions)}"
+    return VectorIndexTarget(
+        index_name=f"{name}_{suffix}",
+        embedding_property=f"embedding_{suffix}",
+        model=model,
+        dimensions=int(dimensions) if dimensions else None,
+    )
+
+
+def configured_target(name: str) -> VectorIndexTarget:
+    """
+    The target for `name` under EMBEDDING_MODEL and EMBEDDING_DIMENSIONS.
+    """
+    return versioned_target(name, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+
+
+def resolve_vector_index(graph, name: str) -> VectorIndexTarget:
+    """
+    Follows the alias of the logical index `name`. Without an alias the
+    index is the original full-size one, embedded with the default model.
+    """
+    records = graph.query(RESOLVE_ALIAS_QUERY, params={"name": name})
+    if not records:
+        return VectorIndexTarget(
+            index_name=name,
+            embedding_property="embedding",
+            model=DEFAULT_EMBEDDING_MODEL,
+        )
+    return VectorIndexTarget(**records[0])
+
+
+def embedding_properties(graph, name: str) -> List[str]:
+    """
+    Every node property that may hold a vector for the logical index `name`:
+    the original one, the aliased and previous ones, and the one a migration
+    to the configured model writes while it runs.
+    """
+    records = graph.query(EMBEDDING_PROPERTIES_QUERY, params={"name": name})
+    candidates = ["embedding", configured_target(name).embedding_property]
+    candidates += records[0]["properties"] if records else []
+    return list(dict.fromkeys(p for p in candidates if p))
+
+
+def text_retrieval_query(
+    text_properties: Sequence[str],
+    vector_properties: Sequence[str],
+    metadata_keys: Optional[Sequence[str]] = None,
+) -> str:
+    """
+    The retrieval query Neo4jVector.from_existing_graph builds, except that
+    every one of `vector_properties` is left out of the metadata, not just
+    the active one, so no other index's vectors cross the wire. With
+    `metadata_keys`, only those properties are returned as metadata.
+    """
+    text = (
+        f"reduce(str='', k IN {list(text_properties)} |"
+        " str + '\\n' + k + ': ' + coalesce(node[k], ''))"
+    )
+    if metadata_keys:
+        fields = ", ".join(f"`{key}`: node.`{key}`" for key in metadata_keys)
+        metadata = f"{{{fields}}}"
+    else:
+        nulled = ["id", *text_properties, *vector_properties]
+        fields = ", ".join(f"`{prop}`: Null" for prop in dict.fromkeys(nulled))
+        metadata = f"node {{.*, {fields}}}"
+    return f"RETURN {text} AS text, {metadata} AS metadata, score"
+
+
+def switch_vector_index(graph, name: str, target: VectorIndexTarget) -> None:
+    """
+    Points the logical index `name` at `target`. Running services pick the
+    new index up when they next start.
+    """
+    graph.query(
+        SWITCH_ALIAS_QUERY,
+        params={
+            "name": name,
+            "index_name": target.index_name,
+            "embedding_property": target.embedding_property,
+            "model": target.model,
+            "dimensions": target.dimensions,
+        },
+    )
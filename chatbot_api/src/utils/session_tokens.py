@@ -0,0 +1,86 @@
+"""Signed session tokens for verified customers, and the normalization that
+customer verification matches on.
+
+A token carries the customer id and an expiry, signed with HMAC-SHA256, so
+chat turns can prove who the customer is without another graph lookup.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from typing import Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+SESSION_TOKEN_TTL_SECONDS = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", "1800"))
+
+_SECRET = os.getenv("SESSION_TOKEN_SECRET")
+if not _SECRET:
+    # Tokens then only verify on this process and die with it
+    LOGGER.warning("SESSION_TOKEN_SECRET is not set, using a per-process secret")
+    _SECRET = secrets.token_urlsafe(32)
+
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str, secret: str) -> str:
+    return _encode(hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(
+    customer_id: str,
+    ttl: int = SESSION_TOKEN_TTL_SECONDS,
+    secret: Optional[str] = None,
+    now: Optional[float] = None,
+) -> str:
+    """A token for `customer_id` that expires after `ttl` seconds"""
+
+    expires = int((time.time() if now is None else now) + ttl)
+    payload = _encode(json.dumps({"sub": customer_id, "exp": expires}).encode())
+    return f"{payload}.{_sign(payload, secret or _SECRET)}"
+
+
+def verify_token(
+    token: str, secret: Optional[str] = None, now: Optional[float] = None
+) -> Optional[str]:
+    """The customer id in `token`, or None if it is forged, malformed or
+    expired"""
+
+    payload, _, signature = token.partition(".")
+    expected = _sign(payload, secret or _SECRET)
+    # Compared as bytes: tokens are client input and may hold any characters
+    if not hmac.compare_digest(signature.encode(), expected.encode()):
+        return None
+    try:
+        claims = json.loads(_decode(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) <= (time.time() if now is None else now):
+        return None
+    return claims.get("sub")
+
+
+def lookup_keys(
+    first_name: str, last_name: str, zip_code: str, phone: str
+) -> Tuple[str, str, str, str]:
+    """(first name, last name, zip, phone) normalized the way the ETL writes
+    the Customer lookup_* properties"""
+
+    return (
+        first_name.strip().lower(),
+        last_name.strip().lower(),
+        zip_code.strip(),
+        re.sub(r"[^0-9]", "", phone),
+    )
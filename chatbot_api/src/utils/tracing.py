@@ -0,0 +1,166 @@
+"""Response verbosity for agent runs, and a sampled, asynchronous sink for
+their full traces."""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_VERBOSITY = os.getenv("RESPONSE_VERBOSITY", "summary")
+# Whether the agent and chains also print their steps to stdout; full
+# traces go to the sampled trace sink instead
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "false").lower() == "true"
+
+TRACE_SINK_PATH = os.getenv("TRACE_SINK_PATH", "agent_traces.jsonl")
+# Off by default; traces are written in plaintext
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+# Whether traces keep customer ids, messages and tool outputs; otherwise
+# only their timings and shape are written
+TRACE_INCLUDE_CONTENT = os.getenv("TRACE_INCLUDE_CONTENT", "false").lower() == "true"
+
+# Trace fields that can identify a customer or hold what they said
+TRACE_CONTENT_KEYS = ("customer_id", "input", "output", "intermediate_steps")
+REDACTED = "[redacted]"
+
+
+class ToolTimer(BaseCallbackHandler):
+    """Records how long each tool call of an agent run took"""
+
+    def __init__(self):
+        self._started: Dict[UUID, tuple] = {}
+        self.timings: List[tuple] = []  # (tool name, seconds), in finishing order
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs):
+        self._started[run_id] = (serialized.get("name"), time.perf_counter())
+
+    def _finish(self, run_id: UUID) -> None:
+        name, started = self._started.pop(run_id, (None, None))
+        if started is not None:
+            self.timings.append((name, time.perf_counter() - started))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+
+def _cypher_details(observation: Any) -> tuple:
+    """The last generated Cypher and answer path in a tool's output, if any"""
+
+    if not isinstance(observation, dict):
+        return None, None
+    cypher, answer_path = observation.get("query") or None, None
+    for step in observation.get("intermediate_steps") or []:
+        if isinstance(step, dict):
+            cypher = step.get("query", cypher)
+            answer_path = step.get("answer_path", answer_path)
+    return cypher, answer_path
+
+
+def summarize_steps(intermediate_steps: list, timings: List[tuple]) -> List[str]:
+    """One line per tool call: its name, time taken and any generated Cypher,
+    without the tool's output"""
+
+    pending = list(timings)
+    lines = []
+    for action, observation in intermediate_steps:
+        # Each call takes the first unclaimed timing of the same tool
+        timing = next((t for t in pending if t[0] == action.tool), None)
+        line = action.tool
+        if timing is not None:
+            pending.remove(timing)
+            line += f" ({timing[1]:.2f}s)"
+        cypher, answer_path = _cypher_details(observation)
+        if answer_path:
+            line += f" [{answer_path}]"
+        if cypher:
+            line += f": {cypher}"
+        lines.append(line)
+    return lines
+
+
+def format_steps(
+    intermediate_steps: list, timings: List[tuple], verbosity: str
+) -> List[str]:
+    if verbosity == "none":
+        return []
+    if verbosity == "full":
+        return [str(s) for s in intermediate_steps]
+    return summarize_steps(intermediate_steps, timings)
+
+
+class TraceSink:
+    """
+    Appends a sample of agent traces to a JSON lines file. Traces are queued
+    and written off the event loop by a background task; when the queue is
+    full new traces are dropped rather than slowing requests down. Unless
+    `include_content` is set, the TRACE_CONTENT_KEYS fields are redacted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float,
+        max_queue: int = 1000,
+        include_content: bool = False,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.include_content = include_content
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def submit(self, trace: Dict[str, Any]) -> bool:
+        """Queue `trace` if it is sampled; returns whether it was queued"""
+
+        if not self.path or random.random() >= self.sample_rate:
+            return False
+        if not self.include_content:
+            trace = {
+                key: REDACTED if key in TRACE_CONTENT_KEYS else value
+                for key, value in trace.items()
+            }
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queue)
+            self._writer = asyncio.get_running_loop().create_task(self._write_forever())
+        try:
+            self._queue.put_nowait(trace)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    def _write(self, traces: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a") as f:
+            for trace in traces:
+                f.write(json.dumps(trace, default=str) + "\n")
+
+    async def _write_forever(self) -> None:
+        while True:
+            traces = [await self._queue.get()]
+            while not self._queue.empty():
+                traces.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write, traces)
+            except OSError as e:
+                LOGGER.warning(f"Could not write {len(traces)} traces: {e}")
+
+
+def sink_from_env() -> TraceSink:
+    """Trace sink configured by the TRACE_* variables"""
+
+    return TraceSink(
+        TRACE_SINK_PATH, TRACE_SAMPLE_RATE, TRACE_QUEUE_SIZE, TRACE_INCLUDE_CONTENT
+    )
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from src.utils.admission import (
+    AdmissionController,
+    AdmissionPolicy,
+    AdmissionRejected,
+    traffic_class,
+)
+
+
+def test_admission_controller():
+    """
+    Requests beyond the concurrency limit queue by priority, and are shed
+    once their class's queue is full
+    """
+    assert traffic_class("Customer", "42") == "customer"
+    assert traffic_class("Customer", None) == "other"
+    assert traffic_class("Banker", None) == "banker"
+
+    controller = AdmissionController(
+        max_concurrency=1,
+        policies={
+            "customer": AdmissionPolicy(priority=0, max_queue=2, max_wait=5),
+            "banker": AdmissionPolicy(priority=1, max_queue=1, max_wait=5),
+        },
+        default_policy=AdmissionPolicy(priority=2, max_queue=0, max_wait=1),
+    )
+    order = []
+
+    async def request(name, seconds=0.01):
+        async with controller.admit(name):
+            order.append(name)
+            await asyncio.sleep(seconds)
+
+    async def main():
+        first = asyncio.create_task(request("banker", 0.05))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(request("banker")),
+            asyncio.create_task(request("customer")),
+        ]
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await request("banker")
+        assert rejected.value.retry_after >= 1
+        with pytest.raises(AdmissionRejected):
+            await request("other")
+
+        metrics = controller.metrics()
+        assert metrics["running"] == 1 and metrics["queued"] == 2
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(main())
+
+    # The customer queued after the banker is admitted first
+    assert order == ["banker", "customer", "banker"]
+    metrics = controller.metrics()
+    assert metrics["running"] == 0 and metrics["queued"] == 0
+    assert metrics["classes"]["banker"]["rejected"] == 1
+    assert metrics["classes"]["customer"]["wait_seconds_p95"] > 0
+
+
+def test_admission_wait_timeout():
+    """
+    A request that waits longer than its policy allows is rejected and
+    leaves the queue
+    """
+    controller = AdmissionController(
+        max_concurrency=1,
+        policies={},
+        default_policy=AdmissionPolicy(priority=0, max_queue=5, max_wait=0.01),
+    )
+
+    async def main():
+        await controller.acquire("other")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("other")
+        controller.release()
+        await controller.acquire("other")
+
+    asyncio.run(main())
+    assert controller.metrics()["queued"] == 0
@@ -1,4 +1,22 @@
-from src.langchain_custom.graph_qa.cypher import remove_keys_from_dicts
+from langchain_core.documents import Document
+
+from src.langchain_custom.graph_qa.answer_rendering import (
+    EMPTY_RESULT_ANSWER,
+    render_deterministic_answer,
+)
+from src.langchain_custom.graph_qa.context_formatting import format_context_as_table
+from src.langchain_custom.graph_qa.cypher import (
+    construct_schema,
+    project_excluded_properties,
+    remove_keys_from_dicts,
+)
+from src.langchain_custom.graph_qa.few_shot import (
+    SCORE_METADATA_KEY,
+    ScoredVectorStoreRetriever,
+    approximate_token_count,
+    pack_few_shot_examples,
+    split_scores,
+)
 
 
 def test_remove_keys_from_dicts():
@@ -19,3 +37,362 @@ def test_remove_keys_from_dicts():
     ]
 
     assert remove_keys_from_dicts(input_list, keys_to_remove) == expected_output
+
+
+def test_pack_few_shot_examples():
+    """
+    Test that examples are filtered, deduplicated, ranked and budgeted
+    """
+    examples = [
+        (
+            Document(
+                page_content="q1",
+                metadata={"cypher": "MATCH (c:Customer {id: 'C001'}) RETURN c.email"},
+            ),
+            0.91,
+        ),
+        (
+            Document(
+                page_content="q2",
+                metadata={"cypher": "MATCH (c:Customer {id: 'C002'})\n RETURN c.email"},
+            ),
+            0.95,
+        ),
+        (
+            Document(
+                page_content="q3",
+                metadata={"cypher": "MATCH (m:Mortgage) RETURN count(m)"},
+            ),
+            0.93,
+        ),
+        (
+            Document(
+                page_content="q4", metadata={"cypher": "MATCH (f:Fees) RETURN f.amount"}
+            ),
+            0.40,
+        ),
+    ]
+
+    packed = pack_few_shot_examples(
+        examples, min_similarity=0.5, metadata_keys=["cypher"]
+    )
+
+    assert [doc.page_content for doc in packed.included] == ["q2", "q3"]
+    assert packed.dropped_duplicates == 1
+    assert packed.dropped_low_similarity == 1
+    assert packed.tokens_used >= approximate_token_count(packed.text)
+
+    budgeted = pack_few_shot_examples(
+        examples, token_budget=packed.tokens_used - 1, metadata_keys=["cypher"]
+    )
+
+    assert [doc.page_content for doc in budgeted.included] == ["q2"]
+    assert budgeted.tokens_used <= packed.tokens_used - 1
+
+    # Examples after the budget runs out keep their own drop reason
+    floored = pack_few_shot_examples(
+        examples,
+        token_budget=packed.tokens_used - 1,
+        min_similarity=0.5,
+        metadata_keys=["cypher"],
+    )
+    assert floored.dropped_over_budget == 1
+    assert floored.dropped_duplicates == 1
+    assert floored.dropped_low_similarity == 1
+
+
+def test_scored_retriever_keeps_similarity():
+    """
+    Test that the scored retriever returns each example's similarity and
+    that it is kept out of the prompt metadata
+    """
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.vectorstores import InMemoryVectorStore
+
+    store = InMemoryVectorStore(DeterministicFakeEmbedding(size=8))
+    store.add_texts(["q1", "q2"], metadatas=[{"cypher": "c1"}, {"cypher": "c2"}])
+    retriever = ScoredVectorStoreRetriever.from_retriever(
+        store.as_retriever(search_kwargs={"k": 2})
+    )
+
+    documents = retriever.invoke("q1")
+    assert all(SCORE_METADATA_KEY in doc.metadata for doc in documents)
+
+    pairs = split_scores(documents)
+    assert pairs[0][0].page_content == "q1"
+    assert pairs[0][0].metadata == {"cypher": "c1"}
+    assert pairs[0][1] >= pairs[1][1]
+
+
+def test_format_context_as_table():
+    """
+    Test that query results are serialized as a header plus rows and
+    summarized when they exceed the token budget
+    """
+    context = [
+        {"name": "Alice", "amount": 1122.5, "loan": {"id": "M001"}},
+        {"name": "Bob", "amount": 2575.8, "loan": {"id": "M002"}},
+    ]
+
+    assert format_context_as_table(context) == (
+        "rows: 2\nname | amount | loan.id\nAlice | 1122.5 | M001\nBob | 2575.8 | M002"
+    )
+    assert format_context_as_table([]) == "rows: 0"
+
+    many_rows = [{"id": i, "amount": 10.0} for i in range(200)]
+    summarized = format_context_as_table(many_rows, token_budget=100)
+
+    assert summarized.startswith("rows: 200\nid | amount")
+    assert "more rows omitted" in summarized
+    assert "amount: count=200 sum=2000 min=10 max=10 mean=10" in summarized
+    assert approximate_token_count(summarized) <= 100
+    # Identifier columns are not summarized
+    assert "id: count=" not in summarized
+
+    first_rows = format_context_as_table(many_rows[:100], token_budget=100, total_rows=200)
+    assert first_rows.startswith("rows: 100 of 200\n")
+    assert "summary of the first 100 rows:" in first_rows
+    assert "amount: count=100 sum=1000" in first_rows
+
+
+def test_render_deterministic_answer():
+    """
+    Test rule-based answers for empty, scalar and short key/value results
+    """
+    assert render_deterministic_answer([]) == EMPTY_RESULT_ANSWER
+    assert render_deterministic_answer([{"count(*)": 3}]) == "The count is 3."
+    assert (
+        render_deterministic_answer([{"count(m.id)": 1200}])
+        == "The count of id is 1,200."
+    )
+    assert render_deterministic_answer([{"year": 2024}]) == "The year is 2024."
+    assert (
+        render_deterministic_answer([{"total_payments": 2500.0}])
+        == "The total payments is $2,500.00."
+    )
+    # Integer totals and counts are not money unless the name says amount
+    assert (
+        render_deterministic_answer([{"total_payments": 3}])
+        == "The total payments is 3."
+    )
+    assert (
+        render_deterministic_answer([{"numberOfPayments": 2}])
+        == "The number of payments is 2."
+    )
+    assert (
+        render_deterministic_answer([{"totalFees": 125.5}])
+        == "The total fees is $125.50."
+    )
+    assert (
+        render_deterministic_answer([{"sum(p.amount)": 100}])
+        == "The sum of amount is $100.00."
+    )
+    assert (
+        render_deterministic_answer([{"sum(p.amount)": 99.5}])
+        == "The sum of amount is $99.50."
+    )
+    assert render_deterministic_answer([{"count(p)": 3}]) == "The count is 3."
+    # Bare variables need the QA LLM to phrase the answer
+    assert render_deterministic_answer([{"sum(c)": 3}]) is None
+    assert render_deterministic_answer([{"n": 3}]) is None
+    assert (
+        render_deterministic_answer([{"total_due": 1718.2}])
+        == "The total due is $1,718.20."
+    )
+    assert render_deterministic_answer([{"c.name": "Alice Smith", "c.id": "C001"}]) == (
+        "Here is what I found: name: Alice Smith; id: C001."
+    )
+    assert render_deterministic_answer([{"a": 1}, {"a": 2}]) is None
+    assert render_deterministic_answer([{"c": {"name": "Alice"}}]) is None
+
+
+def test_project_excluded_properties():
+    """
+    Test that whole-node returns are rewritten into map projections
+    """
+    assert project_excluded_properties(
+        "MATCH (q:Question) RETURN q LIMIT 5", ["embedding"]
+    ) == ("MATCH (q:Question) RETURN q {.*, embedding: null} AS q LIMIT 5")
+    assert project_excluded_properties(
+        "MATCH (f:FAQs) RETURN f AS faq, f.question", ["embedding"]
+    ) == ("MATCH (f:FAQs) RETURN f {.*, embedding: null} AS faq, f.question")
+    assert project_excluded_properties(
+        "MATCH (c:Customer)-[:HAS]->(m) WITH c, m AS loan RETURN c, loan",
+        ["embedding"],
+    ) == (
+        "MATCH (c:Customer)-[:HAS]->(m) WITH c, m AS loan "
+        "RETURN c {.*, embedding: null} AS c, loan {.*, embedding: null} AS loan"
+    )
+
+    unchanged = [
+        "MATCH (c:Customer) RETURN count(c)",
+        "MATCH (c:Customer) RETURN c.name",
+        "CALL { MATCH (n:FAQs) RETURN n } RETURN n.question",
+        # Variables in function calls or rebound by WITH are not nodes
+        "MATCH (c:Customer)-[:HAS]->(m:Mortgage) "
+        "WITH c, collect(m.amount) AS amounts WHERE size(amounts) > 1 "
+        "RETURN c.name, amounts",
+        "MATCH (c:Customer) WITH toLower(c.first_name) AS name "
+        "WHERE size(name) > 3 RETURN name",
+        "MATCH (c:Customer) WITH count(c) AS c RETURN c",
+    ]
+    for query in unchanged:
+        assert project_excluded_properties(query, ["embedding"]) == query
+
+
+def test_construct_schema_marks_dates_and_indexes():
+    """
+    Test that the schema exposes temporal and indexed properties
+    """
+    structured_schema = {
+        "node_props": {
+            "Payments": [
+                {"property": "amount", "type": "FLOAT"},
+                {"property": "payment_date", "type": "DATE"},
+            ]
+        },
+        "rel_props": {},
+        "relationships": [],
+        "metadata": {
+            "index": [{"label": "Payments", "properties": ["payment_date"]}]
+        },
+    }
+
+    schema = construct_schema(structured_schema, [], [])
+
+    assert "Payments {amount: FLOAT, payment_date: DATE (indexed)}" in schema
+    assert schema.endswith("Payments.payment_date")
+
+
+def test_cypher_guard_regenerates_rejected_queries():
+    """
+    An expensive plan is rejected and regenerated once with the reason
+    """
+    from langchain_community.graphs.graph_store import GraphStore
+    from langchain_community.llms import FakeListLLM
+
+    from src.langchain_custom.graph_qa.cypher import (
+        REJECTED_QUERY_ANSWER,
+        GraphCypherQAChain,
+    )
+    from src.langchain_custom.graph_qa.cypher_guard import (
+        CypherGuard,
+        CypherRejectedError,
+    )
+
+    plan = {
+        "operatorType": "ProduceResults@neo4j",
+        "args": {"EstimatedRows": 10.0},
+        "children": [
+            {
+                "operatorType": "CartesianProduct@neo4j",
+                "args": {"EstimatedRows": 10.0},
+            }
+        ],
+    }
+    guard = CypherGuard(max_estimated_rows=5)
+    assert "cartesian product" in guard.check_plan(plan)
+    guard.reject_cartesian_products = False
+    assert "10 rows" in guard.check_plan(plan)
+    assert CypherGuard(max_estimated_rows=None).check_plan(
+        {"operatorType": "ProduceResults@neo4j", "args": {"EstimatedRows": 1e9}}
+    ) is None
+
+    class FakeGraph(GraphStore):
+        queries = []
+
+        @property
+        def get_schema(self):
+            return ""
+
+        @property
+        def get_structured_schema(self):
+            return {}
+
+        def query(self, query, params={}):
+            self.queries.append(query)
+            if "(a), (b)" in query:
+                raise CypherRejectedError("the query builds a cartesian product")
+            return [{"count": 3}]
+
+        def refresh_schema(self):
+            pass
+
+        def add_graph_documents(self, graph_documents, include_source=False):
+            pass
+
+    def build_chain(responses):
+        return GraphCypherQAChain.from_llm(
+            cypher_llm=FakeListLLM(responses=responses),
+            qa_llm=FakeListLLM(responses=["unused"]),
+            graph=FakeGraph(),
+            deterministic_answers=True,
+            cypher_guard=CypherGuard(),
+            return_intermediate_steps=True,
+        )
+
+    result = build_chain(
+        ["MATCH (a), (b) RETURN count(*)", "MATCH (a)--(b) RETURN count(*)"]
+    ).invoke({"query": "How many?"})
+    steps = result["intermediate_steps"]
+    assert steps[1]["reason"] == "the query builds a cartesian product"
+    assert steps[2] == {"query": "MATCH (a)--(b) RETURN count(*)"}
+    assert steps[-1] == {"answer_path": "deterministic"}
+
+    result = build_chain(["MATCH (a), (b) RETURN 1", "MATCH (a), (b) RETURN 2"]).invoke(
+        {"query": "How many?"}
+    )
+    assert result["result"] == REJECTED_QUERY_ANSWER
+    assert result["intermediate_steps"][-1] == {"answer_path": "rejected"}
+
+
+def test_cypher_guard_error_handling():
+    """
+    Comment-only statements never reach the database, syntax errors keep
+    Neo4jGraph's ValueError and a server-side timeout without a client
+    timeout is still reported as a rejection
+    """
+    import pytest
+    from neo4j.exceptions import Neo4jError
+
+    from src.langchain_custom.graph_qa.cypher_guard import (
+        CypherGuard,
+        CypherRejectedError,
+    )
+
+    class FakeSession:
+        def __init__(self, code):
+            self.code = code
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def run(self, query, params):
+            raise Neo4jError.hydrate(message="failed", code=self.code)
+
+    class FakeGraph:
+        _database = "neo4j"
+
+        def __init__(self, code):
+            self._driver = self
+            self.code = code
+            self.sessions = 0
+
+        def session(self, **kwargs):
+            self.sessions += 1
+            return FakeSession(self.code)
+
+    graph = FakeGraph("Neo.ClientError.Statement.SyntaxError")
+    guard = CypherGuard(timeout=None)
+    assert guard.query(graph, "// No Cypher statement can be generated") == []
+    assert graph.sessions == 0
+
+    with pytest.raises(ValueError, match="not valid"):
+        guard.query(graph, "MATCH (n RETURN n")
+
+    graph = FakeGraph("Neo.ClientError.Transaction.TransactionTimedOut")
+    with pytest.raises(CypherRejectedError, match="transaction timeout"):
+        guard.query(graph, "MATCH (n) RETURN n")
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from src.utils.async_utils import async_retry
+from src.utils.deadlines import (
+    ClientDisconnected,
+    Deadline,
+    DeadlineExceeded,
+    bounded_timeout,
+    check_deadline,
+    deadline_scope,
+    run_until_cancelled,
+)
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after=None):
+        self.disconnect_at = (
+            time.monotonic() + disconnect_after if disconnect_after is not None else None
+        )
+
+    async def is_disconnected(self):
+        return self.disconnect_at is not None and time.monotonic() >= self.disconnect_at
+
+
+def test_run_until_cancelled(monkeypatch):
+    """
+    Work is cancelled on disconnect or deadline, and never retried
+    """
+    monkeypatch.setattr("src.utils.deadlines.DISCONNECT_POLL_SECONDS", 0.01)
+    calls = []
+
+    @async_retry(max_retries=5, delay=0)
+    async def work():
+        calls.append(1)
+        # Tools running in threads see the same deadline through the context
+        await asyncio.to_thread(check_deadline)
+        await asyncio.sleep(10)
+
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(run_until_cancelled(FakeRequest(0.05), Deadline(5), work))
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run_until_cancelled(FakeRequest(), Deadline(0.05), work))
+    assert len(calls) == 2
+
+    async def answer():
+        return bounded_timeout(10)
+
+    assert asyncio.run(run_until_cancelled(FakeRequest(), Deadline(1), answer)) <= 1
+
+    deadline = Deadline(5)
+    deadline.cancel(ClientDisconnected("gone"))
+    with deadline_scope(deadline), pytest.raises(ClientDisconnected):
+        asyncio.run(asyncio.to_thread(check_deadline))
+    assert bounded_timeout(10) == 10
+
+
+def test_async_retry_stops_at_the_deadline():
+    """
+    A failure with too little time left for another attempt is reported as
+    the deadline passing, not as a generic failure
+    """
+
+    @async_retry(max_retries=5, delay=1)
+    async def flaky():
+        raise ConnectionError("down")
+
+    async def run():
+        with deadline_scope(Deadline(0.5)):
+            await flaky()
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert time.monotonic() - started < 0.5
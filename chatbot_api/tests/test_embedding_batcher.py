@@ -0,0 +1,63 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.utils.embedding_batcher import MicroBatchingEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("rate limited")
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_concurrent_queries_share_batches():
+    """
+    Queries from concurrent threads and coroutines are sent together, each
+    caller gets its own vector, and duplicates are embedded once
+    """
+
+    inner = CountingEmbeddings()
+    batcher = MicroBatchingEmbeddings(inner, max_wait=0.2, max_batch_size=16)
+    texts = ["a" * n for n in range(1, 13)] + ["aaa"]
+
+    with ThreadPoolExecutor(len(texts)) as pool:
+        vectors = list(pool.map(batcher.embed_query, texts))
+
+    assert vectors == [[float(len(text))] for text in texts]
+    assert [len(call) for call in inner.calls] == [12]
+    assert batcher.batches == 1 and batcher.texts == 12
+
+    async def run():
+        return await asyncio.gather(*(batcher.aembed_query(t) for t in ["x", "yy"]))
+
+    assert asyncio.run(run()) == [[1.0], [2.0]]
+    assert inner.calls[-1] == ["x", "yy"]
+
+
+def test_full_batches_are_sent_without_waiting():
+    inner = CountingEmbeddings()
+    batcher = MicroBatchingEmbeddings(inner, max_wait=0.2, max_batch_size=2)
+    with ThreadPoolExecutor(5) as pool:
+        list(pool.map(batcher.embed_query, ["a", "b", "c", "d", "e"]))
+    assert sorted(len(call) for call in inner.calls) == [1, 2, 2]
+
+
+def test_batch_errors_reach_every_caller():
+    batcher = MicroBatchingEmbeddings(CountingEmbeddings(fail=True), max_wait=0.01)
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(batcher.embed_query, t) for t in ["a", "b", "c"]]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="rate limited"):
+            future.result()
@@ -0,0 +1,20 @@
+from src.utils.embeddings import text_retrieval_query, versioned_target
+
+
+def test_text_retrieval_query_leaves_out_every_vector():
+    """
+    Neither the active nor a migrating index's vectors are returned
+    """
+    target = versioned_target("cypher_examples", "text-embedding-3-small", 512)
+    assert target.embedding_property == "embedding_3_small_512"
+
+    query = text_retrieval_query(
+        ["question"], ["embedding", target.embedding_property]
+    )
+    assert "`embedding`: Null" in query
+    assert "`embedding_3_small_512`: Null" in query
+    assert "node {.*," in query
+
+    projected = text_retrieval_query(["question"], ["embedding"], ["cypher"])
+    assert "{`cypher`: node.`cypher`} AS metadata" in projected
+    assert ".*" not in projected
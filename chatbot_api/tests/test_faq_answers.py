@@ -0,0 +1,70 @@
+from langchain_core.documents import Document
+
+from src.langchain_custom.faq_answers import DirectAnswerFAQChain
+
+
+class _Retriever:
+    def __init__(self, matches):
+        self.matches = matches
+
+    def search_with_scores(self, question):
+        return self.matches
+
+
+class _CombineDocumentsChain:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, input_documents, question):
+        self.calls.append((input_documents, question))
+        return "LLM answer"
+
+
+class _QAChain:
+    def __init__(self):
+        self.combine_documents_chain = _CombineDocumentsChain()
+
+
+def _match(vector_score=None, score=0.99):
+    metadata = {"score": score}
+    if vector_score is not None:
+        metadata["vector_score"] = vector_score
+    return Document(page_content="Canonical answer", metadata=metadata), score
+
+
+def test_direct_answer_faq_chain():
+    """
+    Only a top match above the raw cosine threshold is answered directly;
+    everything else goes through the QA LLM
+    """
+    # Neo4j score 0.995 is a raw cosine of 0.99
+    qa = _QAChain()
+    chain = DirectAnswerFAQChain(
+        qa, _Retriever([_match(0.995)]), direct_answer_min_cosine=0.98
+    )
+    assert chain.invoke("When will my card arrive?") == {
+        "query": "When will my card arrive?",
+        "result": "Canonical answer",
+        "answer_path": "direct",
+    }
+    assert qa.combine_documents_chain.calls == []
+
+    # Neo4j score 0.95 is only a raw cosine of 0.9
+    qa = _QAChain()
+    chain = DirectAnswerFAQChain(
+        qa, _Retriever([_match(0.95)]), direct_answer_min_cosine=0.98
+    )
+    result = chain.invoke({"query": "What is a late fee?"})
+    assert result["answer_path"] == "qa_llm" and result["result"] == "LLM answer"
+    assert len(qa.combine_documents_chain.calls[0][0]) == 1
+
+    # Full-text-only matches have no vector score to compare
+    qa = _QAChain()
+    chain = DirectAnswerFAQChain(
+        qa, _Retriever([_match(None)]), direct_answer_min_cosine=0.98
+    )
+    assert chain.invoke("late fee")["answer_path"] == "qa_llm"
+
+    # Direct answers are off without a threshold
+    chain = DirectAnswerFAQChain(_QAChain(), _Retriever([_match(1.0)]))
+    assert chain.invoke("When will my card arrive?")["answer_path"] == "qa_llm"
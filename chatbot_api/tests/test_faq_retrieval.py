@@ -0,0 +1,128 @@
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from src.langchain_custom.retrievers.faq import (
+    CollapsedFAQRetriever,
+    HybridFAQRetriever,
+    TopicInferrer,
+    lucene_query,
+)
+
+
+def test_collapsed_faq_retriever():
+    """
+    Paraphrases of the same answer collapse to their best-scoring document
+    """
+    vectorstore = InMemoryVectorStore(DeterministicFakeEmbedding(size=16))
+    vectorstore.add_documents(
+        [
+            Document(
+                page_content="When will my card arrive?", metadata={"answer_id": "a1"}
+            ),
+            Document(
+                page_content="Where is my new card?", metadata={"answer_id": "a1"}
+            ),
+            Document(
+                page_content="Is my card on its way?", metadata={"answer_id": "a1"}
+            ),
+            Document(page_content="What is a late fee?", metadata={"answer_id": "a2"}),
+            Document(page_content="How is interest set?", metadata={"answer_id": "a3"}),
+        ]
+    )
+    retriever = CollapsedFAQRetriever(vectorstore=vectorstore, k=3, fetch_k=5)
+
+    matches = retriever.search_with_scores("Where is my new card?")
+    assert [doc.metadata["answer_id"] for doc, _ in matches][0] == "a1"
+    assert len({doc.metadata["answer_id"] for doc, _ in matches}) == len(matches) == 3
+    assert matches[0][0].page_content == "Where is my new card?"
+    assert matches[0][0].metadata["score"] == matches[0][1]
+
+    documents = retriever.invoke("Where is my new card?")
+    assert [doc.page_content for doc in documents] == [
+        doc.page_content for doc, _ in matches
+    ]
+
+
+def test_hybrid_faq_retriever():
+    """
+    Full-text and vector results are fused by rank, and a strong keyword
+    match skips the vector search in fast mode
+    """
+    vectorstore = InMemoryVectorStore(DeterministicFakeEmbedding(size=16))
+    vectorstore.add_documents(
+        [
+            Document(
+                page_content="Late fees apply after", metadata={"answer_id": "a1"}
+            ),
+            Document(page_content="Rates adjust yearly", metadata={"answer_id": "a2"}),
+        ]
+    )
+    keyword_hits = [
+        (
+            Document(page_content="Rates adjust yearly", metadata={"answer_id": "a2"}),
+            9.0,
+        ),
+        (Document(page_content="Escrow basics", metadata={"answer_id": "a3"}), 2.0),
+    ]
+    vector_retriever = CollapsedFAQRetriever(vectorstore=vectorstore, k=2)
+    retriever = HybridFAQRetriever(
+        vector_retriever=vector_retriever,
+        fulltext_search=lambda question, k: keyword_hits,
+        k=3,
+    )
+
+    matches = retriever.search_with_scores("Rates adjust yearly")
+    assert [doc.metadata["answer_id"] for doc, _ in matches] == ["a2", "a1", "a3"]
+    assert matches[0][0].metadata["fulltext_score"] == 9.0
+    assert "vector_score" in matches[0][0].metadata
+    assert "vector_score" not in matches[2][0].metadata
+
+    retriever.fulltext_fast_score = 5.0
+    matches = retriever.search_with_scores("Adjustable-Rate")
+    assert [doc.metadata["answer_id"] for doc, _ in matches] == ["a2", "a3"]
+    assert "vector_score" not in matches[0][0].metadata
+
+    assert lucene_query("What is an Adjustable-Rate (ARM) fee?") == (
+        "Adjustable\\-Rate ARM fee"
+    )
+
+
+def test_topic_filtered_retrieval():
+    """
+    Topics are inferred from keywords, and retrieval falls back to the whole
+    index when no topic is inferred or the filtered search finds nothing
+    """
+    inferrer = TopicInferrer.from_examples(
+        [
+            ("What is a late fee?", ["Fees", "Payments"]),
+            ("Can fees be waived?", ["Fees"]),
+            ("How is my interest rate determined?", ["Interest"]),
+        ]
+    )
+    assert inferrer.infer("How much is the late fee?")[0] == "Fees"
+    assert inferrer.infer("hello there") == []
+
+    vectorstore = InMemoryVectorStore(DeterministicFakeEmbedding(size=16))
+    vectorstore.add_documents(
+        [Document(page_content="Interest depends", metadata={"answer_id": "a2"})]
+    )
+    filtered = [(Document(page_content="Late fees", metadata={"answer_id": "a1"}), 0.9)]
+    searched_topics = []
+
+    def topic_search(question, topics, k):
+        searched_topics.append(topics)
+        return filtered if "Fees" in topics else []
+
+    retriever = CollapsedFAQRetriever(
+        vectorstore=vectorstore,
+        topic_inferrer=inferrer,
+        topic_search=topic_search,
+    )
+    matches = retriever.search_with_scores("What is the late fee?")
+    assert [doc.metadata["answer_id"] for doc, _ in matches] == ["a1"]
+    assert "Fees" in matches[0][0].metadata["topic_filter"]
+
+    matches = retriever.search_with_scores("How is interest determined?")
+    assert [doc.metadata["answer_id"] for doc, _ in matches] == ["a2"]
+    assert searched_topics[-1] == ["Interest"]
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from src.scripts.index_faqs import plan_faq_changes, prepare_faqs
+
+
+def test_plan_faq_changes():
+    """
+    Only new or changed FAQs are re-embedded and removed FAQs are deleted
+    """
+    df = pd.DataFrame(
+        [
+            {
+                "faq_id": "FAQ001",
+                "question": "Q1",
+                "answer": "A1",
+                "related_topics": "",
+            },
+            {
+                "faq_id": "FAQ002",
+                "question": "Q2",
+                "answer": "A2",
+                "related_topics": "",
+            },
+            {
+                "faq_id": "FAQ003",
+                "question": "Q3",
+                "answer": "A3",
+                "related_topics": "",
+            },
+        ]
+    )
+    model = "text-embedding-ada-002"
+    hashes = dict(prepare_faqs(df, model)[["faq_id", "content_hash"]].values)
+    existing = {
+        "FAQ001": hashes["FAQ001"],
+        "FAQ002": "stale",
+        "FAQ009": hashes["FAQ003"],
+    }
+
+    changed, removed = plan_faq_changes(df, existing, model)
+    assert list(changed["faq_id"]) == ["FAQ002", "FAQ003"]
+    assert removed == ["FAQ009"]
+
+    unchanged, removed = plan_faq_changes(df, hashes, model)
+    assert unchanged.empty and removed == []
+
+    changed, _ = plan_faq_changes(df, existing, "text-embedding-3-small")
+    assert len(changed) == 3
+
+    ids = prepare_faqs(df.drop(columns="faq_id"), model)["faq_id"]
+    assert ids.str.startswith("faq-").all() and ids.is_unique
+
+
+def test_embedding_key_separates_resized_vectors():
+    """
+    Resizing the embeddings re-embeds every FAQ
+    """
+    from src.scripts.index_faqs import embedding_key
+
+    df = pd.DataFrame([{"question": "Q1", "answer": "A1"}])
+    full = prepare_faqs(df, embedding_key("text-embedding-3-small"))
+    reduced = prepare_faqs(df, embedding_key("text-embedding-3-small", 512))
+    assert full["content_hash"][0] != reduced["content_hash"][0]
+
+
+def test_latest_rows_keeps_the_last_duplicate_across_chunks(tmp_path, monkeypatch):
+    from src.scripts import index_faqs
+
+    monkeypatch.setattr(index_faqs, "FAQ_CSV_CHUNK_SIZE", 2)
+    path = tmp_path / "faqs.csv"
+    pd.DataFrame(
+        [
+            {"faq_id": "a", "question": "Q1", "answer": "A1"},
+            {"faq_id": "a", "question": "Q2", "answer": "A2"},
+            {"faq_id": "b", "question": "Q3", "answer": "A3"},
+            {"faq_id": "a", "question": "Q4", "answer": "A4"},
+        ]
+    ).to_csv(path, index=False)
+
+    assert index_faqs.latest_rows(str(path), "model") == {2, 3}
@@ -0,0 +1,29 @@
+from src.utils.session_tokens import issue_token, lookup_keys, verify_token
+
+
+def test_session_tokens():
+    """
+    Tokens round-trip until they expire, and tampered or foreign tokens
+    are refused
+    """
+
+    token = issue_token("C001", ttl=60, secret="s", now=1000)
+    assert verify_token(token, secret="s", now=1059) == "C001"
+    assert verify_token(token, secret="s", now=1060) is None
+    assert verify_token(token, secret="other", now=1000) is None
+
+    forged = issue_token("C002", ttl=60, secret="other", now=1000)
+    payload, signature = forged.split(".")[0], token.split(".")[1]
+    assert verify_token(f"{payload}.{signature}", secret="s", now=1000) is None
+    assert verify_token("not-a-token", secret="s") is None
+    assert verify_token("abc.é", secret="s") is None
+    assert verify_token(f"{payload}é.{signature}", secret="s") is None
+
+
+def test_lookup_keys_match_etl_normalization():
+    assert lookup_keys(" Alice ", "SMITH", " 12345", "(555) 111-2222") == (
+        "alice",
+        "smith",
+        "12345",
+        "5551112222",
+    )
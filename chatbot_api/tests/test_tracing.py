@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from langchain_core.agents import AgentAction
+
+from src.utils.tracing import TraceSink, format_steps
+
+
+def test_format_steps_by_verbosity():
+    """
+    Summaries keep tool names, timings and Cypher but drop tool outputs
+    """
+
+    steps = [
+        (
+            AgentAction("explore_bank_database_tool", {"question": "q"}, ""),
+            {
+                "output": "Two loans.",
+                "intermediate_steps": [
+                    {"query": "MATCH (m:Mortgage) RETURN count(m)"},
+                    {"context": [{"count(m)": 2}] * 100},
+                    {"answer_path": "deterministic"},
+                ],
+            },
+        ),
+        (AgentAction("explore_product_faqs", "rates", ""), "A long FAQ answer"),
+    ]
+    timings = [("explore_product_faqs", 0.5), ("explore_bank_database_tool", 1.25)]
+
+    assert format_steps(steps, timings, "none") == []
+    assert format_steps(steps, timings, "summary") == [
+        "explore_bank_database_tool (1.25s) [deterministic]: "
+        "MATCH (m:Mortgage) RETURN count(m)",
+        "explore_product_faqs (0.50s)",
+    ]
+    assert format_steps(steps, timings, "full") == [str(s) for s in steps]
+
+
+def test_trace_sink_samples_and_writes_in_background(tmp_path):
+    path = tmp_path / "traces.jsonl"
+
+    async def run():
+        sink = TraceSink(str(path), sample_rate=1.0, max_queue=2)
+        skipped = TraceSink(str(path), sample_rate=0.0)
+        assert not skipped.submit({"n": -1})
+        queued = [sink.submit({"n": n}) for n in range(3)]
+        await asyncio.sleep(0.1)
+        return queued, sink.dropped
+
+    queued, dropped = asyncio.run(run())
+    assert queued == [True, True, False] and dropped == 1
+    assert [json.loads(line)["n"] for line in path.read_text().splitlines()] == [0, 1]
+
+
+def test_trace_sink_redacts_content_unless_enabled(tmp_path):
+    trace = {"role": "Customer", "customer_id": "C001", "input": "my balance?"}
+
+    async def run(path, include_content):
+        sink = TraceSink(str(path), sample_rate=1.0, include_content=include_content)
+        sink.submit(trace)
+        await asyncio.sleep(0.1)
+        return json.loads(path.read_text())
+
+    redacted = asyncio.run(run(tmp_path / "redacted.jsonl", False))
+    assert redacted == {
+        "role": "Customer",
+        "customer_id": "[redacted]",
+        "input": "[redacted]",
+    }
+    assert asyncio.run(run(tmp_path / "full.jsonl", True)) == trace
@@ -1,9 +1,37 @@
 import os
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 CHATBOT_URL = os.getenv("CHATBOT_URL", "http://localhost:8000/bank-rag-agent") # change port 8081 to 8000
 RESET_URL = CHATBOT_URL.replace("/bank-rag-agent", "/reset-conversation")
+VERIFY_URL = CHATBOT_URL.replace("/bank-rag-agent", "/verify-customer")
+
+# (connect, read) timeouts in seconds. The chat read timeout is also sent as
+# the request deadline, so the backend stops working when we stop waiting
+CONNECT_TIMEOUT = float(os.getenv("CHATBOT_CONNECT_TIMEOUT", "3.05"))
+VERIFY_TIMEOUT = (CONNECT_TIMEOUT, float(os.getenv("CHATBOT_VERIFY_TIMEOUT", "10")))
+CHAT_TIMEOUT = (CONNECT_TIMEOUT, float(os.getenv("CHATBOT_CHAT_TIMEOUT", "120")))
+
+# Messages of the last CHAT_FULL_TURNS turns are shown in full, older ones
+# only on request, and at most CHAT_MAX_MESSAGES are kept per session
+CHAT_FULL_TURNS = int(os.getenv("CHAT_FULL_TURNS", "5"))
+CHAT_MAX_MESSAGES = int(os.getenv("CHAT_MAX_MESSAGES", "200"))
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One pooled, keep-alive HTTP session shared by every rerun and user"""
+
+    session = requests.Session()
+    # Only connection failures are retried: a POST that reached the backend
+    # may already be running there
+    retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 # ---- Session State Setup ---- 
 if "role" not in st.session_state:
@@ -16,6 +44,8 @@ if "customer_name" not in st.session_state:
     st.session_state.customer_name = ""
 if "customer_id" not in st.session_state:  #  NEW: store verified user's ID
     st.session_state.customer_id = None
+if "session_token" not in st.session_state:  # proves the verification to the backend
+    st.session_state.session_token = None
 
 # ---- Sidebar ----
 with st.sidebar:
@@ -61,19 +91,17 @@ if st.session_state.role == "Customer" and not st.session_state.verified:
             "phone": phone
         }
         try:
-            # change hardcode url 
-            verify_url = CHATBOT_URL.replace("/bank-rag-agent", "/verify-customer")
-            res = requests.post(verify_url, json=payload)
+            res = http_session().post(VERIFY_URL, json=payload, timeout=VERIFY_TIMEOUT)
 
 
             # store response.json() in a variable ONCE
             res_data = res.json()
-            print("✅ Backend verify response:", res_data)  # ✅ DEBUG
 
             if res.status_code == 200 and res_data.get("verified"):
                 st.session_state.verified = True
                 st.session_state.customer_name = f"{first_name} {last_name}"
                 st.session_state.customer_id = res_data.get("customer_id")  # ✅ NEW: Store customer ID
+                st.session_state.session_token = res_data.get("session_token")
                 st.success("✅ Verification successful!")
 
                 st.markdown(f"Verified Customer ID:  `{st.session_state.customer_id}`") ## can comment this out later
@@ -97,7 +125,7 @@ if st.session_state.role in ["Banker", "Customer"]:
     if st.button("🔁 Reset Conversation"):
         payload = {"role": st.session_state.role, "customer_id": st.session_state.customer_id}
         try:
-            res = requests.post(RESET_URL, params=payload)
+            res = http_session().post(RESET_URL, params=payload, timeout=VERIFY_TIMEOUT)
             if res.status_code == 200:
                 st.session_state.messages = []
                 st.success("✅ Conversation reset!")
@@ -113,14 +141,24 @@ st.info("Ask me questions about product, promotions, bank branches, transactions
 # ---- Chat Interface ----
 if st.session_state.role == "Banker" or (st.session_state.role == "Customer" and st.session_state.verified):
 
-    for message in st.session_state.messages:
+    def render_message(message, with_explanation=True):
         with st.chat_message(message["role"]):
             if "output" in message:
                 st.markdown(message["output"])
-            if "explanation" in message:
-                with st.status("How was this generated", state="complete"):
+            if with_explanation and "explanation" in message:
+                with st.status("How was this generated", state="complete", expanded=False):
                     st.info(message["explanation"])
 
+    # Only the latest turns are rendered on every rerun
+    messages = st.session_state.messages
+    split = max(len(messages) - 2 * CHAT_FULL_TURNS, 0)
+    earlier, recent = messages[:split], messages[split:]
+    if earlier and st.toggle(f"Show {len(earlier)} earlier messages"):
+        for message in earlier:
+            render_message(message, with_explanation=False)
+    for message in recent:
+        render_message(message)
+
     if prompt := st.chat_input("What do you want to know?"):
         st.chat_message("user").markdown(prompt)
         st.session_state.messages.append({"role": "user", "output": prompt})
@@ -129,18 +167,40 @@ if st.session_state.role == "Banker" or (st.session_state.role == "Customer" and
         data = {
             "input": prompt,
             "customer_id": st.session_state.customer_id,
-            "role": st.session_state.role  # <-- Add this
+            "role": st.session_state.role,  # <-- Add this
+            "session_token": st.session_state.session_token,
         }
 
-        print(" Sending payload to backend:", data)
-
 
         with st.spinner("Searching for an answer..."):
-            response = requests.post(CHATBOT_URL, json=data)
-            if response.status_code == 200:
-                output_text = response.json()["output"]
-                explanation = response.json()["intermediate_steps"]
-            else:
+            try:
+                response = http_session().post(
+                    CHATBOT_URL,
+                    json=data,
+                    headers={"X-Request-Timeout": str(CHAT_TIMEOUT[1])},
+                    timeout=CHAT_TIMEOUT,
+                )
+                status_code = response.status_code
+            except requests.RequestException as e:
+                status_code = None
+                output_text = "The chatbot could not be reached. Please try again later."
+                explanation = str(e)
+
+            if status_code == 200:
+                response_data = response.json()
+                output_text = response_data["output"]
+                explanation = response_data["intermediate_steps"]
+            elif status_code == 401:
+                # The session token expired, so verify again on the next rerun
+                st.session_state.verified = False
+                st.session_state.session_token = None
+                output_text = "Your session expired. Please verify your identity again."
+                explanation = output_text
+            elif status_code == 429:
+                retry_after = response.headers.get("Retry-After", "a few")
+                output_text = f"The chatbot is busy. Please try again in {retry_after} seconds."
+                explanation = output_text
+            elif status_code is not None:
                 output_text = "An error occurred. Please try again later."
                 explanation = output_text
 
@@ -151,3 +211,5 @@ if st.session_state.role == "Banker" or (st.session_state.role == "Customer" and
             "output": output_text,
             "explanation": explanation
         })
+        # Bound the session's memory however long the conversation runs
+        del st.session_state.messages[:-CHAT_MAX_MESSAGES]
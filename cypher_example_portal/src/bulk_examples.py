@@ -0,0 +1,51 @@
+"""
+Bulk import and export of Cypher examples in the example_cypher.csv format.
+
+Run from the cypher_example_portal directory:
+
+    python src/bulk_examples.py import ../data/example_cypher.csv --dry-run
+    python src/bulk_examples.py export examples.csv
+"""
+
+import argparse
+
+import pandas as pd
+from graph_utils import (
+    CYPHER_EXAMPLES_DUPLICATE_SIMILARITY,
+    export_examples,
+    import_examples,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument(
+        "--threshold", type=float, default=CYPHER_EXAMPLES_DUPLICATE_SIMILARITY
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        examples = export_examples()
+        examples.to_csv(args.path, index=False)
+        print(f"Exported {len(examples)} examples to {args.path}")
+
+    else:
+        try:
+            report = import_examples(
+                pd.read_csv(args.path), threshold=args.threshold, dry_run=args.dry_run
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        for row in report.invalid:
+            print(f"invalid: {row['question']!r}: {row['error']}")
+        for row in report.duplicates:
+            print(f"duplicate: {row['question']!r} ~ {row['similar_to']!r}")
+        for row in report.warnings:
+            print(f"warning: {row['question']!r}: {row['warning']}")
+        print(
+            f"{'Would add' if args.dry_run else 'Added'} {report.added} examples, "
+            f"skipped {len(report.duplicates)} near-duplicates and "
+            f"{len(report.invalid)} invalid queries"
+        )
@@ -0,0 +1,95 @@
+"""
+Checks on Cypher examples that need neither Neo4j nor OpenAI, kept apart
+from graph_utils so they can be imported (and tested) without either.
+"""
+
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Imported examples at least this similar to an existing (or an earlier
+# imported) question are skipped as near-duplicates
+CYPHER_EXAMPLES_DUPLICATE_SIMILARITY = float(
+    os.getenv("CYPHER_EXAMPLES_DUPLICATE_SIMILARITY", "0.97")
+)
+# Label scans estimated to touch at least this many rows are flagged
+CYPHER_LARGE_SCAN_ROWS = int(os.getenv("CYPHER_LARGE_SCAN_ROWS", "10000"))
+
+
+@dataclass
+class CypherPlanReport:
+    """
+    What the planner estimates a Cypher query would do, without running it.
+    """
+
+    valid: bool
+    error: str | None = None
+    estimated_rows: float | None = None
+    operators: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    writes: bool = False
+
+
+def summarize_plan(plan: dict, large_scan_rows: int = CYPHER_LARGE_SCAN_ROWS) -> CypherPlanReport:
+    """
+    Summarize an EXPLAIN plan, flagging cartesian products, scans of
+    large labels and writes.
+    """
+
+    report = CypherPlanReport(
+        valid=True, estimated_rows=plan.get("args", {}).get("EstimatedRows")
+    )
+    pending = [plan]
+    while pending:
+        operator = pending.pop()
+        pending.extend(reversed(operator.get("children", [])))
+        name = operator["operatorType"].split("@")[0]
+        rows = operator.get("args", {}).get("EstimatedRows") or 0
+        details = operator.get("args", {}).get("Details", "")
+        report.operators.append(name)
+
+        if name == "CartesianProduct":
+            report.warnings.append(
+                "The plan contains a cartesian product of unconnected patterns."
+            )
+        elif name in ("AllNodesScan", "NodeByLabelScan") and rows >= large_scan_rows:
+            report.warnings.append(
+                f"{name} {details} reads about {rows:,.0f} nodes; "
+                "match on an indexed property instead."
+            )
+        elif name.startswith(("Create", "Merge", "Delete", "DetachDelete", "Set", "Remove")):
+            report.writes = True
+            report.warnings.append(f"The query writes to the graph ({name}).")
+
+    return report
+
+
+def find_near_duplicates(
+    new_embeddings: np.ndarray,
+    existing_embeddings: np.ndarray,
+    threshold: float = CYPHER_EXAMPLES_DUPLICATE_SIMILARITY,
+) -> list[int | None]:
+    """
+    For each new embedding, the index of the most similar existing or
+    earlier new embedding at or above `threshold`, else None. Existing
+    matches come first, earlier new ones are offset by the existing count.
+    """
+
+    new = np.asarray(new_embeddings, dtype=np.float32)
+    if len(new) == 0:
+        return []
+    existing = np.asarray(existing_embeddings, dtype=np.float32).reshape(-1, new.shape[1])
+
+    candidates = np.vstack([existing, new])
+    candidates /= np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    similarity = candidates[len(existing):] @ candidates.T
+
+    # A new question may only duplicate existing or earlier new ones
+    rows, columns = np.indices(similarity.shape)
+    similarity[columns >= len(existing) + rows] = -1.0
+
+    best = similarity.argmax(axis=1)
+    return [
+        int(j) if similarity[i, j] >= threshold else None for i, j in enumerate(best)
+    ]
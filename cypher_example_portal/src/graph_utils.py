@@ -1,7 +1,19 @@
 import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import neo4j
+import numpy as np
+import pandas as pd
 from langchain_community.vectorstores.neo4j_vector import Neo4jVector
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.graphs import Neo4jGraph
+from example_checks import (
+    CYPHER_EXAMPLES_DUPLICATE_SIMILARITY,
+    CypherPlanReport,
+    find_near_duplicates,
+    summarize_plan,
+)
 
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
@@ -13,6 +25,17 @@ NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY = os.getenv(
 NEO4J_CYPHER_EXAMPLES_NODE_NAME = os.getenv("NEO4J_CYPHER_EXAMPLES_NODE_NAME")
 NEO4J_CYPHER_EXAMPLES_METADATA_NAME = os.getenv("NEO4J_CYPHER_EXAMPLES_METADATA_NAME")
 
+# Example queries are only ever planned, never run, under this timeout (s)
+CYPHER_VALIDATION_TIMEOUT = float(os.getenv("CYPHER_VALIDATION_TIMEOUT", "5"))
+
+# Written by the chatbot API's migrate_vector_index script when the examples
+# index is rebuilt with another embedding model or dimensionality
+VECTOR_INDEX_ALIAS_QUERY = """
+MATCH (a:VectorIndexAlias {name: $name})
+RETURN a.index_name AS index_name, a.embedding_property AS embedding_property,
+       a.model AS model, a.dimensions AS dimensions
+"""
+
 
 NEO4J_GRAPH = Neo4jGraph(
     url=NEO4J_URI,
@@ -22,18 +45,41 @@ NEO4J_GRAPH = Neo4jGraph(
 
 NEO4J_GRAPH.refresh_schema()
 
+
+def resolve_vector_index(graph: Neo4jGraph, name: str) -> dict:
+    """
+    Look up the physical index, embedding property and embedding model
+    behind a logical vector index name.
+    """
+
+    records = graph.query(VECTOR_INDEX_ALIAS_QUERY, params={"name": name})
+    if not records:
+        return {
+            "index_name": name,
+            "embedding_property": "embedding",
+            "model": "text-embedding-ada-002",
+            "dimensions": None,
+        }
+
+    return records[0]
+
+
+EXAMPLES_INDEX = resolve_vector_index(NEO4J_GRAPH, NEO4J_CYPHER_EXAMPLES_INDEX_NAME)
+
 NEO4J_VECTOR_INDEX = Neo4jVector.from_existing_graph(
-    embedding=OpenAIEmbeddings(),
+    embedding=OpenAIEmbeddings(
+        model=EXAMPLES_INDEX["model"], dimensions=EXAMPLES_INDEX["dimensions"]
+    ),
     url=NEO4J_URI,
     username=NEO4J_USERNAME,
     password=NEO4J_PASSWORD,
-    index_name=NEO4J_CYPHER_EXAMPLES_INDEX_NAME,
+    index_name=EXAMPLES_INDEX["index_name"],
     node_label=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY.capitalize(),
     text_node_properties=[
         NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
     ],
     text_node_property=NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY,
-    embedding_node_property="embedding",
+    embedding_node_property=EXAMPLES_INDEX["embedding_property"],
 )
 
 
@@ -44,11 +90,9 @@ def search_node_by_str_property(
     Search a Neo4j graph for nodes that match a given string property value.
     """
 
-    cypher_query = (
-        f'MATCH (p:{node_name}) WHERE p.{property_name} = "{value}" RETURN p;'
-    )
+    cypher_query = f"MATCH (p:`{node_name}`) WHERE p.`{property_name}` = $value RETURN p;"
 
-    return graph.query(cypher_query)
+    return graph.query(cypher_query, params={"value": value})
 
 
 def does_question_exist(question: str) -> bool:
@@ -66,17 +110,51 @@ def does_question_exist(question: str) -> bool:
     return len(results) > 0
 
 
-def is_valid_cypher_query(query: str) -> bool:
+def explain_cypher_query(query: str) -> CypherPlanReport:
     """
-    Determine whether a Cypher query successfully runs
+    Validate a Cypher query with EXPLAIN in a read-only session under a
+    strict timeout. The query itself is never executed.
     """
 
+    query = query.strip().rstrip(";")
+    if query.upper().startswith("PROFILE"):
+        return CypherPlanReport(valid=False, error="PROFILE executes the query.")
+    if not query.upper().startswith("EXPLAIN"):
+        query = f"EXPLAIN {query}"
+
     try:
-        NEO4J_GRAPH.query(query)
-        return True
+        with NEO4J_GRAPH._driver.session(
+            database=NEO4J_GRAPH._database,
+            default_access_mode=neo4j.READ_ACCESS,
+        ) as session:
+            summary = session.run(
+                neo4j.Query(query, timeout=CYPHER_VALIDATION_TIMEOUT)
+            ).consume()
+
+    except neo4j.exceptions.Neo4jError as e:
+        return CypherPlanReport(valid=False, error=e.message or str(e))
+    except neo4j.exceptions.DriverError as e:
+        return CypherPlanReport(valid=False, error=f"Could not plan the query: {e}")
+
+    return summarize_plan(summary.plan)
+
+
+def is_valid_cypher_query(query: str) -> bool:
+    """
+    Determine whether a Cypher query compiles, without running it
+    """
+
+    return explain_cypher_query(query).valid
 
-    except Exception:
-        return False
+
+@lru_cache(maxsize=256)
+def embed_question(question: str) -> tuple[float, ...]:
+    """
+    Embed a normalized question once for both the similarity check and
+    the upload.
+    """
+
+    return tuple(NEO4J_VECTOR_INDEX.embedding.embed_query(question))
 
 
 def fetch_most_similar_question(question: str) -> str | None:
@@ -85,7 +163,9 @@ def fetch_most_similar_question(question: str) -> str | None:
     the input.
     """
 
-    documents = NEO4J_VECTOR_INDEX.similarity_search(question)
+    documents = NEO4J_VECTOR_INDEX.similarity_search_by_vector(
+        list(embed_question(question.lower().strip()))
+    )
 
     if len(documents) == 0:
         return None
@@ -101,10 +181,129 @@ def add_example_cypher_query(question: str, cypher: str) -> str:
     """
 
     cypher_metadata_key = NEO4J_CYPHER_EXAMPLES_METADATA_NAME
+    question = question.lower().strip()
 
-    node_id = NEO4J_VECTOR_INDEX.add_texts(
-        texts=[question.lower().strip()],
+    node_id = NEO4J_VECTOR_INDEX.add_embeddings(
+        texts=[question],
+        embeddings=[list(embed_question(question))],
         metadatas=[{cypher_metadata_key: cypher}],
     )
 
     return node_id
+
+
+@dataclass
+class BulkImportReport:
+    """
+    The outcome of a bulk import, one row per skipped example and per plan
+    warning of an imported one.
+    """
+
+    added: int = 0
+    duplicates: list[dict] = field(default_factory=list)
+    invalid: list[dict] = field(default_factory=list)
+    warnings: list[dict] = field(default_factory=list)
+
+
+def export_examples() -> pd.DataFrame:
+    """
+    Export every Cypher example in the `example_cypher.csv` format.
+    """
+
+    rows = NEO4J_GRAPH.query(
+        f"""
+        MATCH (n:`{NEO4J_CYPHER_EXAMPLES_NODE_NAME}`)
+        RETURN n.`{NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY}` AS question,
+               n.`{NEO4J_CYPHER_EXAMPLES_METADATA_NAME}` AS cypher
+        ORDER BY question
+        """
+    )
+
+    return pd.DataFrame(rows, columns=["question", "cypher"])
+
+
+def import_examples(
+    examples: pd.DataFrame,
+    threshold: float = CYPHER_EXAMPLES_DUPLICATE_SIMILARITY,
+    dry_run: bool = False,
+) -> BulkImportReport:
+    """
+    Import examples in the `example_cypher.csv` format. Queries are
+    validated with EXPLAIN and rejected when they write, all questions are
+    embedded in batches, and near-duplicates of existing or earlier
+    questions are skipped before the survivors are written in a single
+    UNWIND. Other plan warnings are reported but do not block an example.
+    """
+
+    missing = {"question", "cypher"} - set(examples.columns)
+    if missing:
+        raise ValueError(f"The CSV is missing the columns: {', '.join(sorted(missing))}")
+
+    report = BulkImportReport()
+    examples = examples.dropna(subset=["question", "cypher"]).assign(
+        question=lambda df: df["question"].astype(str).str.lower().str.strip()
+    )
+    examples = examples[examples["question"] != ""]
+
+    valid, plan_reports = [], []
+    for row in examples.itertuples(index=False):
+        plan_report = explain_cypher_query(row.cypher)
+        if not plan_report.valid:
+            report.invalid.append({"question": row.question, "error": plan_report.error})
+        elif plan_report.writes:
+            # Few-shot examples steer generated queries, which must only read
+            report.invalid.append(
+                {"question": row.question, "error": "The query writes to the graph."}
+            )
+        else:
+            valid.append(row)
+            plan_reports.append(plan_report)
+
+    if not valid:
+        return report
+
+    questions = [row.question for row in valid]
+    embeddings = NEO4J_VECTOR_INDEX.embedding.embed_documents(questions)
+
+    existing = NEO4J_GRAPH.query(
+        f"""
+        MATCH (n:`{NEO4J_CYPHER_EXAMPLES_NODE_NAME}`)
+        WHERE n.`{EXAMPLES_INDEX["embedding_property"]}` IS NOT NULL
+        RETURN n.`{NEO4J_CYPHER_EXAMPLES_TEXT_NODE_PROPERTY}` AS question,
+               n.`{EXAMPLES_INDEX["embedding_property"]}` AS embedding
+        """
+    )
+    existing_questions = [row["question"] for row in existing]
+    matches = find_near_duplicates(
+        np.array(embeddings),
+        np.array([row["embedding"] for row in existing]),
+        threshold,
+    )
+
+    keep = []
+    for i, match in enumerate(matches):
+        if match is None:
+            keep.append(i)
+            report.warnings.extend(
+                {"question": questions[i], "warning": warning}
+                for warning in plan_reports[i].warnings
+            )
+            continue
+        similar = (
+            existing_questions[match]
+            if match < len(existing_questions)
+            else questions[match - len(existing_questions)]
+        )
+        report.duplicates.append({"question": questions[i], "similar_to": similar})
+
+    if keep and not dry_run:
+        NEO4J_VECTOR_INDEX.add_embeddings(
+            texts=[questions[i] for i in keep],
+            embeddings=[embeddings[i] for i in keep],
+            metadatas=[
+                {NEO4J_CYPHER_EXAMPLES_METADATA_NAME: valid[i].cypher} for i in keep
+            ],
+        )
+    report.added = len(keep)
+
+    return report
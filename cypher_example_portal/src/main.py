@@ -1,8 +1,11 @@
+import pandas as pd
 import streamlit as st
 from graph_utils import (
     add_example_cypher_query,
     does_question_exist,
-    is_valid_cypher_query,
+    explain_cypher_query,
+    export_examples,
+    import_examples,
     fetch_most_similar_question,
 )
 
@@ -37,16 +40,34 @@ if question and cypher:
             st.warning(
                 "This question already exists in the example index. Please enter a new question."
             )
-        elif not is_valid_cypher_query(cypher):
-            st.warning(
-                "The Cypher query did not execute successfully. Please enter a valid query."
-            )
         else:
-            st.session_state.validated = True
+            # Only planned with EXPLAIN, so validation is instant and safe
+            plan_report = explain_cypher_query(cypher)
+            st.session_state.plan_report = plan_report
+
+            if not plan_report.valid:
+                st.warning(
+                    f"The Cypher query is not valid: {plan_report.error} "
+                    "Please enter a valid query."
+                )
+            else:
+                st.session_state.validated = True
 
 if st.session_state.validated:
+    plan_report = st.session_state.plan_report
+
     st.success("This question does not currently exist in the example index.")
-    st.success("The Cypher query executed successfully.")
+    st.success("The Cypher query is valid.")
+
+    st.markdown(
+        f"""
+        **Estimated rows:** {plan_report.estimated_rows or 0:,.0f}
+
+        **Plan:** {" → ".join(reversed(plan_report.operators))}
+        """
+    )
+    for warning in plan_report.warnings:
+        st.warning(warning)
 
     similar_question = fetch_most_similar_question(question)
 
@@ -74,3 +95,39 @@ if st.session_state.validated:
             )
 
             st.session_state.validated = False
+
+st.header("Bulk import and export")
+
+uploaded = st.file_uploader(
+    "Upload a CSV with `question` and `cypher` columns:", type="csv"
+)
+
+if uploaded is not None and st.button("Import"):
+    try:
+        report = import_examples(pd.read_csv(uploaded))
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+
+    st.success(f"Added {report.added} examples to the index.")
+    if report.duplicates:
+        st.warning(
+            f"Skipped {len(report.duplicates)} near-duplicates of existing questions."
+        )
+        st.dataframe(pd.DataFrame(report.duplicates))
+    if report.invalid:
+        st.warning(
+            f"Skipped {len(report.invalid)} invalid or writing Cypher queries."
+        )
+        st.dataframe(pd.DataFrame(report.invalid))
+    if report.warnings:
+        st.warning(f"{len(report.warnings)} plan warnings on imported examples.")
+        st.dataframe(pd.DataFrame(report.warnings))
+
+if st.button("Export"):
+    st.download_button(
+        "Download all examples",
+        data=export_examples().to_csv(index=False),
+        file_name="example_cypher.csv",
+        mime="text/csv",
+    )
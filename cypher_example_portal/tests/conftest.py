@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The portal's modules import each other as top-level modules, the way they
+# run from /app in the container
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
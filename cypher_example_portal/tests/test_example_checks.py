@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.example_checks import find_near_duplicates, summarize_plan
+
+
+def test_summarize_plan_flags_expensive_operators() -> None:
+    plan = {
+        "operatorType": "ProduceResults@neo4j",
+        "args": {"EstimatedRows": 5e9},
+        "children": [
+            {
+                "operatorType": "CartesianProduct@neo4j",
+                "args": {"EstimatedRows": 5e9},
+                "children": [
+                    {
+                        "operatorType": "NodeByLabelScan@neo4j",
+                        "args": {"EstimatedRows": 50000.0, "Details": "a:Customer"},
+                    },
+                    {
+                        "operatorType": "NodeByLabelScan@neo4j",
+                        "args": {"EstimatedRows": 100000.0, "Details": "b:Payment"},
+                    },
+                ],
+            }
+        ],
+    }
+
+    report = summarize_plan(plan, large_scan_rows=10000)
+
+    assert report.valid and report.estimated_rows == 5e9
+    assert report.operators == [
+        "ProduceResults",
+        "CartesianProduct",
+        "NodeByLabelScan",
+        "NodeByLabelScan",
+    ]
+    assert len(report.warnings) == 3
+    assert not report.writes
+
+    writing = summarize_plan(
+        {
+            "operatorType": "ProduceResults@neo4j",
+            "children": [{"operatorType": "SetProperty@neo4j", "args": {}}],
+        }
+    )
+    assert writing.writes and writing.warnings
+
+
+def test_find_near_duplicates() -> None:
+    existing = np.array([[1.0, 0.0], [0.0, 1.0]])
+    new = np.array([[0.99, 0.01], [1.0, 1.0], [1.0, 0.98], [-1.0, 0.0]])
+
+    # Near an existing question, new, near the previous new one, new
+    assert find_near_duplicates(new, existing, threshold=0.99) == [0, None, 3, None]
+    assert find_near_duplicates(new[:0], existing) == []
+    assert find_near_duplicates(new[1:2], np.empty((0,))) == [None]